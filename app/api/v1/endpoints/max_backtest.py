@@ -1,13 +1,23 @@
 # app/endpoints/max_backtest.py
+import asyncio
+import contextlib
+import os
+from functools import partial
 from typing import Optional, Tuple, Dict, Any
 from fastapi import HTTPException, UploadFile
 
-from app.services.orca_max_backtesting.helper import read_bytes_cleaned
+from app.services.orca_max_backtesting.artifact_cache import backtest_cache, backtest_key
+from app.services.orca_max_backtesting.backtest_jobs import JobCancelled, backtest_jobs
 from app.services.orca_max_backtesting.orca_enums import TeamWay
 from app.services.orca_max_backtesting.run import run_single
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_loader import fetch_data_between_dates, range_bounds, range_fingerprint
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import read_tick_file, spool_upload
+from app.utils.logging_setup import logger
 
 
-async def run_max_backtest_logic(
+async def submit_max_backtest(
     *,
     account_name: str,
     mode: str,
@@ -19,14 +29,16 @@ async def run_max_backtest_logic(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     file: Optional[UploadFile] = None,
-) -> Dict[str, Any]:
+) -> str:
     """
-    Core logic for the /run-bot/max-backtest endpoint.
+    Checks a /run-bot/max-backtest request and submits its backtest as a job.
 
     Rules:
     - If a file is provided, use it and ignore date range.
     - Else, require date_from and date_to.
     - 'mode' is always backtesting (per router comment), but still passed through.
+
+    :return: the job id
     """
     # Validate the enum / mode early (keeps failure noise out of the route)
     try:
@@ -34,73 +46,159 @@ async def run_max_backtest_logic(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid maxMode: {e}")
 
-    # 1) File path: parse and run
-    if file:
-        contents = await file.read()
-        if contents is None or len(contents) == 0:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-
-        # Parse uploaded dataset
-        data, all_data = read_bytes_cleaned(contents, rows=-1)
-
-        # Run your engine
-        result, order_points_completed_dict = run_single(
-            contract,
-            data,
-            data_name=f"{file.filename}-v2",
-            way=max_mode,
-            exit_strategy_key=exit_strategy_key,
-            points_key=point_key,
-        )
+    backtest = {
+        "contract": contract,
+        "way": max_mode,
+        "exit_strategy_key": exit_strategy_key,
+        "points_key": point_key,
+    }
+    name = f"{contract} {point_key} {exit_strategy_key} {max_mode.value}"
 
-        return {
-            "result": result,
-            "trades": order_points_completed_dict,
-            "meta": {
-                "source": "file",
-                "filename": file.filename,
-                "accountName": account_name,
-                "mode": mode,
-                "notes": notes,
-            },
+    # the data of the backtest: the bytes of the file, or the date range
+    upload_path = None
+    if file:
+        # copied and hashed in a thread, the job parses the copy
+        upload_path, digest = await asyncio.to_thread(spool_upload, file.file)
+        source = {"upload": digest}
+        meta = {
+            "source": "file",
+            "filename": file.filename,
+            "accountName": account_name,
+            "mode": mode,
+            "notes": notes,
         }
-
-    # 2) Date-range path: both dates must be present
-    if not date_from or not date_to:
+    elif date_from and date_to:
+        try:
+            range_bounds(date_from, date_to)
+        except ValueError as ve:
+            raise HTTPException(status_code=400, detail=str(ve))
+        source = {"date_from": date_from, "date_to": date_to}
+        try:
+            # the tables keep receiving rows: a range is cached with the rows it holds
+            source["rows"] = await asyncio.to_thread(range_fingerprint, contract, date_from, date_to)
+        except Exception as e:
+            logger.warning(f"Backtest {name} is not cached, its rows can't be counted: {e}")
+            source = None
+        meta = {
+            "source": "date_range",
+            "dateFrom": date_from,
+            "dateTo": date_to,
+            "accountName": account_name,
+            "mode": mode,
+            "notes": notes,
+        }
+    else:
         raise HTTPException(
             status_code=400,
             detail="Either upload a file OR provide both dateFrom and dateTo.",
         )
 
-    # Load time-bounded data (implement this inside core.data_io)
+    # the same data and config ran before: its result, without parsing the file
+    cache_key = cached = None
+    if source is not None:
+        cache_key = backtest_key(
+            source, contract, point_key, exit_strategy_key, max_mode, SessionCalendar.for_instrument(contract)
+        )
+        # read in a thread as well, a result is tens of MB of JSON
+        cached = await asyncio.to_thread(backtest_cache().get_json, cache_key, with_size=True)
+    if cached is not None:
+        logger.info(f"Backtest {name} served from the cache")
+        if upload_path is not None:
+            _remove_file(upload_path)
+        cached, cached_size = cached
+        return backtest_jobs.submit_result({**cached, "meta": meta}, name=name, result_size=cached_size)
+
+    # 1) File path: the job parses the copy of the upload, removed once the job is over
+    if file:
+        backtest["data_path"] = upload_path
+        backtest["data_name"] = f"{file.filename}-v2"
+        cleanup = partial(_remove_file, upload_path)
+
+    # 2) Date-range path: the job fetches the data
+    else:
+        backtest["date_from"] = date_from
+        backtest["date_to"] = date_to
+        cleanup = None
+
+    return backtest_jobs.submit(
+        run_max_backtest, name=name, cleanup=cleanup, meta=meta, cache_key=cache_key, **backtest
+    )
+
+
+def _remove_file(path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+async def run_max_backtest_logic(**request) -> Dict[str, Any]:
+    """
+    Core logic for the /run-bot/max-backtest endpoint: submit_max_backtest and
+    the result of its job, the event loop goes on while it runs.
+    """
+    job_id = await submit_max_backtest(**request)
     try:
-        data, data_name = _load_data_for_range(contract, date_from, date_to)
+        return await backtest_jobs.wait_result(job_id)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch data: {e}")
+    except JobCancelled as e:
+        # cancelled through DELETE /max-backtest/jobs/{job_id} while the request waited
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def run_max_backtest(
+    *,
+    contract: str,
+    way: TeamWay,
+    exit_strategy_key: str,
+    points_key: str,
+    meta: dict,
+    cache_key: Optional[str] = None,
+    data: Optional[TickSeries] = None,
+    data_path: Optional[str] = None,
+    data_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    The backtest of a job of submit_max_backtest, on its data, the uploaded file
+    at data_path or the data of its date range. Its result is cached under cache_key.
+    """
+    if data is None and data_path is not None:
+        # Parse uploaded dataset block by block, invalid lines are skipped
+        columns, _ = read_tick_file(data_path, strict=False)
+        if len(columns.ts) == 0:
+            raise ValueError("Uploaded file is empty.")
+        data = TickSeries.from_columns(columns)
+
+    elif data is None:
+        # Load time-bounded data
+        try:
+            data, data_name = _load_data_for_range(contract, date_from, date_to)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch data: {e}")
 
     # Run your engine
     result, order_points_completed_dict = run_single(
         contract,
         data,
         data_name=data_name,
-        way=max_mode,
+        way=way,
         exit_strategy_key=exit_strategy_key,
-        points_key=point_key,
+        points_key=points_key,
     )
 
+    if cache_key is not None:
+        try:
+            backtest_cache().put_json(cache_key, {"result": result, "trades": order_points_completed_dict})
+        except (TypeError, ValueError, OSError) as e:
+            logger.warning(f"Backtest result not cached: {e}")
+
     return {
         "result": result,
         "trades": order_points_completed_dict,
-        "meta": {
-            "source": "date_range",
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "accountName": account_name,
-            "mode": mode,
-            "notes": notes,
-        },
+        "meta": meta,
     }
 
 
@@ -108,10 +206,9 @@ def _load_data_for_range(
     contract: str, date_from: str, date_to: str
 ) -> Tuple[Any, str]:
     """
-    Fetches/constructs the dataset for a date range.
+    Fetches the ticks of a date range from the ticks table of the contract.
     Returns (data, data_name).
     """
-    # You can do validation/conversion here if your fetch expects datetimes.
     data = fetch_data_between_dates(contract=contract, start=date_from, end=date_to)
     if data is None:
         raise ValueError("No data returned for the provided date range.")
@@ -1,17 +1,49 @@
+import asyncio
+import contextlib
 import datetime
 import json
+import os
 from typing import Optional, List, Union, Dict
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from fastapi import UploadFile, File, Form
-from starlette.responses import JSONResponse
-from app.api.v1.endpoints.max_backtest import run_max_backtest_logic
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from app.api.v1.endpoints.max_backtest import run_max_backtest_logic, submit_max_backtest
 from app.api.v1.endpoints.max_live import run_orca_system
 from app.services.orca_max.helpers.enums import ENVIRONMENT,TeamWay, PointType, Contract
 from app.services.orca_max.schemas import AccountConfig
-from app.services.orca_max_backtesting.helper import read_bytes_cleaned
+from app.services.orca_max_backtesting.backtest_jobs import backtest_jobs
+from app.services.orca_max_backtesting.orca_enums import JobStatus
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import read_tick_file, spool_upload
+from app.services.orca_max_backtesting.trade_payloads import (
+    TRADES_ENCODINGS,
+    TRADES_ROWS,
+    encode_payload,
+    payload_ndjson,
+    render_json,
+    trades_page,
+)
 
 max_router = APIRouter(prefix="/run-bot")
 
+# a page of /trades holds at most that many trades
+MAX_TRADES_PAGE = 10000
+
+
+def _check_trades_encoding(trades: str) -> None:
+    if trades not in TRADES_ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"Invalid trades: expected one of {list(TRADES_ENCODINGS)}")
+
+
+async def _payload_response(payload: dict, trades: str, stream: bool):
+    """The payload with its trades encoded as asked, or streamed as NDJSON"""
+    if stream:
+        # the lines are rendered in the threadpool as they are sent
+        return StreamingResponse(payload_ndjson(payload), media_type="application/x-ndjson")
+    # tens of MB of trades take a while to render, the event loop goes on meanwhile
+    body = await asyncio.to_thread(render_json, encode_payload(payload, trades))
+    return Response(content=body, status_code=200, media_type="application/json")
+
 
 @max_router.post("/max-backtest")
 async def run_bot_backtesting(
@@ -25,7 +57,14 @@ async def run_bot_backtesting(
     dateFrom: Optional[str] = Form(None),
     dateTo: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
+    trades: str = Form(TRADES_ROWS),
+    stream: bool = Form(False),
 ):
+    """
+    trades: the encoding of the trades, rows, columns or none (only their counts)
+    stream: the payload as NDJSON, a summary line then a line per trade
+    """
+    _check_trades_encoding(trades)
     try:
         payload = await run_max_backtest_logic(
             account_name=accountName,
@@ -39,7 +78,7 @@ async def run_bot_backtesting(
             date_to=dateTo,
             file=file,
         )
-        return JSONResponse(content=payload, status_code=200)
+        return await _payload_response(payload, trades, stream)
 
     except HTTPException:
         # Re-raise FastAPI-native errors as-is
@@ -48,6 +87,99 @@ async def run_bot_backtesting(
         # Fall-through for anything unexpected
         raise HTTPException(status_code=500, detail=str(e))
 
+@max_router.post("/max-backtest/jobs")
+async def submit_bot_backtesting(
+    accountName: str = Form(...),
+    mode: str = Form(...),
+    contract: str = Form(...),
+    maxMode: str = Form(...),
+    point_key: str = Form(...),
+    exit_strategy_key: str = Form(...),
+    notes: Optional[str] = Form(None),
+    dateFrom: Optional[str] = Form(None),
+    dateTo: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+):
+    """/max-backtest as a job: answers with the job id at once, poll its status for the result"""
+    job_id = await submit_max_backtest(
+        account_name=accountName,
+        mode=mode,
+        contract=contract,
+        max_mode_value=maxMode,
+        point_key=point_key,
+        exit_strategy_key=exit_strategy_key,
+        notes=notes,
+        date_from=dateFrom,
+        date_to=dateTo,
+        file=file,
+    )
+    return JSONResponse(content=backtest_jobs.status(job_id), status_code=202)
+
+
+def _job_status(job_id: str) -> dict:
+    try:
+        return backtest_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown backtest job {job_id}")
+
+
+@max_router.get("/max-backtest/jobs/{job_id}")
+async def get_backtest_job(job_id: str):
+    """Status and progress of a job: stage, ticks processed of the stage and its ETA"""
+    return JSONResponse(content=_job_status(job_id), status_code=200)
+
+
+def _job_result(job_id: str) -> dict:
+    status = _job_status(job_id)
+    if status["status"] == JobStatus.Failed.value:
+        raise HTTPException(status_code=500, detail=status["error"])
+    if status["status"] != JobStatus.Done.value:
+        raise HTTPException(status_code=409, detail=f"Backtest job {job_id} is {status['status']}")
+    try:
+        return backtest_jobs.result(job_id)
+    except KeyError:
+        # dropped by newer jobs since its status was read
+        raise HTTPException(status_code=404, detail=f"Unknown backtest job {job_id}")
+
+
+@max_router.get("/max-backtest/jobs/{job_id}/result")
+async def get_backtest_job_result(job_id: str, trades: str = TRADES_ROWS, stream: bool = False):
+    """
+    The /max-backtest payload of a done job, 409 while it isn't. With trades=none
+    the summary comes without the trades, /trades gives them page by page.
+    """
+    _check_trades_encoding(trades)
+    return await _payload_response(_job_result(job_id), trades, stream)
+
+
+@max_router.get("/max-backtest/jobs/{job_id}/trades")
+async def get_backtest_job_trades(
+    job_id: str,
+    side: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=MAX_TRADES_PAGE),
+    trades: str = TRADES_ROWS,
+):
+    """A page of the trades of a side (Long or Short) of a done job, rows or columns"""
+    payload = _job_result(job_id)
+    try:
+        page = trades_page(payload["trades"], side, offset, limit, trades)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No {side} trades in backtest job {job_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=page, status_code=200)
+
+
+@max_router.delete("/max-backtest/jobs/{job_id}")
+async def cancel_backtest_job(job_id: str):
+    """Cancels a queued or running job, 409 if it has finished"""
+    _job_status(job_id)
+    if not backtest_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Backtest job {job_id} has finished")
+    return JSONResponse(content=_job_status(job_id), status_code=200)
+
+
 @max_router.post("/max")
 async def run_bot_max(
     accountName: str = Form("APEX_136189"),
@@ -73,12 +205,18 @@ async def run_bot_max(
         file = None
         # 1) File path: parse and run
         if file:
-            contents = await file.read()
-            if contents is None or len(contents) == 0:
+            # copied in a thread and parsed block by block, the upload is never held in memory
+            upload_path, _ = await asyncio.to_thread(spool_upload, file.file)
+            try:
+                columns, _ = await asyncio.to_thread(read_tick_file, upload_path, strict=False)
+            finally:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(upload_path)
+            if len(columns.ts) == 0:
                 raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
             # Parse uploaded dataset
-            data, all_data = read_bytes_cleaned(contents, rows=-1)
+            data = TickSeries.from_columns(columns)
 
         parsed_accounts: Optional[List[AccountConfig]] = None
         if accounts_ids and accounts_ids != [""]:
@@ -2,15 +2,20 @@ import os
 import random
 import string
 import threading
-from datetime import datetime
 from enum import Enum
 from typing import Callable, Optional, List
 
-import pytz
-
 from app.services.orca_max.helpers.enums import TeamWay, PointType, TradingPosition
 from app.services.orca_max.helpers.settings import PointsDistance
 from app.services.orca_max.schemas import Order
+from app.services.orca_max_backtesting.raw_lines import RawLines
+from app.services.orca_max_backtesting.tick_codec import parse_tick_time
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import (
+    load_tick_store,
+    read_tick_file_parallel,
+    tick_columns_to_list,
+)
 from app.services.orca_redis.client import get_redis_client
 from app.utils.decorators.timing.time import time_it
 
@@ -106,66 +111,31 @@ def create_abc_config(abc_value):
 
 @time_it
 def read_file_cleaned(file_name: str, rows=1000, cached=False):
-    # if cached:
-    #     sanitized_data_list, data_all_list = read_pickles(file_name, path)
-    #     if sanitized_data_list:
-    #         logger.info("Getting Caching data")
-    #
-    #         return sanitized_data_list, data_all_list
-    #     logger.info("Caching data was not found")
-
-    logger.info(f"reading text file {file_name}")
-    sanitized_data_list, data_all_list = [], []
-
-    with open(f"{path}/price_files/{file_name}", "r") as file:
-        previous_row, previous_row_all = None, None
-        index = 0
-        for i, line in enumerate(file):
-            line = line.strip()
-            if previous_row_all != line:
-                data_all_list.append(line)
-                previous_row_all = line
-
-            parts = line.split(";")
-            last_price = float(parts[2])
-            last_price_datetime = get_price_time(parts[0])
+    if cached:
+        # the tick store is keyed by the file content, it can't be stale
+        file_path = f"{path}/price_files/{file_name}"
+        columns = load_tick_store(file_path)
+        logger.info("Getting tick store data")
 
-            if previous_row != (last_price, last_price_datetime):
-                sanitized_data_list.append((last_price, last_price_datetime, index))
-                previous_row = (last_price, last_price_datetime)
-                index += 1
-
-            if rows != -1 and i == rows:
-                break
+        return tick_columns_to_list(columns, rows), RawLines.from_file(file_path, rows)
 
+    logger.info(f"reading text file {file_name}")
+    file_path = f"{path}/price_files/{file_name}"
+    columns, _ = read_tick_file_parallel(file_path, rows)
     logger.info("finished reading text file")
 
-    # to save the data in pickle, so we don't need to read the file again
-    # pickle.dump(
-    #     sanitized_data_list,
-    #     open(f"{path}/pickle_files/source/{file_name}.pickle", "wb"),
-    # )
-    # pickle.dump(
-    #     data_all_list, open(f"{path}/pickle_files/source/all_{file_name}.pickle", "wb")
-    # )
-    # logger.info("Data has been saved in pickle")
+    return tick_columns_to_list(columns), RawLines.from_file(file_path, rows)
 
-    return sanitized_data_list, data_all_list
 
+def read_tick_series(file_name: str, rows=-1) -> TickSeries:
+    """read_file_cleaned as a TickSeries over the memory-mapped tick store"""
+    columns = load_tick_store(f"{path}/price_files/{file_name}")
+    return TickSeries.from_columns(columns, rows)
 
 
 def get_price_time(time_string):
-    time_string = " ".join(time_string.split(" ")[:-1])
-    datetime_obj = datetime.strptime(time_string, "%Y%m%d %H%M%S")
-
-    # Set timezone to the current timezone
-    local_timezone = pytz.timezone("Europe/London")  # e.g., 'America/New_York'
-    aware_datetime_obj = local_timezone.localize(datetime_obj)
-
-    # Convert back to naive datetime
-    naive_datetime_obj = aware_datetime_obj.replace(tzinfo=None)
-
-    return naive_datetime_obj
+    # localize + replace(tzinfo=None) was the identity on the wall clock time
+    return parse_tick_time(time_string)
 
 
 VERSION="0.1.1"
@@ -4,7 +4,7 @@ import time
 from datetime import datetime
 from typing import Dict, Callable
 from app.services.orca_max.helpers.enums import ENVIRONMENT
-from app.services.orca_max.helpers.orca_helper import read_file_cleaned
+from app.services.orca_max.helpers.orca_helper import read_tick_series
 from app.services.orca_supabase.orca_supabase import stream_ticks_keyset
 from app.utils.logging_setup import logger
 
@@ -128,12 +128,11 @@ class RedisPriceProvider:
     def _file_stream_worker(self, instrument: str, price_file: str):
         """Simulate price stream from a file (dev environment)."""
         logger.info(f"Simulating price stream for {instrument} - Reading prices ...")
-        data, _ = read_file_cleaned(price_file + ".txt", rows=-1, cached=False)
+        data = read_tick_series(price_file + ".txt")
         logger.info(f"Read {len(data)} rows from {price_file}.txt")
-        for row in data:
+        for last_price in data.iter_prices():
             if not self.active_streams.get(instrument, False):
                 break
-            last_price = float(row[0])  # assuming last column is price
             with self.price_lock:
                 self.latest_prices[instrument] = last_price
             if instrument in self.price_callbacks:
@@ -2,16 +2,37 @@ import decimal
 from datetime import datetime
 from typing import Type, List, Dict, Any, Tuple
 
+from app.services.orca_max_backtesting.abc_jump import find_abc_points_jump
+from app.services.orca_max_backtesting.abc_kernel import find_abc_points, find_abc_points_bank
 from app.services.orca_max_backtesting.config import PointsDistance
-from app.services.orca_max_backtesting.helper import in_restricted_trading_hours
 from app.services.orca_max_backtesting.orca_enums import PointType
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_series import as_tick_series
 from app.utils.logging_setup import logger
 
+# "scan" visits every tick, "jump" skips from one state change to the next with
+# range extrema queries: quicker on quiet data, slower when the price is busy
+ABC_ENGINES = {
+    "scan": find_abc_points,
+    "jump": find_abc_points_jump,
+}
+
 
 class ABCFinder:
     def __init__(
-        self, points_distance: Type[PointsDistance], exit_strategy: str, team_way
+        self,
+        points_distance: Type[PointsDistance],
+        exit_strategy: str,
+        team_way,
+        calendar: SessionCalendar = None,
+        engine: str = "scan",
     ) -> None:
+        if engine not in ABC_ENGINES:
+            raise ValueError(f"Unknown ABC engine {engine}, expected one of {list(ABC_ENGINES)}")
+        self.calendar = calendar or SessionCalendar()
+        self.engine = engine
+        self.points_distance = points_distance
+        self.exit_strategy = exit_strategy
         self.abc_down = ForwardABC(points_distance, PointType.DOWN, exit_strategy)
         self.abc_up = ForwardABC(points_distance, PointType.UP, exit_strategy)
         logger.info(f"ABC Finder initialized with {points_distance}")
@@ -28,22 +49,13 @@ class ABCFinder:
         return False, {}
 
     def find(self, data) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-        down_order_points_list = []
-        up_order_points_list = []
-
-        for index, (price, time, i) in enumerate(data):
-            if in_restricted_trading_hours(time):
-                continue
-            down_result, down_abc_points = self._process(
-                self.abc_down, price, time, index
-            )
-            up_result, up_abc_points = self._process(self.abc_up, price, time, index)
+        data = as_tick_series(data)
 
-            if down_result:
-                down_order_points_list.append(down_abc_points)
-
-            if up_result:
-                up_order_points_list.append(up_abc_points)
+        # the ForwardABC machines of abc_down / abc_up run on the price array,
+        # the restricted trading hours are never visited
+        down_order_points_list, up_order_points_list = ABC_ENGINES[self.engine](
+            data, self.points_distance, self.exit_strategy, self.calendar
+        )
 
         logger.info(f"Found {len(down_order_points_list)} DOWN points")
         logger.info(f"Found {len(up_order_points_list)} UP points")
@@ -51,6 +63,32 @@ class ABCFinder:
         return down_order_points_list, up_order_points_list
 
 
+class ABCDetectorBank:
+    """
+    ABCFinder for several PointsDistance at once: the machines of all of them
+    advance together, so the ticks are traversed once for the whole sweep.
+    """
+
+    def __init__(
+        self,
+        points_distances: List[PointsDistance],
+        exit_strategy: str,
+        team_way,
+        calendar: SessionCalendar = None,
+    ) -> None:
+        self.calendar = calendar or SessionCalendar()
+        self.points_distances = list(points_distances)
+        self.exit_strategy = exit_strategy
+        logger.info(f"ABC detector bank initialized with {len(self.points_distances)} configs")
+
+    def find(self, data) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """(down_order_points_list, up_order_points_list) of every config, in order"""
+        data = as_tick_series(data)
+        results = find_abc_points_bank(data, self.points_distances, self.exit_strategy, self.calendar)
+        logger.info(f"Found {sum(len(down) + len(up) for down, up in results)} points for the bank")
+        return results
+
+
 class ForwardABC:
     def __init__(
         self,
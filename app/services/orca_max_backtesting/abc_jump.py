@@ -0,0 +1,153 @@
+"""
+ForwardABC by jumping from one state change to the next.
+
+Between two state changes a machine ignores the ticks, and which ticks change
+it is a price level test against its A / B points (a new extreme, a move of
+`ab` from A, a move of `bc` from B). So instead of visiting every tick the
+next change is found with RangeExtrema queries, and only the ticks found are
+run through the ForwardABC rules. On quiet data most of the ticks are never
+read.
+"""
+from math import inf, nextafter
+
+import numpy as np
+
+from app.services.orca_max_backtesting.abc_kernel import abc_point_dicts
+from app.services.orca_max_backtesting.orca_enums import PointType
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+
+# the ticks right after a change are tested one by one before querying the
+# extrema, on busy data the next change is usually among them
+PROBE_SIZE = 16
+
+
+def _lowest(condition, guess: float) -> float:
+    """Lowest float meeting a condition that holds from some level upwards"""
+    while not condition(guess):
+        guess = nextafter(guess, inf)
+    while condition(nextafter(guess, -inf)):
+        guess = nextafter(guess, -inf)
+    return guess
+
+
+def _highest(condition, guess: float) -> float:
+    """Highest float meeting a condition that holds from some level downwards"""
+    while not condition(guess):
+        guess = nextafter(guess, -inf)
+    while condition(nextafter(guess, inf)):
+        guess = nextafter(guess, inf)
+    return guess
+
+
+def _probe(prices: list, start: int, changes) -> tuple:
+    """The first of the next PROBE_SIZE ticks that changes the machine, (position or None, end of the probe)"""
+    end = min(start + PROBE_SIZE, len(prices))
+    for position in range(start, end):
+        if changes(prices[position]):
+            return position, end
+    return None, end
+
+
+def _jump_down(prices: list, extrema: RangeExtrema, ab, bc) -> list:
+    """(A, B, C) positions in `prices` of the patterns of ForwardABC._find_abc_down"""
+    points = []
+    a = b = 0.0
+    a_index = b_index = 0
+    position, size = 0, len(prices)
+    while position < size:
+        current = prices[position]
+        if current >= a:
+            a, a_index, b = current, position, 0.0
+        elif a - current >= ab and (current <= b or b == 0.0):
+            b, b_index = current, position
+        elif b != 0.0 and current - b >= bc:
+            points.append((a_index, b_index, position))
+            a = b = 0.0
+
+        if a == 0.0:
+            position += 1
+        elif b == 0.0:
+            # a new high, or a drop of ab from A; a tick at A only moves A_index,
+            # it is set to the last one before the drop
+            position, start = _probe(prices, position + 1, lambda price: price > a or a - price >= ab)
+            if position is None:
+                b_level = _highest(lambda price: a - price >= ab, a - ab)
+                position = min(extrema.first_above(start, a), extrema.first_at_or_below(start, b_level))
+            if position < size and prices[position] <= a:
+                a_index = max(a_index, extrema.last_at_or_above(a_index + 1, position, a))
+        else:
+            # a new A, a new B below it, or a rise of bc from B; a tick at B only
+            # moves B_index, it is set to the last one before C
+            position, start = _probe(prices, position + 1, lambda price: price >= a or price < b or price - b >= bc)
+            if position is None:
+                c_level = _lowest(lambda price: price - b >= bc, b + bc)
+                position = min(extrema.first_at_or_above(start, min(a, c_level)), extrema.first_below(start, b))
+            if position < size and b < prices[position] < a:
+                b_index = max(b_index, extrema.last_at_or_below(b_index + 1, position, b))
+    return points
+
+
+def _jump_up(prices: list, extrema: RangeExtrema, ab, bc) -> list:
+    """(A, B, C) positions in `prices` of the patterns of ForwardABC._find_abc_up"""
+    points = []
+    a = b = 0.0
+    a_index = b_index = 0
+    position, size = 0, len(prices)
+    while position < size:
+        current = prices[position]
+        if current <= a or a == 0.0:
+            a, a_index, b = current, position, 0.0
+        elif current - a >= ab and (current >= b or b == 0.0):
+            b, b_index = current, position
+        elif b != 0.0 and b - current >= bc:
+            points.append((a_index, b_index, position))
+            a = b = 0.0
+
+        if a == 0.0:
+            position += 1
+        elif b == 0.0:
+            position, start = _probe(prices, position + 1, lambda price: price < a or price - a >= ab)
+            if position is None:
+                b_level = _lowest(lambda price: price - a >= ab, a + ab)
+                position = min(extrema.first_below(start, a), extrema.first_at_or_above(start, b_level))
+            if position < size and prices[position] >= a:
+                a_index = max(a_index, extrema.last_at_or_below(a_index + 1, position, a))
+        else:
+            position, start = _probe(prices, position + 1, lambda price: price <= a or price > b or b - price >= bc)
+            if position is None:
+                c_level = _highest(lambda price: b - price >= bc, b - bc)
+                position = min(extrema.first_at_or_below(start, max(a, c_level)), extrema.first_above(start, b))
+            if position < size and a < prices[position] < b:
+                b_index = max(b_index, extrema.last_at_or_above(b_index + 1, position, b))
+    return points
+
+
+def jump_abc(price: np.ndarray, tradable: np.ndarray, ab, bc) -> tuple:
+    """
+    scan_abc by threshold jumps: (A, B, C) positions of the DOWN and UP patterns
+    as two (n, 3) int64 arrays. `tradable` masks the ticks the machines see.
+    """
+    positions = np.flatnonzero(tradable)
+    prices = np.asarray(price, dtype=np.float64)[positions]
+    extrema = RangeExtrema(prices)
+    # the rules and the probes read single prices, quicker from a list
+    prices = prices.tolist()
+
+    results = []
+    for jump in (_jump_down, _jump_up):
+        points = np.array(jump(prices, extrema, ab, bc), dtype=np.int64).reshape(-1, 3)
+        results.append(positions[points])
+    return tuple(results)
+
+
+def find_abc_points_jump(series, points_distance, exit_strategy, calendar: SessionCalendar = None) -> tuple:
+    """find_abc_points with the threshold jump engine, the same dicts tick for tick"""
+    calendar = calendar or SessionCalendar()
+    down_points, up_points = jump_abc(
+        series.price, calendar.tradable_mask(series), points_distance.ab, points_distance.bc
+    )
+    return (
+        abc_point_dicts(series, down_points, PointType.DOWN, exit_strategy, points_distance),
+        abc_point_dicts(series, up_points, PointType.UP, exit_strategy, points_distance),
+    )
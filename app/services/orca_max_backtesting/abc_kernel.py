@@ -0,0 +1,283 @@
+"""
+ForwardABC as a single scan over the price array.
+
+Both the DOWN and the UP state machines advance in the same loop over a
+contiguous float64 price array and only the positions of the A, B and C ticks of
+every pattern are written out. The loop is compiled with numba when it is
+installed, otherwise it runs as plain Python over the prices as a list.
+"""
+import numpy as np
+
+from app.services.orca_max_backtesting.orca_enums import PointType
+from app.services.orca_max_backtesting.progress import report_progress
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# the prices are scanned this many at a time, it bounds the output buffers
+SCAN_CHUNK_SIZE = 1 << 20
+
+# state vector of the two machines
+DOWN_A, DOWN_B, UP_A, UP_B = range(4)
+# columns of the patterns found by the bank
+BANK_MACHINE, BANK_DIRECTION, BANK_A, BANK_B, BANK_C = range(5)
+DIRECTION_DOWN, DIRECTION_UP = 0, 1
+
+
+def _scan_abc(price, offset, ab, bc, state, state_index, down_points, up_points):
+    """
+    Runs the DOWN and UP machines of ForwardABC over `price`, whose first tick is
+    at position `offset` of the series. The machines start from and are saved to
+    `state` (prices) / `state_index` (positions). The (A, B, C) positions of the
+    patterns found are written to down_points / up_points.
+
+    :return: (number of DOWN patterns, number of UP patterns)
+    """
+    down_a, down_b = float(state[DOWN_A]), float(state[DOWN_B])
+    up_a, up_b = float(state[UP_A]), float(state[UP_B])
+    down_a_index, down_b_index = int(state_index[DOWN_A]), int(state_index[DOWN_B])
+    up_a_index, up_b_index = int(state_index[UP_A]), int(state_index[UP_B])
+    down_count = 0
+    up_count = 0
+
+    for i in range(len(price)):
+        current = price[i]
+        position = offset + i
+
+        # ForwardABC._find_abc_down
+        if current >= down_a:
+            down_a, down_a_index, down_b = current, position, 0.0
+        elif down_a - current >= ab and (current <= down_b or down_b == 0.0):
+            down_b, down_b_index = current, position
+        elif down_b != 0.0 and current - down_b >= bc:
+            down_points[down_count, 0] = down_a_index
+            down_points[down_count, 1] = down_b_index
+            down_points[down_count, 2] = position
+            down_count += 1
+            down_a, down_b = 0.0, 0.0
+
+        # ForwardABC._find_abc_up
+        if current <= up_a or up_a == 0.0:
+            up_a, up_a_index, up_b = current, position, 0.0
+        elif current - up_a >= ab and (current >= up_b or up_b == 0.0):
+            up_b, up_b_index = current, position
+        elif up_b != 0.0 and up_b - current >= bc:
+            up_points[up_count, 0] = up_a_index
+            up_points[up_count, 1] = up_b_index
+            up_points[up_count, 2] = position
+            up_count += 1
+            up_a, up_b = 0.0, 0.0
+
+    state[DOWN_A], state[DOWN_B], state[UP_A], state[UP_B] = down_a, down_b, up_a, up_b
+    state_index[DOWN_A], state_index[DOWN_B] = down_a_index, down_b_index
+    state_index[UP_A], state_index[UP_B] = up_a_index, up_b_index
+    return down_count, up_count
+
+
+def _scan_abc_bank(price, offset, ab, bc, state, state_index, points):
+    """
+    _scan_abc for many (ab, bc) machines at once: every tick advances all of
+    them. The state is kept as one array per field (`state` holds the down_a,
+    down_b, up_a, up_b arrays, `state_index` their positions), indexed by machine.
+    A pattern is written as a (machine, direction, A, B, C) row of `points`.
+
+    :return: the number of patterns found
+    """
+    down_a, down_b, up_a, up_b = state
+    down_a_index, down_b_index, up_a_index, up_b_index = state_index
+    machines = len(ab)
+    count = 0
+
+    for i in range(len(price)):
+        current = price[i]
+        position = offset + i
+        for machine in range(machines):
+            if current >= down_a[machine]:
+                down_a[machine], down_a_index[machine], down_b[machine] = current, position, 0.0
+            elif down_a[machine] - current >= ab[machine] and (current <= down_b[machine] or down_b[machine] == 0.0):
+                down_b[machine], down_b_index[machine] = current, position
+            elif down_b[machine] != 0.0 and current - down_b[machine] >= bc[machine]:
+                points[count, 0] = machine
+                points[count, 1] = DIRECTION_DOWN
+                points[count, 2] = down_a_index[machine]
+                points[count, 3] = down_b_index[machine]
+                points[count, 4] = position
+                count += 1
+                down_a[machine], down_b[machine] = 0.0, 0.0
+
+            if current <= up_a[machine] or up_a[machine] == 0.0:
+                up_a[machine], up_a_index[machine], up_b[machine] = current, position, 0.0
+            elif current - up_a[machine] >= ab[machine] and (current >= up_b[machine] or up_b[machine] == 0.0):
+                up_b[machine], up_b_index[machine] = current, position
+            elif up_b[machine] != 0.0 and up_b[machine] - current >= bc[machine]:
+                points[count, 0] = machine
+                points[count, 1] = DIRECTION_UP
+                points[count, 2] = up_a_index[machine]
+                points[count, 3] = up_b_index[machine]
+                points[count, 4] = position
+                count += 1
+                up_a[machine], up_b[machine] = 0.0, 0.0
+
+    return count
+
+
+_scan_abc_compiled = njit(cache=True, nogil=True)(_scan_abc) if njit else None
+_scan_abc_bank_compiled = njit(cache=True, nogil=True)(_scan_abc_bank) if njit else None
+
+
+def scan_abc(price: np.ndarray, ranges, ab, bc) -> tuple:
+    """
+    (A, B, C) positions of the DOWN and UP patterns ABCFinder.find finds, as two
+    (n, 3) int64 arrays. Only the ticks of the (start, stop) `ranges` are
+    visited, the state carries over the ticks in between.
+    """
+    state = np.zeros(4, dtype=np.float64)
+    state_index = np.zeros(4, dtype=np.int64)
+    down_parts, up_parts = [], []
+
+    for start, stop in ranges:
+        for chunk_start in range(start, stop, SCAN_CHUNK_SIZE):
+            chunk = np.ascontiguousarray(price[chunk_start:min(chunk_start + SCAN_CHUNK_SIZE, stop)], dtype=np.float64)
+            # a chunk can't hold more patterns than that, every one needs a new B and C tick
+            size = len(chunk) // 2 + 1
+            down_points = np.zeros((size, 3), dtype=np.int64)
+            up_points = np.zeros((size, 3), dtype=np.int64)
+            if _scan_abc_compiled is not None:
+                down_count, up_count = _scan_abc_compiled(
+                    chunk, chunk_start, float(ab), float(bc), state, state_index, down_points, up_points
+                )
+            else:
+                down_count, up_count = _scan_abc(
+                    chunk.tolist(), chunk_start, ab, bc, state, state_index, down_points, up_points
+                )
+            down_parts.append(down_points[:down_count])
+            up_parts.append(up_points[:up_count])
+            report_progress("detection", chunk_start + len(chunk), len(price))
+
+    empty = np.zeros((0, 3), dtype=np.int64)
+    return (
+        np.concatenate(down_parts) if down_parts else empty,
+        np.concatenate(up_parts) if up_parts else empty,
+    )
+
+
+def scan_abc_bank(price: np.ndarray, ranges, ab_values, bc_values) -> list:
+    """
+    scan_abc for several (ab, bc) pairs in a single pass over the prices.
+
+    :return: a (DOWN, UP) pair of (n, 3) position arrays per pair
+    """
+    machines = len(ab_values)
+    compiled = _scan_abc_bank_compiled is not None
+    if compiled:
+        ab, bc = np.array(ab_values, dtype=np.float64), np.array(bc_values, dtype=np.float64)
+        state = tuple(np.zeros(machines, dtype=np.float64) for _ in range(4))
+        state_index = tuple(np.zeros(machines, dtype=np.int64) for _ in range(4))
+    else:
+        # the plain Python loop is quicker on lists than on array items
+        ab, bc = list(ab_values), list(bc_values)
+        state = tuple([0.0] * machines for _ in range(4))
+        state_index = tuple([0] * machines for _ in range(4))
+
+    # the output buffer holds up to a pattern every two ticks for every machine
+    chunk_size = max(1, SCAN_CHUNK_SIZE // max(machines, 1))
+    parts = []
+    for start, stop in ranges:
+        for chunk_start in range(start, stop, chunk_size):
+            chunk = np.ascontiguousarray(price[chunk_start:min(chunk_start + chunk_size, stop)], dtype=np.float64)
+            points = np.zeros((machines * (len(chunk) // 2 + 1), 5), dtype=np.int64)
+            if compiled:
+                count = _scan_abc_bank_compiled(chunk, chunk_start, ab, bc, state, state_index, points)
+            else:
+                count = _scan_abc_bank(chunk.tolist(), chunk_start, ab, bc, state, state_index, points)
+            parts.append(points[:count])
+            report_progress("detection", chunk_start + len(chunk), len(price))
+
+    points = np.concatenate(parts) if parts else np.zeros((0, 5), dtype=np.int64)
+    result = []
+    for machine in range(machines):
+        of_machine = points[points[:, BANK_MACHINE] == machine]
+        result.append(
+            tuple(
+                of_machine[of_machine[:, BANK_DIRECTION] == direction][:, BANK_A:]
+                for direction in (DIRECTION_DOWN, DIRECTION_UP)
+            )
+        )
+    return result
+
+
+def format_times(ts: np.ndarray) -> list:
+    """strftime("%Y-%m-%d %H:%M:%S") of epoch-ns values"""
+    return np.char.replace(np.datetime_as_string(ts.astype("datetime64[ns]").astype("datetime64[s]")), "T", " ").tolist()
+
+
+def abc_point_dicts(series, points: np.ndarray, point_type: PointType, exit_strategy, points_distance) -> list:
+    """The dicts of ForwardABC.get_point_data for the (A, B, C) positions of scan_abc"""
+    if not len(points):
+        return []
+    a_index, b_index, c_index = points[:, 0], points[:, 1], points[:, 2]
+    prices = [series.price[index].tolist() for index in (a_index, b_index, c_index)]
+    times = [format_times(series.ts[index]) for index in (a_index, b_index, c_index)]
+
+    return [
+        {
+            "Type": point_type.value,
+            "Exit": exit_strategy,
+            "BC_Distance": points_distance.bc,
+            "A": a,
+            "B": b,
+            "C": c,
+            "Order_point": c + points_distance.order_point,
+            "A_time": a_time,
+            "B_time": b_time,
+            "C_time": c_time,
+            "A_index": a_i,
+            "C_index": c_i,
+            "B_index": b_i,
+        }
+        for a, b, c, a_time, b_time, c_time, a_i, b_i, c_i in zip(
+            *prices, *times, a_index.tolist(), b_index.tolist(), c_index.tolist()
+        )
+    ]
+
+
+def find_abc_points_bank(series, points_distances: list, exit_strategy, calendar: SessionCalendar = None) -> list:
+    """
+    find_abc_points for several configs in one pass over the ticks. The configs
+    sharing (ab, bc) share a machine, the order point only changes the dicts.
+
+    :return: a (DOWN point dicts, UP point dicts) pair per config
+    """
+    calendar = calendar or SessionCalendar()
+    pairs = list(dict.fromkeys((points_distance.ab, points_distance.bc) for points_distance in points_distances))
+    machine_points = scan_abc_bank(
+        series.price,
+        calendar.tradable_ranges(series).tolist(),
+        [ab for ab, _ in pairs],
+        [bc for _, bc in pairs],
+    )
+    results = []
+    for points_distance in points_distances:
+        down_points, up_points = machine_points[pairs.index((points_distance.ab, points_distance.bc))]
+        results.append(
+            (
+                abc_point_dicts(series, down_points, PointType.DOWN, exit_strategy, points_distance),
+                abc_point_dicts(series, up_points, PointType.UP, exit_strategy, points_distance),
+            )
+        )
+    return results
+
+
+def find_abc_points(series, points_distance, exit_strategy, calendar: SessionCalendar = None) -> tuple:
+    """ABCFinder.find on the arrays: (DOWN point dicts, UP point dicts)"""
+    calendar = calendar or SessionCalendar()
+    down_points, up_points = scan_abc(
+        series.price, calendar.tradable_ranges(series).tolist(), points_distance.ab, points_distance.bc
+    )
+    return (
+        abc_point_dicts(series, down_points, PointType.DOWN, exit_strategy, points_distance),
+        abc_point_dicts(series, up_points, PointType.UP, exit_strategy, points_distance),
+    )
@@ -1,4 +1,5 @@
 import json
+import os
 from typing import Tuple
 
 # from orcaven.algorithm.abc_validator.abc_validator import ABCValidator
@@ -7,11 +8,15 @@ from typing import Tuple
 #
 # from orcaven.clients.logger.logger import config_logging
 # from orcaven.decorators.timing.time import time_it
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from app.services.orca_max_backtesting.abc_validator import ABCValidator
+from app.services.orca_max_backtesting.exit_grid import ExitGrid
 from app.services.orca_max_backtesting.helper import export_dict_to_csv
 from app.services.orca_max_backtesting.orca_enums import TeamWay, TradingPosition
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_series import as_tick_series
+from app.utils.decorators.parallel import Parallel
 from app.utils.decorators.timing.time import time_it
 from app.utils.logging_setup import logger
 
@@ -30,10 +35,20 @@ class ABCStrategyTester:
         abc_points: dict,
         output_folder_path: str,
         config: dict,
+        tradable_ranges=None,
+        extrema: RangeExtrema = None,
     ) -> None:
         self.symbol = symbol
         self.team_way = team_way
-        self.data = data  # data is a list of tuples
+        self.data = as_tick_series(data)  # shared by the long and short validators
+        # the ranges and the extrema only depend on the data, testers of the same data can share them
+        calendar = SessionCalendar.for_instrument(symbol)
+        if tradable_ranges is None:
+            tradable_ranges = calendar.tradable_ranges(self.data)
+        if extrema is None:
+            extrema = RangeExtrema(self.data.price, calendar.tradable_mask(self.data))
+        self.tradable_ranges = tradable_ranges
+        self.extrema = extrema
         self.exit_strategy = exit_strategy
         self.exit_strategy_name = exit_strategy_key
         self.down_order_points_list = abc_points["down_order_points_list"]
@@ -53,39 +68,26 @@ class ABCStrategyTester:
             }
         }  # To store results from validate calls
 
-        long_list, short_list = self.get_o_points_list()
         logger.info("ABC validation has started ...")
 
-        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
-            futures = {
-                executor.submit(
-                    self.validate,
-                    long_list,
-                    TradingPosition.Long,
-                    self.team_way,
-                    output_folder_path=self.output_folder_path,
-                ): TradingPosition.Long,
-                executor.submit(
-                    self.validate,
-                    short_list,
-                    TradingPosition.Short,
-                    self.team_way,
-                    output_folder_path=self.output_folder_path,
-                ): TradingPosition.Short,
-            }
+        sides = [TradingPosition.Long, TradingPosition.Short]
+        if (os.cpu_count() or 1) >= WORKERS:
+            # the validation is CPU bound python, threads would take turns on the GIL: every side gets
+            # a process of the pool, the tester (its ticks and extrema) goes to them once by shared memory.
+            # The progress reporter is thread-local and can't be pickled (a job's is a queue), so the workers
+            # report to the one they inherited: the pool is forked by the job's process on its first use
+            validated = Parallel.processes(iterable=sides, processes=WORKERS)(self._validate_side)()
+        else:
+            validated = [self._validate_side(points_type) for points_type in sides]
 
-            order_points_completed_dict = {}
-            for future in as_completed(futures):
-                points_type = futures[future]
-                try:
-                    result, order_points_completed = (
-                        future.result()
-                    )  # Block until the thread completes and result is available
-                    results[self.exit_strategy_name][points_type.value] = result
-                    order_points_completed_dict[points_type.value] = order_points_completed
-                except Exception as e:
-                    logger.error(f"Validation raised an exception: {e}")
-                    results[self.exit_strategy_name][points_type.value] = None
+        order_points_completed_dict = {}
+        for points_type, side in zip(sides, validated):
+            if side is None:
+                results[self.exit_strategy_name][points_type.value] = None
+                continue
+            result, order_points_completed = side
+            results[self.exit_strategy_name][points_type.value] = result
+            order_points_completed_dict[points_type.value] = order_points_completed
 
         logger.info(f"AbcTaster done")
 
@@ -94,6 +96,54 @@ class ABCStrategyTester:
 
         return results, order_points_completed_dict
 
+    @time_it
+    def analyse_grid(self, exit_strategies: dict) -> Tuple[dict, dict]:
+        """
+        analyse for every exit strategy of `exit_strategies`, e.g. get_exit_strategies(True).
+        The orders of a side are triggered once and closed for all the TP / SL
+        pairs by one ExitGrid, the validators only register the outcomes.
+
+        :return: the results and the completed order points, keyed by exit strategy
+        """
+        logger.info(f"Analyse abc started for {len(exit_strategies)} exit strategies")
+        long_list, short_list = self.get_o_points_list()
+
+        grids = {}
+        for order_points, points_type in ((long_list, TradingPosition.Long), (short_list, TradingPosition.Short)):
+            exits = [exit_strategy[points_type.value] for exit_strategy in exit_strategies.values()]
+            grids[points_type] = order_points, ExitGrid(
+                self.extrema,
+                order_points,
+                points_type,
+                self.team_way,
+                [exit_["TP"] for exit_ in exits],
+                [exit_["SL"] for exit_ in exits],
+            )
+
+        results, order_points_completed_dict = {}, {}
+        for exit_strategy_key, exit_strategy in exit_strategies.items():
+            results[exit_strategy_key] = {}
+            order_points_completed_dict[exit_strategy_key] = {}
+            for points_type, (order_points, grid) in grids.items():
+                exit_ = exit_strategy[points_type.value]
+                # the validators fill the rows, every strategy gets its own copies
+                rows = [dict(row, Exit=exit_strategy_key) for row in order_points]
+                result, order_points_completed = self.validate(
+                    rows,
+                    points_type,
+                    self.team_way,
+                    output_folder_path=self.output_folder_path,
+                    exit_strategy=exit_strategy,
+                    passages=grid.passages(exit_["TP"], exit_["SL"]),
+                )
+                results[exit_strategy_key][points_type.value] = result
+                order_points_completed_dict[exit_strategy_key][points_type.value] = order_points_completed
+
+        self.export_analyzed_results(results, self.output_folder_path)
+        logger.info("Analyzed results exported")
+
+        return results, order_points_completed_dict
+
     def export_analyzed_results(self, results, output_folder_path):
         export_dict_to_csv([results], f"{output_folder_path}/analyzed_result.csv")
         json.dump(
@@ -112,17 +162,41 @@ class ABCStrategyTester:
             short_list = self.up_order_points_list
         return long_list, short_list
 
+    def _validate_side(self, points_type: TradingPosition):
+        """validate of the order points of one side for analyse, None if it raised"""
+        long_list, short_list = self.get_o_points_list()
+        order_points = long_list if points_type == TradingPosition.Long else short_list
+        try:
+            return self.validate(
+                order_points,
+                points_type,
+                self.team_way,
+                output_folder_path=self.output_folder_path,
+            )
+        except Exception as e:
+            # logged where it happened, a worker's traceback doesn't reach the parent
+            logger.opt(exception=e).error(f"Validation of the {points_type.value} side raised an exception: {e}")
+            return None
+
     def validate(
-        self, order_points, points_type: TradingPosition, team_way, output_folder_path
+        self,
+        order_points,
+        points_type: TradingPosition,
+        team_way,
+        output_folder_path,
+        exit_strategy: dict = None,
+        passages=None,
     ):
         validator = ABCValidator(
             order_points,
             self.data,
             points_type=points_type,
-            exit_strategy=self.exit_strategy,
+            exit_strategy=exit_strategy or self.exit_strategy,
             team_way=team_way,
             symbol=self.symbol,
             output_folder_path=output_folder_path,
             config=self.config,
+            tradable_ranges=self.tradable_ranges,
+            extrema=self.extrema,
         )
-        return validator.validate()
+        return validator.validate(passages)
@@ -1,11 +1,18 @@
 import pickle
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
 from app.services.orca_max_backtesting.config import TICK_PRICES
-from app.services.orca_max_backtesting.helper import in_restricted_trading_hours, read_order_points_csv
+from app.services.orca_max_backtesting.equity_curve import EquityCurveAccumulator
+from app.services.orca_max_backtesting.helper import read_order_points_csv
 from app.services.orca_max_backtesting.orca_enums import TradingPosition, OrderStatus, TeamWay
+from app.services.orca_max_backtesting.progress import report_progress
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar, ranges_mask
+from app.services.orca_max_backtesting.tick_codec import datetime_to_seconds
+from app.services.orca_max_backtesting.tick_series import as_tick_series
 from app.services.orca_max_backtesting.trade_analyzer import TradeAnalyzer
 # from orcaven.algorithm.abc_validator.config import TICK_PRICES
 #
@@ -39,10 +46,22 @@ class ABCValidator:
         symbol,
         output_folder_path,
         config: dict,
+        calendar: SessionCalendar = None,
+        tradable_ranges=None,
+        extrema: RangeExtrema = None,
     ):
         self.output_folder_path = output_folder_path
         self.order_points = order_points
-        self.NT_data = NT_data
+        self.NT_data = as_tick_series(NT_data)
+        # the ranges can be shared by the validators of the same data
+        if tradable_ranges is None:
+            calendar = calendar or SessionCalendar.for_instrument(symbol)
+            tradable_ranges = calendar.tradable_ranges(self.NT_data)
+        self.tradable_ranges = tradable_ranges
+        # the first passage queries of the orders, can be shared like the ranges
+        if extrema is None:
+            extrema = RangeExtrema(self.NT_data.price, ranges_mask(tradable_ranges, len(self.NT_data)))
+        self.extrema = extrema
         self.symbol = symbol
         self.team_way = team_way
 
@@ -67,9 +86,6 @@ class ABCValidator:
             self.result = exit_strategy["Short"]
 
 
-        self.temp_max_drawdown = 0
-        self.max_drawdown_val = 0
-
         self.TP = self.result["TP"]
         self.SL = self.result["SL"]
         self.result["LOOSING_TRADES"] = 0
@@ -84,6 +100,8 @@ class ABCValidator:
             ]
         )
         self.tick_price = TICK_PRICES[self.symbol]
+        # the drawdown and the other risk metrics of the closed trades
+        self.equity_curve = EquityCurveAccumulator(dtype=np.result_type(self.TP, self.SL, self.tick_price))
 
     def analyze_results(self):
         self.analyzer = TradeAnalyzer(
@@ -95,10 +113,17 @@ class ABCValidator:
         )
         return self.analyzer.calculate_profit()
 
-    def validate(self):
-
-        for row in self.order_points:
-            self._validate_order(row)
+    def validate(self, passages=None):
+        """
+        :param passages: (triggered, closed) positions of the orders found beforehand,
+            e.g. by an ExitGrid, instead of querying them order by order
+        """
+        if passages is None:
+            for row in self.order_points:
+                self._validate_order(row)
+        else:
+            for row, triggered_at, closed_at in zip(self.order_points, *(p.tolist() for p in passages)):
+                self._validate_order(row, (triggered_at, closed_at))
 
         analyze_results = self.analyze_results()
 
@@ -107,47 +132,69 @@ class ABCValidator:
 
         return self.result, self.order_points
 
-    def _validate_order(self, row):
-        order_point_triggered = False
+    def _validate_order(self, row, passage=None):
         c_i = row["C_index"]
         order_point = row["Order_point"]
         quantity = 1
-        for price, time, index in self.NT_data[c_i:]:
-
-            if in_restricted_trading_hours(time):
-                continue
-
-            if not order_point_triggered:
-                if self._trigger_condition(price, order_point):
-                    # logger.info(f"Triggered order point {order_point}, now validate")
-                    order_point_triggered = True
-                    row["Triggered_index"] = index
-                    row["Triggered"] = time
-            else:
+        report_progress(f"validation {self.pointType.value}", c_i, self.extrema.size)
+        # the first tradable tick crossing the order point from C on, then the
+        # first one after it reaching TP or SL, without visiting the ticks between
+        if passage is None:
+            triggered_at = self._first_trigger(c_i, order_point)
+            closed_at = None
+        else:
+            triggered_at, closed_at = passage
+        if triggered_at < self.extrema.size:
+            row["Triggered_index"] = int(self.NT_data.index[triggered_at])
+            row["Triggered"] = self.NT_data.time_at(triggered_at)
+
+            if closed_at is None:
+                closed_at = self._first_exit(triggered_at + 1, order_point)
+            if closed_at < self.extrema.size:
+                price, time, index = self.NT_data[closed_at]
                 _result = self.validate_func(price, order_point)
-                if _result:
-                    trade_result = self.reg_result(
-                        _result, price, quantity, row, time, index
-                    )
-
-                    row["TradeResult"] = trade_result
-                    row["TradeResult"] = trade_result
-                    row["TradeResultAccumulation"] = self.previous_trade_result
-
-                    row["WonTradeConsecutiveSum"] = self.won_trade_consecutive_sum
-                    row["WonTradeConsecutive"] = self.won_trade_consecutive_count
-                    # row["MaxDrawDown"] = self.max_drawdown_val
-
-                    row["LostTradeConsecutiveSum"] = (
-                        self.lost_trade_consecutive_sum * -1
-                    )
-                    row["LostTradeConsecutive"] = self.lost_trade_consecutive_count
-                    return
-
-        row["Triggered"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                trade_result = self.reg_result(
+                    _result, price, quantity, row, time, index
+                )
+
+                row["TradeResult"] = trade_result
+                row["TradeResultAccumulation"] = self.previous_trade_result
+
+                row["WonTradeConsecutiveSum"] = self.won_trade_consecutive_sum
+                row["WonTradeConsecutive"] = self.won_trade_consecutive_count
+
+                row["LostTradeConsecutiveSum"] = (
+                    self.lost_trade_consecutive_sum * -1
+                )
+                row["LostTradeConsecutive"] = self.lost_trade_consecutive_count
+                return
+
+        # the order is still open at the last tick of the data, restricted or not
+        if len(self.NT_data):
+            row["Triggered"] = self.NT_data.time_at(-1).strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            row["Triggered"] = None
         row["Result"] = OrderStatus.NotTriggered.value
         self.result["NotTriggered"] += 1
 
+    def _first_trigger(self, start, order_point):
+        """Position of the first tick from start meeting _trigger_condition, extrema.size if none"""
+        long = self.validate_func == self._validate_long
+        if long == (self.team_way == TeamWay.BreakThrough):
+            return self.extrema.first_at_or_above(start, order_point)
+        return self.extrema.first_at_or_below(start, order_point)
+
+    def _first_exit(self, start, order_point):
+        """Position of the first tick from start meeting validate_func, extrema.size if none"""
+        if self.validate_func == self._validate_long:
+            above, below = order_point + self.TP, order_point - self.SL
+        else:
+            above, below = order_point + self.SL, order_point - self.TP
+        return min(
+            self.extrema.first_at_or_above(start, above),
+            self.extrema.first_at_or_below(start, below),
+        )
+
     def reg_result(self, _result, price, quantity, row, time, closed_index):
         row["Closed"] = time.strftime("%Y-%m-%d %H:%M:%S")
         # row["TradeSpan"] = time - row["Triggered"]
@@ -182,6 +229,7 @@ class ABCValidator:
             self.won_trade_consecutive_sum = 0
             self.lost_trade_consecutive_sum += _trade_result * -1
 
+        self.equity_curve.add(_trade_result, datetime_to_seconds(time))
         return _trade_result
 
     def _validate_short(self, price, order_point):
@@ -294,6 +342,7 @@ class ABCValidator:
 
     def finalize_results(self, analyze_results):
         c = True
+        metrics = self.equity_curve.metrics()
         for consecutive_reach, result in analyze_results.items():
             win = result["Won_trades"]
             lost = result["Lost_trades"]
@@ -307,12 +356,10 @@ class ABCValidator:
                 result["NetProfit"] = "${:,}".format(total)
                 result["Profit"] = "${:,}".format(won_amount)
                 result["Loss"] = "${:,}".format(lost_amount)
-                result["MaxDrawDown"] = "${:,}".format(self.max_drawdown_val)
+                result["MaxDrawDown"] = "${:,}".format(metrics["MaxConsecutiveLoss"])
 
         self.result.update(analyze_results)
-
-    def max_drawdown_tracker(self, max_drawdown):
-        self.max_drawdown_val = max(self.max_drawdown_val, max(self.lost_trade_consecutive_sum, max_drawdown))
+        self.result["Metrics"] = metrics
 
     def get_trade_result_in_general(self, key, value):
         # if it runs without enhancement, it will be removed
@@ -321,19 +368,13 @@ class ABCValidator:
         if self.pointType == TradingPosition.Long:
             if key == "WINNING_TRADES":
                 profit = value * (self.TP * self.tick_price)
-                self.temp_max_drawdown = 0
             elif key == "LOOSING_TRADES":
                 lost = value * (self.SL * self.tick_price)
-                self.temp_max_drawdown += lost
-                self.max_drawdown_tracker(self.temp_max_drawdown)
         else:
             if key == "WINNING_TRADES":
                 profit = value * (self.TP * self.tick_price)
-                self.temp_max_drawdown = 0
             elif key == "LOOSING_TRADES":
                 lost = value * (self.SL * self.tick_price)
-                self.temp_max_drawdown += lost
-                self.max_drawdown_tracker(self.temp_max_drawdown)
 
         return lost, profit
 
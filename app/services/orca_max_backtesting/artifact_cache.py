@@ -0,0 +1,216 @@
+import contextlib
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+
+from app.services.orca_max_backtesting.config import (
+    ARTIFACT_CACHE_MAX_BYTES,
+    BACKTEST_CACHE_MAX_BYTES,
+    BACKTEST_CACHE_TTL,
+    ENGINE_VERSION,
+)
+from app.services.orca_max_backtesting.tick_series import as_tick_series
+from app.utils.logging_setup import logger
+
+ARTIFACT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifact_cache")
+BACKTEST_CACHE_DIR = os.path.join(ARTIFACT_CACHE_DIR, "backtests")
+HASH_CHUNK_SIZE = 1 << 20
+
+# the value types a records column can hold, a column keeps a single one
+RECORD_TYPES = (bool, int, float, str)
+# the two lists of ABCFinder.find
+ABC_POINTS_LISTS = ["down_order_points_list", "up_order_points_list"]
+# the creation time of the entries of a cache with a TTL, and the JSON of put_json
+CREATED_ARRAY, JSON_ARRAY = "_created", "_json"
+
+
+def dataset_fingerprint(data) -> str:
+    """blake2b of the tick columns, the same ticks give the same fingerprint whatever file they came from"""
+    series = as_tick_series(data)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(series)).encode())
+    for column in (series.price, series.ts, series.index):
+        column = np.ascontiguousarray(column)
+        for start in range(0, len(column), HASH_CHUNK_SIZE):
+            digest.update(column[start:start + HASH_CHUNK_SIZE].tobytes())
+    return digest.hexdigest()
+
+
+def records_to_columns(name: str, records: list) -> dict:
+    """
+    A list of flat dicts (all with the same keys) as one array per key, None if a
+    value isn't a plain bool/int/float/str or a key holds several types.
+    """
+    keys = list(records[0]) if records else []
+    columns = {f"{name}.keys": np.array(keys, dtype=str)}
+    for key in keys:
+        values = [record[key] for record in records]
+        value_type = type(values[0])
+        if value_type not in RECORD_TYPES or any(type(value) is not value_type for value in values):
+            return None
+        columns[f"{name}.{key}"] = np.array(values, dtype=value_type)
+    return columns
+
+
+def columns_to_records(name: str, columns: dict) -> list:
+    keys = columns[f"{name}.keys"].tolist()
+    values = [columns[f"{name}.{key}"].tolist() for key in keys]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def _remove(path: str) -> None:
+    # another process may have removed it first
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache of computed artifacts (e.g. the ABC points of a dataset).
+
+    An entry is an .npz of plain arrays, read with allow_pickle=False. Its key
+    hashes everything the artifact depends on plus ENGINE_VERSION, so a
+    replaced file or a changed engine is a miss, never a stale hit. The least
+    recently used entries are dropped once the cache is above max_bytes, and
+    with a ttl (seconds) the ones written longer ago than that are misses.
+    """
+
+    def __init__(
+        self, cache_dir: str = ARTIFACT_CACHE_DIR, max_bytes: int = ARTIFACT_CACHE_MAX_BYTES, ttl: float = None
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    @staticmethod
+    def key(kind: str, **parts) -> str:
+        payload = json.dumps({"kind": kind, "engine": ENGINE_VERSION, **parts}, sort_keys=True, default=str)
+        return f"{kind}_{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key: str):
+        """
+        The arrays of an entry, None on a miss. Other processes share the cache,
+        an entry can be evicted by one of them at any point: that is a miss too.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                arrays = {name: saved[name] for name in saved.files}
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError, zipfile.BadZipFile) as e:
+            logger.warning(f"Dropping unreadable artifact {path}: {e}")
+            _remove(path)
+            return None
+
+        created = arrays.pop(CREATED_ARRAY, None)
+        if self.ttl is not None and (created is None or time.time() - float(created) > self.ttl):
+            logger.info(f"Dropping expired artifact {path}")
+            _remove(path)
+            return None
+
+        # the access time is the mtime, noatime mounts don't lose the LRU order
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return arrays
+
+    def put(self, key: str, arrays: dict, compressed=False):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        if self.ttl is not None:
+            arrays = {**arrays, CREATED_ARRAY: np.array(time.time())}
+        (np.savez_compressed if compressed else np.savez)(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz") and ".tmp" not in entry.name:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Evicting artifact {path}")
+            _remove(path)
+            total -= size
+
+    def get_records(self, key: str, names: list):
+        """Lists of dicts stored by put_records, None on a miss"""
+        columns = self.get(key)
+        if columns is None:
+            return None
+        return [columns_to_records(name, columns) for name in names]
+
+    def put_records(self, key: str, records: dict) -> bool:
+        """Stores lists of flat dicts by name, False if they can't be encoded as arrays"""
+        arrays = {}
+        for name, values in records.items():
+            columns = records_to_columns(name, values)
+            if columns is None:
+                logger.warning(f"{name} can't be stored as arrays, it is not cached")
+                return False
+            arrays.update(columns)
+        self.put(key, arrays)
+        return True
+
+    def get_json(self, key: str, with_size=False):
+        """A value stored by put_json, None on a miss. with_size: (value, bytes of its JSON)"""
+        arrays = self.get(key)
+        if arrays is None:
+            return None
+        value = json.loads(arrays[JSON_ARRAY].tobytes())
+        return (value, arrays[JSON_ARRAY].nbytes) if with_size else value
+
+    def put_json(self, key: str, value):
+        """Stores a JSON serializable value, for the nested ones records can't hold"""
+        data = json.dumps(value, separators=(",", ":")).encode()
+        self.put(key, {JSON_ARRAY: np.frombuffer(data, dtype=np.uint8)}, compressed=True)
+
+
+def abc_points_key(dataset: str, points_distance, exit_strategy_key, calendar) -> str:
+    """The key of the points of a config, dataset is the dataset_fingerprint of the ticks"""
+    return ArtifactCache.key(
+        "abc_points",
+        dataset=dataset,
+        points_distance=points_distance._asdict(),
+        exit_strategy=exit_strategy_key,
+        session=calendar.windows,
+    )
+
+
+def backtest_cache() -> ArtifactCache:
+    """The cache of the backtest results of the API"""
+    return ArtifactCache(BACKTEST_CACHE_DIR, BACKTEST_CACHE_MAX_BYTES, BACKTEST_CACHE_TTL)
+
+
+def backtest_key(source: dict, contract: str, points_key: str, exit_strategy_key: str, way, calendar) -> str:
+    """
+    The key of a backtest of the API, `source` tells the data: the hash of an
+    uploaded file (spool_upload) or a date range with its range_fingerprint.
+    """
+    return ArtifactCache.key(
+        "backtest",
+        source=source,
+        contract=contract,
+        points=points_key,
+        exit_strategy=exit_strategy_key,
+        way=way.value,
+        session=calendar.windows,
+    )
@@ -0,0 +1,384 @@
+"""
+Backtests run as jobs, out of the API process: a request submits a job and
+gets its id at once, the event loop never waits on a backtest.
+
+A job runs in a process of its own, started as soon as fewer than max_running
+jobs run, so a running job can be cancelled by terminating its process. The
+job processes send their progress (ticks of the current stage), result or
+error through one queue, read by a thread of the API process. Results and
+errors go as stdlib pickle bytes, the queue would pickle them with dill.
+
+The API process runs threads, so the job processes are not forked from it but
+from a forkserver which has imported the backtesting modules beforehand.
+"""
+import asyncio
+import atexit
+import pickle
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from queue import Empty
+
+import multiprocess
+
+from app.services.orca_max_backtesting.orca_enums import JobStatus
+from app.services.orca_max_backtesting.progress import progress_reporter
+from app.utils.logging_setup import logger
+
+# the backtests running at once, every one validates its sides on 2 processes
+MAX_RUNNING_JOBS = 2
+# the finished jobs kept for their result, the oldest ones are dropped first above
+# that many or above that many bytes of pickled results
+MAX_FINISHED_JOBS = 100
+MAX_FINISHED_BYTES = 1 << 29
+# imported once by the forkserver instead of by every job process
+JOB_PRELOAD = ["app.services.orca_max_backtesting.run"]
+# a job sends a progress report at most every that many seconds, and on a new stage
+PROGRESS_INTERVAL = 0.5
+# how often the collector checks the job processes and wait checks its job
+POLL_INTERVAL = 0.1
+
+_PROGRESS, _DONE, _FAILED = range(3)
+_FINISHED = (JobStatus.Done, JobStatus.Failed, JobStatus.Cancelled)
+
+
+class JobCancelled(RuntimeError):
+    """The result of a cancelled job was asked for"""
+
+
+class _JobProgress:
+    """The progress reporter of a job process"""
+
+    def __init__(self, job_id: str, events) -> None:
+        self.job_id = job_id
+        self.events = events
+        self.stage = None
+        self.sent_at = 0.0
+
+    def __call__(self, stage: str, ticks_done: int, ticks_total: int) -> None:
+        now = time.monotonic()
+        if stage != self.stage or now - self.sent_at >= PROGRESS_INTERVAL:
+            self.stage, self.sent_at = stage, now
+            self.events.put((self.job_id, _PROGRESS, (stage, ticks_done, ticks_total)))
+
+
+def _context(start_method: str = None):
+    """forkserver where there is one (not on Windows), spawn otherwise"""
+    if start_method is not None:
+        return multiprocess.get_context(start_method)
+    if "forkserver" in multiprocess.get_all_start_methods():
+        context = multiprocess.get_context("forkserver")
+        context.set_forkserver_preload(JOB_PRELOAD)
+        return context
+    return multiprocess.get_context("spawn")
+
+
+def _dumps_error(e: Exception) -> bytes:
+    # the error is raised again by BacktestJobs.result, if it can be pickled
+    try:
+        data = pickle.dumps(e, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.loads(data)
+    except Exception:
+        data = pickle.dumps(RuntimeError(f"{type(e).__name__}: {e}"), protocol=pickle.HIGHEST_PROTOCOL)
+    return data
+
+
+def _exit_on_terminate(signum, frame):
+    # exits like on an error, so the pools of the job are terminated with it
+    raise SystemExit(128 + signum)
+
+
+def _run_job(job_id: str, func, kwargs: dict, events) -> None:
+    signal.signal(signal.SIGTERM, _exit_on_terminate)
+    try:
+        with progress_reporter(_JobProgress(job_id, events)):
+            result = func(**kwargs)
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        events.put((job_id, _FAILED, _dumps_error(e)))
+    else:
+        events.put((job_id, _DONE, data))
+
+
+class BacktestJob:
+    def __init__(self, func, kwargs: dict, name: str, cleanup=None) -> None:
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.func = func
+        self.kwargs = kwargs
+        self.cleanup = cleanup
+        self.status = JobStatus.Queued
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.result = None
+        self.result_size = 0
+        self.error = None
+        self.finished = threading.Event()
+
+        self.stage = None
+        self.stage_started_at = None
+        self.stage_first_tick = 0
+        self.ticks_done = 0
+        self.ticks_total = 0
+
+    def progress(self, stage: str, ticks_done: int, ticks_total: int) -> None:
+        if stage != self.stage:
+            # the rate of a stage is taken from its first report on
+            self.stage, self.stage_started_at, self.stage_first_tick = stage, time.time(), ticks_done
+        self.ticks_done, self.ticks_total = ticks_done, ticks_total
+
+    def finish(self, status: JobStatus, result=None, error: Exception = None, result_size: int = 0) -> None:
+        self.status = status
+        self.result, self.error, self.result_size = result, error, result_size
+        self.finished_at = time.time()
+        self.kwargs = None  # the data of the job, not needed anymore
+        if self.cleanup is not None:
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.warning(f"Backtest job {self.id} cleanup failed: {e}")
+            self.cleanup = None
+        self.finished.set()
+
+    def eta(self):
+        """Seconds left of the current stage at its rate so far, None until it has one"""
+        if self.status != JobStatus.Running or self.stage_started_at is None:
+            return None
+        ticks = self.ticks_done - self.stage_first_tick
+        if ticks <= 0:
+            return None
+        elapsed = time.time() - self.stage_started_at
+        return round(elapsed * (self.ticks_total - self.ticks_done) / ticks, 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status.value,
+            "stage": self.stage,
+            "ticks_processed": self.ticks_done,
+            "ticks_total": self.ticks_total,
+            "eta_seconds": self.eta(),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": None if self.error is None else str(self.error),
+        }
+
+
+class BacktestJobs:
+    """The jobs of the API process, run MAX_RUNNING_JOBS at a time in submission order"""
+
+    def __init__(
+        self,
+        max_running: int = MAX_RUNNING_JOBS,
+        max_finished: int = MAX_FINISHED_JOBS,
+        max_finished_bytes: int = MAX_FINISHED_BYTES,
+        start_method: str = None,
+    ) -> None:
+        """:param start_method: of the job processes, see _context"""
+        self.max_running = max_running
+        self.max_finished = max_finished
+        self.max_finished_bytes = max_finished_bytes
+        self.start_method = start_method
+        self._context = None
+        self._jobs = OrderedDict()
+        self._queued = deque()
+        self._running = {}
+        self._lock = threading.Lock()
+        self._events = None
+        self._collector = None
+
+    def submit(self, func, name: str = "", cleanup=None, **kwargs) -> str:
+        """
+        Queues func(**kwargs), func must be importable and its result picklable.
+
+        :param cleanup: called in this process once the job is over, whatever its
+            end (e.g. removes the files of the job)
+        :return: the job id
+        """
+        job = BacktestJob(func, kwargs, name or func.__name__, cleanup)
+        with self._lock:
+            self._start_collector()
+            self._jobs[job.id] = job
+            self._queued.append(job)
+            self._start_queued()
+        logger.info(f"Backtest job {job.id} submitted: {job.name}")
+        return job.id
+
+    def submit_result(self, result, name: str = "", result_size: int = 0) -> str:
+        """
+        A job done at once with its result, e.g. one of a cache. :return: the job id
+
+        :param result_size: the bytes the result counts for, e.g. of its JSON
+        """
+        job = BacktestJob(None, {}, name)
+        job.started_at = job.submitted_at
+        job.finish(JobStatus.Done, result=result, result_size=result_size)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._drop_finished()
+        return job.id
+
+    def status(self, job_id: str) -> dict:
+        """:raise KeyError: for an unknown job"""
+        with self._lock:
+            return self._jobs[job_id].to_dict()
+
+    def result(self, job_id: str):
+        """
+        The result of a Done job, a Failed job raises its error.
+
+        :raise KeyError: for an unknown (or dropped) job
+        :raise JobCancelled: for a cancelled job
+        """
+        return self._result(self._job(job_id))
+
+    @staticmethod
+    def _result(job: BacktestJob):
+        if job.status == JobStatus.Failed:
+            raise job.error
+        if job.status == JobStatus.Cancelled:
+            raise JobCancelled(f"Backtest job {job.id} was cancelled")
+        if job.status != JobStatus.Done:
+            raise RuntimeError(f"Backtest job {job.id} is {job.status.value}")
+        return job.result
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued or running job. :return: False if it had finished"""
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status == JobStatus.Queued:
+                self._queued.remove(job)
+            elif job.status == JobStatus.Running:
+                job.process.terminate()
+            else:
+                return False
+            job.finish(JobStatus.Cancelled)
+            self._drop_finished()
+        logger.info(f"Backtest job {job_id} cancelled")
+        return True
+
+    async def wait(self, job_id: str) -> dict:
+        """Waits for a job to finish without blocking the event loop. :return: its status"""
+        job = await self._wait(job_id)
+        with self._lock:
+            return job.to_dict()
+
+    async def wait_result(self, job_id: str):
+        """
+        wait and result at once: the job is held from its submission on, so a
+        job dropped once finished (see max_finished) still gives its result.
+        """
+        return self._result(await self._wait(job_id))
+
+    def _job(self, job_id: str) -> BacktestJob:
+        with self._lock:
+            return self._jobs[job_id]
+
+    async def _wait(self, job_id: str) -> BacktestJob:
+        job = self._job(job_id)
+        while not job.finished.is_set():
+            await asyncio.sleep(POLL_INTERVAL)
+        return job
+
+    def shutdown(self) -> None:
+        """Terminates the running jobs, e.g. when the API stops"""
+        with self._lock:
+            for job in self._running.values():
+                if job.process.is_alive():
+                    job.process.terminate()
+
+    def _start_collector(self) -> None:
+        if self._collector is None:
+            self._context = _context(self.start_method)
+            self._events = self._context.Queue()
+            self._collector = threading.Thread(target=self._collect, name="backtest-jobs", daemon=True)
+            self._collector.start()
+            atexit.register(self.shutdown)
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                event = self._events.get(timeout=POLL_INTERVAL)
+            except Empty:
+                event = None
+            if event is not None and event[1] != _PROGRESS:
+                # decoded out of the lock, a large result takes a while
+                event = self._decode(*event)
+            with self._lock:
+                if event is not None:
+                    self._on_event(*event)
+                self._reap()
+                self._start_queued()
+
+    @staticmethod
+    def _decode(job_id: str, kind: int, data: bytes) -> tuple:
+        try:
+            return job_id, kind, (pickle.loads(data), len(data))
+        except Exception as e:
+            return job_id, _FAILED, (RuntimeError(f"Backtest job result can't be read: {e}"), 0)
+
+    def _on_event(self, job_id: str, kind: int, payload) -> None:
+        job = self._jobs.get(job_id)
+        # a cancelled job may have sent something before it was terminated
+        if job is None or job.status in _FINISHED:
+            return
+        if kind == _PROGRESS:
+            job.progress(*payload)
+        elif kind == _DONE:
+            result, result_size = payload
+            job.finish(JobStatus.Done, result=result, result_size=result_size)
+            logger.info(f"Backtest job {job_id} done")
+        else:
+            error, _ = payload
+            job.finish(JobStatus.Failed, error=error)
+            logger.error(f"Backtest job {job_id} failed: {error}")
+        if job.status in _FINISHED:
+            self._drop_finished()
+
+    def _reap(self) -> None:
+        for job_id, job in list(self._running.items()):
+            if job.process.is_alive():
+                continue
+            # a process ending well sent its result before, it is on its way through the queue
+            if job.process.exitcode == 0 and job.status == JobStatus.Running:
+                continue
+            if job.status == JobStatus.Running:
+                job.finish(
+                    JobStatus.Failed,
+                    error=RuntimeError(f"Backtest job process exited with code {job.process.exitcode}"),
+                )
+                logger.error(f"Backtest job {job_id} failed: its process exited with code {job.process.exitcode}")
+                self._drop_finished()
+            del self._running[job_id]
+
+    def _start_queued(self) -> None:
+        while self._queued and len(self._running) < self.max_running:
+            job = self._queued.popleft()
+            job.process = self._context.Process(
+                target=_run_job, args=(job.id, job.func, job.kwargs, self._events), name=f"backtest-{job.id}"
+            )
+            job.process.start()
+            job.status = JobStatus.Running
+            job.started_at = time.time()
+            self._running[job.id] = job
+
+    def _drop_finished(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in _FINISHED), key=lambda job: job.finished_at
+        )
+        finished_bytes = sum(job.result_size for job in finished)
+        # the last one is kept whatever its size, its result is about to be fetched
+        for number, job in enumerate(finished[:-1]):
+            if len(finished) - number <= self.max_finished and finished_bytes <= self.max_finished_bytes:
+                break
+            finished_bytes -= job.result_size
+            del self._jobs[job.id]
+
+
+backtest_jobs = BacktestJobs()
@@ -5,6 +5,21 @@ from collections import namedtuple
 VERSION = "3"
 GENERATE_CSV = True
 
+# bump it when a change of the finder or the validator changes their results,
+# the cached artifacts of the older engine are then not used anymore
+ENGINE_VERSION = 1
+# the artifact cache drops the least recently used entries above this size
+ARTIFACT_CACHE_MAX_BYTES = 2 << 30
+# the backtest results of the API, kept for repeated requests: the least recently used go above
+# this size and any older than the TTL, e.g. a date range whose data has been completed since
+BACKTEST_CACHE_MAX_BYTES = 1 << 30
+BACKTEST_CACHE_TTL = 7 * 24 * 3600
+# the date range backtests load the tick tables in slices of that many hours, fetched on
+# that many threads, a page of rows per request (the row limit of the API)
+TICK_LOADER_SLICE_HOURS = 4
+TICK_LOADER_THREADS = 8
+TICK_LOADER_PAGE_SIZE = 1000
+
 # each tick  is $20
 # each tick price
 TICK_PRICES = {"NQ": 20, "ES": 50, "GC": 100}
@@ -13,6 +28,16 @@ TICK_PRICES = {"NQ": 20, "ES": 50, "GC": 100}
 MAX_CONSECUTIVE_REACH: int = 3
 HIBERNATION_MODE: bool = False
 
+# no order is found or validated in these windows ("HH:MM" of the tick time, both ends included)
+DEFAULT_RESTRICTED_TRADING_HOURS = [
+    ("14:20", "14:45"),
+    ("13:20", "13:45"),
+]
+# per instrument windows, the instruments not listed use the default ones
+RESTRICTED_TRADING_HOURS = {
+    # "ES": [("14:20", "14:45")],
+}
+
 
 ABC_CONFIG = {
     15: {"ab": 20, "bc": 10, "order_point": 6, "from_point": "c"},
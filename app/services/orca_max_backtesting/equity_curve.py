@@ -0,0 +1,115 @@
+"""
+Equity curve and risk metrics of the closed trades, updated trade by trade.
+
+Every update is O(1), so a validator (and every cell of an analyse_grid
+sweep, which runs one validator per exit strategy) gets the metrics without a
+second pass over its trades.
+
+The trades come in the order they are registered, not in the order they
+closed, so the curve's clock is the latest close time seen so far.
+"""
+import numpy as np
+
+from app.services.orca_max_backtesting.tick_codec import SECONDS_PER_DAY
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class EquityCurveAccumulator:
+    """
+    Of the curve:
+
+    - equity / peak / max_drawdown: cumulated PnL, its highest value and the
+      largest fall from it (MaxEquityDrawDown)
+    - max_consecutive_loss: the largest sum of consecutive losses, what the
+      validators report as MaxDrawDown
+    - max_time_under_water: the longest time in seconds below the peak
+    - the PnL of every day, summed up as they close (mean, variance, best, worst)
+    """
+
+    def __init__(self, dtype=np.float64) -> None:
+        def zeros(zeros_dtype=dtype):
+            return np.zeros((), dtype=zeros_dtype)
+
+        self.trades = zeros(np.int64)
+        self.equity, self.peak, self.max_drawdown = zeros(), zeros(), zeros()
+        self.loss_streak, self.max_consecutive_loss = zeros(), zeros()
+
+        self.clock = zeros(np.int64)
+        self.peak_time = zeros(np.int64)
+        self.max_time_under_water = zeros(np.int64)
+
+        self.day = np.full((), -1, dtype=np.int64)
+        self.day_pnl = zeros(np.float64)
+        self.days = zeros(np.int64)
+        self.daily_mean, self.daily_m2 = zeros(np.float64), zeros(np.float64)
+        self.best_day = np.full((), -np.inf)
+        self.worst_day = np.full((), np.inf)
+
+    def add(self, pnl, closed_seconds, closed=True) -> None:
+        """
+        One trade: its PnL and close time (epoch seconds). A trade that isn't
+        `closed` leaves the curve as it is.
+        """
+        closed = np.asarray(closed, dtype=bool)
+        pnl = np.where(closed, pnl, 0).astype(self.equity.dtype)
+        first = closed & (self.trades == 0)
+        self.trades = self.trades + closed
+
+        self.clock = np.where(closed, np.maximum(self.clock, closed_seconds), self.clock)
+        day = self.clock // SECONDS_PER_DAY
+        self._close_days(closed & (day != self.day) & (self.day >= 0))
+        self.day_pnl = np.where(closed & (day != self.day), 0.0, self.day_pnl) + pnl
+        self.day = np.where(closed, day, self.day)
+
+        self.equity = self.equity + pnl
+        at_peak = self.equity >= self.peak
+        self.peak = np.maximum(self.peak, self.equity)
+        self.max_drawdown = np.maximum(self.max_drawdown, self.peak - self.equity)
+        self.peak_time = np.where(first | (closed & at_peak), self.clock, self.peak_time)
+        self.max_time_under_water = np.maximum(
+            self.max_time_under_water, np.where(closed & ~at_peak, self.clock - self.peak_time, 0)
+        )
+
+        # a win ends a streak of losses, no trade keeps it
+        self.loss_streak = np.where(pnl < 0, self.loss_streak - pnl, np.where(closed, 0, self.loss_streak))
+        self.max_consecutive_loss = np.maximum(self.max_consecutive_loss, self.loss_streak)
+
+    def _close_days(self, ending) -> None:
+        """Adds the PnL of the current day to the daily stats if it is `ending` (Welford)"""
+        days = self.days + ending
+        delta = self.day_pnl - self.daily_mean
+        mean = self.daily_mean + np.where(ending, delta / np.maximum(days, 1), 0.0)
+        self.daily_m2 = self.daily_m2 + np.where(ending, delta * (self.day_pnl - mean), 0.0)
+        self.daily_mean = mean
+        self.days = days
+        self.best_day = np.where(ending, np.maximum(self.best_day, self.day_pnl), self.best_day)
+        self.worst_day = np.where(ending, np.minimum(self.worst_day, self.day_pnl), self.worst_day)
+
+    def metrics(self) -> dict:
+        """
+        The metrics of the curve so far as python numbers, the current day included.
+        """
+        # a copy closes the current day, the accumulator can go on
+        curve = EquityCurveAccumulator.__new__(EquityCurveAccumulator)
+        curve.__dict__.update(self.__dict__)
+        curve._close_days(self.trades > 0)
+
+        std = np.sqrt(curve.daily_m2 / np.maximum(curve.days - 1, 1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = curve.daily_mean / std * np.sqrt(TRADING_DAYS_PER_YEAR)
+        has_sharpe = (curve.days > 1) & (std > 0)
+        traded = curve.days > 0
+
+        return {
+            "Trades": curve.trades.tolist(),
+            "NetPnL": curve.equity.tolist(),
+            "MaxEquityDrawDown": curve.max_drawdown.tolist(),
+            "MaxConsecutiveLoss": curve.max_consecutive_loss.tolist(),
+            "MaxTimeUnderWater": curve.max_time_under_water.tolist(),
+            "TradingDays": curve.days.tolist(),
+            "MeanDailyPnL": curve.daily_mean.tolist(),
+            "BestDay": np.where(traded, curve.best_day, 0.0).tolist(),
+            "WorstDay": np.where(traded, curve.worst_day, 0.0).tolist(),
+            "Sharpe": np.where(has_sharpe, np.asarray(sharpe.tolist(), dtype=object), None).tolist(),
+        }
@@ -0,0 +1,88 @@
+"""
+The outcome of every order for a whole grid of TP / SL pairs at once.
+
+The trigger of an order doesn't depend on its TP and SL, so it is found once.
+After it, the first passage to every distinct TP level and to every distinct SL
+level is found walking outwards from the order point: a farther level can't be
+reached before a nearer one, so each search starts where the previous one
+stopped. The close of a (TP, SL) pair is then the earlier of its two passages.
+"""
+import numpy as np
+
+from app.services.orca_max_backtesting.orca_enums import TeamWay, TradingPosition
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+
+# values of ExitGrid.outcome
+NOT_CLOSED, FILLED, LOST = 0, 1, 2
+
+
+def _first_passages(find, starts: np.ndarray, order_points: list, offsets: list, size: int) -> np.ndarray:
+    """
+    (orders, levels) positions of the first tick from `starts` found at every
+    order_point + offset by `find`, size if none. The offsets go from the
+    nearest level to the farthest.
+    """
+    passages = np.full((len(starts), len(offsets)), size, dtype=np.int64)
+    for order, (start, order_point) in enumerate(zip(starts.tolist(), order_points)):
+        position = start
+        for level, offset in enumerate(offsets):
+            position = find(position, order_point + offset)
+            if position >= size:
+                break
+            passages[order, level] = position
+    return passages
+
+
+class ExitGrid:
+    """
+    Trigger and close positions of the orders of one side for every pair of
+    `tp_values` x `sl_values`, as ABCValidator finds them one pair at a time:
+
+    - triggered: (orders,) position of the trigger, extrema.size if none
+    - closed: (orders, TP, SL) position of the close, extrema.size if none
+    - outcome: (orders, TP, SL) NOT_CLOSED, FILLED or LOST
+    """
+
+    def __init__(
+        self,
+        extrema: RangeExtrema,
+        order_points: list,
+        points_type: TradingPosition,
+        team_way: TeamWay,
+        tp_values,
+        sl_values,
+    ) -> None:
+        self.tp_values = sorted(set(tp_values))
+        self.sl_values = sorted(set(sl_values))
+        size = self.size = extrema.size
+        long = points_type == TradingPosition.Long
+        prices = [row["Order_point"] for row in order_points]
+
+        # ABCValidator._first_trigger
+        trigger = extrema.first_at_or_above if long == (team_way == TeamWay.BreakThrough) else extrema.first_at_or_below
+        self.triggered = np.array(
+            [trigger(row["C_index"], price) for row, price in zip(order_points, prices)], dtype=np.int64
+        ).reshape(-1)
+
+        # ABCValidator._first_exit, a long wins above the order point and a short below it
+        tp_sign, sl_sign = (1, -1) if long else (-1, 1)
+        starts = np.minimum(self.triggered + 1, size)
+        tp_passage = _first_passages(
+            extrema.first_at_or_above if long else extrema.first_at_or_below,
+            starts, prices, [tp_sign * tp for tp in self.tp_values], size,
+        )
+        sl_passage = _first_passages(
+            extrema.first_at_or_below if long else extrema.first_at_or_above,
+            starts, prices, [sl_sign * sl for sl in self.sl_values], size,
+        )
+
+        tp_passage, sl_passage = tp_passage[:, :, None], sl_passage[:, None, :]
+        self.closed = np.minimum(tp_passage, sl_passage)
+        # the TP is tested first on a tick, like _validate_long / _validate_short do
+        self.outcome = np.where(
+            self.closed >= size, NOT_CLOSED, np.where(tp_passage <= sl_passage, FILLED, LOST)
+        ).astype(np.int8)
+
+    def passages(self, tp, sl) -> tuple:
+        """(triggered, closed) positions of the orders for one pair, for ABCValidator.validate"""
+        return self.triggered, self.closed[:, self.tp_values.index(tp), self.sl_values.index(sl)]
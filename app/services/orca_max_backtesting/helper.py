@@ -1,17 +1,35 @@
 import csv
+import io
 from decimal import Decimal
 from datetime import datetime
 
 import os
-import pickle
 
 
 import pandas as pd
-import pytz
 
 from app.services.orca_max.schemas import ExitStrategy
+from app.services.orca_max_backtesting.artifact_cache import (
+    ABC_POINTS_LISTS,
+    ArtifactCache,
+    abc_points_key,
+    dataset_fingerprint,
+)
 from app.services.orca_max_backtesting.config import GENERATE_CSV, HIBERNATION_MODE, MAX_CONSECUTIVE_REACH, VERSION, \
-    EXIT_STRATEGIES_COMPENSATION, PointsDistance
+    EXIT_STRATEGIES_COMPENSATION, PointsDistance, DEFAULT_RESTRICTED_TRADING_HOURS
+from app.services.orca_max_backtesting.order_overlaps import OrderOverlapIndex
+from app.services.orca_max_backtesting.raw_lines import RawLines
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_codec import parse_tick_lines, parse_tick_time
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import (
+    UPLOAD_BLOCK_SIZE,
+    TickAccumulator,
+    iter_line_blocks,
+    load_tick_store,
+    read_tick_file_parallel,
+    tick_columns_to_list,
+)
 # from django.utils import timezone
 
 from app.utils.decorators.timing.time import time_it
@@ -86,17 +104,9 @@ def create_folder(symbol: str, data_name, team_way):
 
 
 def get_price_time(time_string):
-    time_string = " ".join(time_string.split(" ")[:-1])
-    datetime_obj = datetime.strptime(time_string, "%Y%m%d %H%M%S")
-
-    # Set timezone to the current timezone
-    local_timezone = pytz.timezone("Europe/London")  # e.g., 'America/New_York'
-    aware_datetime_obj = local_timezone.localize(datetime_obj)
-
-    # Convert back to naive datetime
-    naive_datetime_obj = aware_datetime_obj.replace(tzinfo=None)
-
-    return naive_datetime_obj
+    # localizing to Europe/London and dropping the tzinfo again gives back the
+    # wall clock time unchanged, the tick times stay on the wall clock
+    return parse_tick_time(time_string)
 
 
 def get_price_time2(time_string):
@@ -143,218 +153,116 @@ def read_file_list(file_name: str, rows=1000):
 
 
 def get_overlapping_orders(orders: list) -> list:
+    """
+    The lost orders with the orders after them triggered before or when they
+    closed, `orders` sorted by Closed time
+    """
     overlapping_orders_list = []
-    # Compare Closed time of each order with Triggered time of subsequent orders
+    overlap_index = OrderOverlapIndex(orders)
     for current_index_i, current_order in enumerate(orders):
         # If the trade is a WON then no need to factor it, only loss trades
         if current_order["Result"] == "Filled":
             continue
 
-        current_closed = current_order["Closed"]
-        overlapping_info = {"order": (current_index_i, current_order), "overlaps": []}
-
-        for current_index_j in range(current_index_i + 1, len(orders)):
-            next_order = orders[current_index_j]
-
-            next_triggered = next_order["Triggered"]
-
-            # If next order's Triggered time falls before or within the current order's Closed time
-            if next_triggered <= current_closed:
-                # Add overlapping order to the 'overlaps' list
-                overlapping_info["overlaps"].append((current_index_j, next_order))
-
+        overlaps = overlap_index.overlaps(current_index_i)
         # Only add orders that have overlaps
-        if overlapping_info["overlaps"]:
-            overlapping_orders_list.append(overlapping_info)
+        if overlaps:
+            overlapping_orders_list.append(
+                {
+                    "order": (current_index_i, current_order),
+                    "overlaps": [(current_index_j, orders[current_index_j]) for current_index_j in overlaps],
+                }
+            )
 
     return overlapping_orders_list
 
 
-def read_pickles(file_name, path):
-    file_path_1 = os.path.join(path, "pickle_files/source", f"{file_name}.pickle")
-    file_path_2 = os.path.join(path, "pickle_files/source", f"all_{file_name}.pickle")
-    if os.path.exists(file_path_1) and os.path.exists(file_path_2):
-        # If both files exist, load and return the content
-        with open(file_path_1, "rb") as file1, open(file_path_2, "rb") as file2:
-            data_list = pickle.load(file1)
-            data_all_list = pickle.load(file2)
-        logger.info("Files have been loaded form pickle")
-        return data_list, data_all_list
-    else:
-        logger.info(f"One or both files are missing: {file_path_1}, {file_path_2}")
-        return [], []
-
-
-def read_abc_pickles(file_name, points_key):
-
-    file_path_1 = os.path.join(
-        CURRENT_PATH, "pickle_files/abc", f"down_{points_key}_{file_name}.pickle"
-    )
-    file_path_2 = os.path.join(
-        CURRENT_PATH, "pickle_files/abc", f"up_{points_key}_{file_name}.pickle"
-    )
-
-    if os.path.exists(file_path_1) and os.path.exists(file_path_2):
-        # If both files exist, load and return the content
-        with open(file_path_1, "rb") as file1, open(file_path_2, "rb") as file2:
-            down_abc_points = pickle.load(file1)
-            up_abc_points = pickle.load(file2)
-        logger.info("ABC points have been loaded form pickle")
-        return down_abc_points, up_abc_points
-    else:
-        logger.info(f"One or both files are missing: {file_path_1}, {file_path_2}")
-        return [], []
-
-
-@time_it
-def read_file_cleaned(file_name: str, rows=1000, cached=True):
-    if cached:
-        sanitized_data_list, data_all_list = read_pickles(file_name, path)
-        if sanitized_data_list:
-            logger.info("Getting Caching data")
-
-            return sanitized_data_list, data_all_list
-        logger.info("Caching data was not found")
-
-    logger.info(f"reading text file {file_name}")
-    sanitized_data_list, data_all_list = [], []
-
-    with open(f"{path}/files/{file_name}", "r") as file:
-        previous_row, previous_row_all = None, None
-        index = 0
+def read_distinct_lines(file_path: str, rows=1000) -> list:
+    """Raw lines of the file without the consecutive duplicates"""
+    data_all_list = []
+    previous_row_all = None
+    with open(file_path, "r") as file:
         for i, line in enumerate(file):
             line = line.strip()
             if previous_row_all != line:
                 data_all_list.append(line)
                 previous_row_all = line
 
-            parts = line.split(";")
-            last_price = float(parts[2])
-            last_price_datetime = get_price_time(parts[0])
-
-            if previous_row != (last_price, last_price_datetime):
-                sanitized_data_list.append((last_price, last_price_datetime, index))
-                previous_row = (last_price, last_price_datetime)
-                index += 1
-
             if rows != -1 and i == rows:
                 break
+    return data_all_list
 
-    logger.info("finished reading text file")
-
-    # to save the data in pickle, so we don't need to read the file again
-    # pickle.dump(
-    #     sanitized_data_list,
-    #     open(f"{path}/pickle_files/source/{file_name}.pickle", "wb"),
-    # )
-    # pickle.dump(
-    #     data_all_list, open(f"{path}/pickle_files/source/all_{file_name}.pickle", "wb")
-    # )
-    logger.info("Data has been saved in pickle")
-
-    return sanitized_data_list, data_all_list
 
 @time_it
-def read_bytes_cleaned(data_bytes: bytes, rows=1000):
-
+def read_file_cleaned(file_name: str, rows=1000, cached=True):
+    if cached:
+        # the tick store is keyed by the file content, it can't be stale
+        file_path = f"{path}/files/{file_name}"
+        columns = load_tick_store(file_path)
+        logger.info("Getting tick store data")
 
-    decoded_data = data_bytes.decode("utf-8")
-    lines = decoded_data.strip().split("\n")
-    logger.info(f"Processing uploaded bytes data: {len(lines)} lines")
+        return tick_columns_to_list(columns, rows), RawLines.from_file(file_path, rows)
 
-    sanitized_data_list, data_all_list = [], []
+    logger.info(f"reading text file {file_name}")
+    file_path = f"{path}/files/{file_name}"
+    columns, _ = read_tick_file_parallel(file_path, rows)
+    sanitized_data_list = tick_columns_to_list(columns)
+    logger.info("finished reading text file")
 
-    previous_row, previous_row_all = None, None
-    index = 0
+    # the raw lines are only read from the file if they are used
+    return sanitized_data_list, RawLines.from_file(file_path, rows)
 
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if previous_row_all != line:
-            data_all_list.append(line)
-            previous_row_all = line
 
-        parts = line.split(";")
-        try:
-            last_price = float(parts[2])
-        except (IndexError, ValueError) as e:
-            logger.warning(f"Skipping invalid line [{i}]: {line}")
-            continue
-
-        try:
-            last_price_datetime = get_price_time(parts[0])
-        except Exception as e:
-            logger.warning(f"Failed to parse time on line [{i}]: {line}")
-            continue
+@time_it
+def read_tick_series(file_name: str, rows=-1) -> TickSeries:
+    """
+    read_file_cleaned as a TickSeries over the memory-mapped tick store, the
+    raw lines are not read.
+    """
+    columns = load_tick_store(f"{path}/files/{file_name}")
+    return TickSeries.from_columns(columns, rows)
 
-        if previous_row != (last_price, last_price_datetime):
-            sanitized_data_list.append((last_price, last_price_datetime, index))
-            previous_row = (last_price, last_price_datetime)
-            index += 1
 
-        if rows != -1 and i == rows:
+@time_it
+def read_bytes_cleaned(data_bytes: bytes, rows=1000):
+    lines_count = data_bytes.strip().count(b"\n") + 1 if data_bytes.strip() else 0
+    logger.info(f"Processing uploaded bytes data: {lines_count} lines")
+
+    # invalid lines are logged and skipped instead of failing the whole upload
+    accumulator = TickAccumulator(rows=rows, strict=False)
+    for block in iter_line_blocks(io.BytesIO(data_bytes.strip()), UPLOAD_BLOCK_SIZE):
+        accumulator.add(parse_tick_lines(block))
+        if accumulator.done:
             break
+    sanitized_data_list = tick_columns_to_list(accumulator.columns())
 
     logger.info("Finished processing bytes data")
 
-    return sanitized_data_list, data_all_list
+    return sanitized_data_list, RawLines.from_bytes(data_bytes.strip(), rows)
 
 
 @time_it
 def read_file_cleaned_new(file_name: str, rows=1000, cached=True):
     file_path = f"{path}/files/{file_name}"
-    pickle_path = f"{path}/pickle_files/source/{file_name}.pickle"
-    pickle_all_path = f"{path}/pickle_files/source/all_{file_name}.pickle"
-
-    if cached:
-        data_list, data_all_list = read_pickles(file_name, path)
-        if data_list:
-            logger.info("Using cached data")
-            return data_list, data_all_list
-        logger.info("fCache not found, reading file.. {file_path}")
-
-    data_list, data_all_list = [], []
-
-    previous_row, previous_row_all = None, None
-
-    with open(file_path, "r") as file:
-        for index, line in enumerate(file):
-            if rows != -1 and index >= rows:
-                break
-
-            line = line.strip()
-
-            # Store unique lines for data_all_list
-            if line != previous_row_all:
-                data_all_list.append(line)
-                previous_row_all = line
-
-            # Parse line details
-            parts = line.split(";")
-            last_price = float(parts[2])
-            last_price_datetime = get_price_time(parts[0])
-            current_row = (last_price, last_price_datetime)
 
-            # Store unique price and datetime entries
-            if current_row != previous_row:
-                data_list.append((*current_row, index))
-                previous_row = current_row
-
-    logger.info(f"Finished reading file: {file_path}")
+    # this reader stops before line number `rows`, the others right after it
+    if rows == 0:
+        return [], []
 
-    # Save data to pickle files
-    with open(pickle_path, "wb") as pf, open(pickle_all_path, "wb") as paf:
-        pickle.dump(data_list, pf)
-        pickle.dump(data_all_list, paf)
-    logger.info("Data cached to pickle files")
+    if cached:
+        # the tick store is keyed by the file content, it can't be stale
+        columns = load_tick_store(file_path)
+        logger.info("Using the tick store")
+    else:
+        columns, _ = read_tick_file_parallel(file_path, rows - 1 if rows != -1 else -1)
+        logger.info(f"Finished reading file: {file_path}")
 
-    return data_list, data_all_list
+    data_list = tick_columns_to_list(columns, rows - 1 if rows != -1 else -1, line_index=True)
+    return data_list, RawLines.from_file(file_path, rows - 1 if rows != -1 else -1)
 
 
 #
-HOURS_AVOID = [
-    ("14:20", "14:45"),
-    ("13:20", "13:45"),
-]
+HOURS_AVOID = DEFAULT_RESTRICTED_TRADING_HOURS
 
 
 def time_in_range(start_time, end_time, current_time):
@@ -388,37 +296,27 @@ def get_abc_points(
     # output_folder_path is need to store the abc result csv files later on
     output_folder_path = create_folder(symbol, data_name, team_way=way)
 
-    down_order_points_list, up_order_points_list = read_abc_pickles(
-        data_name, points_key
-    )
-    if not down_order_points_list or not up_order_points_list:
-        logger.info("Pickle ABC points not found, generating new ones")
-    else:
-        return {
-            "down_order_points_list": down_order_points_list,
-            "up_order_points_list": up_order_points_list,
-        }, output_folder_path
-
-    forward_abc = ABCFinder(points_distance, exit_strategy_key, way)
+    # the points only depend on the ticks, the config and the session filter,
+    # so a replaced file or another config is never served a stale result
+    calendar = SessionCalendar.for_instrument(symbol)
+    artifact_cache = ArtifactCache()
+    cache_key = abc_points_key(dataset_fingerprint(data), points_distance, exit_strategy_key, calendar)
+    cached_points = artifact_cache.get_records(cache_key, ABC_POINTS_LISTS)
+    if cached_points is not None:
+        logger.info("ABC points loaded from the artifact cache")
+        return dict(zip(ABC_POINTS_LISTS, cached_points)), output_folder_path
+
+    logger.info("ABC points not cached, generating new ones")
+    forward_abc = ABCFinder(points_distance, exit_strategy_key, way, calendar=calendar)
     down_order_points_list, up_order_points_list = forward_abc.find(data)
 
     logger.info("forward_abc finding Done")
 
-    if False:
-        pickle.dump(
-            down_order_points_list,
-            open(
-                f"{CURRENT_PATH}/pickle_files/abc/down_{points_key}_{data_name}.pickle",
-                "wb",
-            ),
-        )
-        pickle.dump(
-            up_order_points_list,
-            open(
-                f"{CURRENT_PATH}/pickle_files/abc/up_{points_key}_{data_name}.pickle", "wb"
-            ),
-        )
+    # the finder hands out these dicts, the cache stores them as arrays
+    abc_points = dict(zip(ABC_POINTS_LISTS, (down_order_points_list, up_order_points_list)))
+    artifact_cache.put_records(cache_key, abc_points)
 
+    if False:
         dump_csv(
             down_order_points_list,
             up_order_points_list,
@@ -427,10 +325,35 @@ def get_abc_points(
             folder_path=output_folder_path,
         )
 
-    return {
-        "down_order_points_list": down_order_points_list,
-        "up_order_points_list": up_order_points_list,
-    }, output_folder_path
+    return abc_points, output_folder_path
+
+
+def get_abc_points_sweep(points_distances, symbol, exit_strategy_key, data, way) -> list:
+    """
+    get_abc_points for many configs: the ones not in the artifact cache are found
+    together by an ABCDetectorBank, in one pass over the ticks.
+
+    :return: the abc_points dict of get_abc_points for every config, in order
+    """
+    from app.services.orca_max_backtesting.abc import ABCDetectorBank
+
+    calendar = SessionCalendar.for_instrument(symbol)
+    artifact_cache = ArtifactCache()
+    # hashing the ticks is a pass over them, once for all the configs
+    dataset = dataset_fingerprint(data)
+    cache_keys = [abc_points_key(dataset, points_distance, exit_strategy_key, calendar) for points_distance in points_distances]
+
+    results = [artifact_cache.get_records(cache_key, ABC_POINTS_LISTS) for cache_key in cache_keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    logger.info(f"{len(points_distances) - len(missing)} of {len(points_distances)} configs loaded from the artifact cache")
+
+    if missing:
+        bank = ABCDetectorBank([points_distances[i] for i in missing], exit_strategy_key, way, calendar=calendar)
+        for i, points in zip(missing, bank.find(data)):
+            results[i] = points
+            artifact_cache.put_records(cache_keys[i], dict(zip(ABC_POINTS_LISTS, points)))
+
+    return [dict(zip(ABC_POINTS_LISTS, result)) for result in results]
 
 
 @time_it
@@ -517,6 +440,9 @@ def export_dict_to_csv(data, file_name="output.csv"):
         # Iterate over each item in the dictionary
         for main_key, sub_dict in data_row.items():
             for strategy, details in sub_dict.items():
+                # a side whose validation failed has no result
+                if details is None:
+                    continue
                 # Extract base-level details for 'Long' or 'Short' keys
                 base_details = {
                     k: v for k, v in details.items() if isinstance(v, (int, str))
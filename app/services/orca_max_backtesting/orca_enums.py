@@ -31,3 +31,11 @@ class PointType(Enum):
 class TeamWay(Enum):
     Reverse = "Reverse"  # Sarab
     BreakThrough = "BreakThrough"  # Amer
+
+
+class JobStatus(Enum):
+    Queued = "Queued"
+    Running = "Running"
+    Done = "Done"
+    Failed = "Failed"
+    Cancelled = "Cancelled"
@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.services.orca_max_backtesting.range_extrema import BLOCK_SIZE, RangeExtrema
+
+
+def times_to_seconds(times: list) -> np.ndarray:
+    """Epoch seconds of "%Y-%m-%d %H:%M:%S" strings (or datetimes)"""
+    return np.array(times, dtype="datetime64[s]").astype(np.int64)
+
+
+class OrderOverlapIndex:
+    """
+    The orders overlapping an order, by position in a list of closed orders
+    sorted by "Closed": the ones after it triggered before or when it closed,
+    which is what get_overlapping_orders pairs.
+
+    The Triggered times are kept in a RangeExtrema by position, so the overlaps
+    of an order are found block by block instead of comparing it with every
+    later order: a query to the next block holding one, O(log n), then all
+    the ones of the block at once.
+    """
+
+    def __init__(self, orders: list) -> None:
+        self.size = len(orders)
+        self.triggered = times_to_seconds([order["Triggered"] for order in orders]).reshape(-1)
+        self.closed = times_to_seconds([order["Closed"] for order in orders]).reshape(-1)
+        self._extrema = RangeExtrema(self.triggered)
+
+    def overlaps(self, position: int) -> list:
+        """Positions of the orders after `position` triggered before or when it closed"""
+        closed = float(self.closed[position])
+        positions = []
+        position = self._extrema.first_at_or_below(position + 1, closed)
+        while position < self.size:
+            end = min((position // BLOCK_SIZE + 1) * BLOCK_SIZE, self.size)
+            positions.extend((position + np.flatnonzero(self.triggered[position:end] <= closed)).tolist())
+            position = self._extrema.first_at_or_below(end, closed)
+        return positions
@@ -0,0 +1,30 @@
+"""
+Progress of the long steps of a backtest, in ticks of the series.
+
+The steps report to the reporter installed in the current thread, e.g. the one
+of a backtest job. Without a reporter a report is only a function call.
+
+A process forked from that thread keeps its reporter, which is how the workers
+of a process pool started by a job report. Spawned processes start without one.
+"""
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+@contextmanager
+def progress_reporter(reporter):
+    """Sends the reports of the steps run in the block to reporter(stage, ticks_done, ticks_total)"""
+    previous = getattr(_local, "reporter", None)
+    _local.reporter = reporter
+    try:
+        yield reporter
+    finally:
+        _local.reporter = previous
+
+
+def report_progress(stage: str, ticks_done: int, ticks_total: int) -> None:
+    reporter = getattr(_local, "reporter", None)
+    if reporter is not None:
+        reporter(stage, ticks_done, ticks_total)
@@ -0,0 +1,122 @@
+import numpy as np
+
+# every level of the tree holds the max / min of BLOCK_SIZE entries of the level below
+BLOCK_SIZE = 64
+
+
+def _build_levels(values: np.ndarray, reduce, fill) -> list:
+    levels = [values]
+    while len(levels[-1]) > BLOCK_SIZE:
+        below = levels[-1]
+        padded = np.full(-(-len(below) // BLOCK_SIZE) * BLOCK_SIZE, fill, dtype=np.float64)
+        padded[:len(below)] = below
+        levels.append(reduce(padded.reshape(-1, BLOCK_SIZE), axis=1))
+    return levels
+
+
+def _first_hit(levels: list, start: int, hit) -> int:
+    """First position >= start of level 0 where `hit` holds, len of level 0 if none"""
+    size = len(levels[0])
+    position, level = start, 0
+
+    # up: the rest of the block at every level, until a block holds a hit
+    while True:
+        values = levels[level]
+        if position >= len(values):
+            return size
+        end = min((position // BLOCK_SIZE + 1) * BLOCK_SIZE, len(values))
+        hits = hit(values[position:end])
+        first = int(hits.argmax())
+        if hits[first]:
+            position += first
+            break
+        if end >= len(values):
+            return size
+        position = end // BLOCK_SIZE
+        level += 1
+
+    # down: the first entry with a hit of the block below
+    while level:
+        level -= 1
+        position *= BLOCK_SIZE
+        hits = hit(levels[level][position:position + BLOCK_SIZE])
+        position += int(hits.argmax())
+    return position
+
+
+def _last_hit(levels: list, stop: int, hit) -> int:
+    """Last position < stop of level 0 where `hit` holds, -1 if none"""
+    position, level = stop - 1, 0
+
+    # up: the start of the block at every level, until a block holds a hit
+    while True:
+        if position < 0:
+            return -1
+        values = levels[level]
+        begin = position // BLOCK_SIZE * BLOCK_SIZE
+        hits = hit(values[begin:position + 1])[::-1]
+        last = int(hits.argmax())
+        if hits[last]:
+            position -= last
+            break
+        position = begin // BLOCK_SIZE - 1
+        level += 1
+
+    # down: the last entry with a hit of the block below
+    while level:
+        level -= 1
+        position *= BLOCK_SIZE
+        hits = hit(levels[level][position:position + BLOCK_SIZE])[::-1]
+        position += len(hits) - 1 - int(hits.argmax())
+    return position
+
+
+class RangeExtrema:
+    """
+    Block tree of the maxima and minima of a price array, to find the first
+    position from a start where the price crosses a level without visiting the
+    ticks in between: a query reads at most one block per level, O(log n) of
+    BLOCK_SIZE entries.
+
+    The positions that aren't `valid` (e.g. restricted ticks) are never returned.
+    """
+
+    def __init__(self, values: np.ndarray, valid: np.ndarray = None) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        self.size = len(values)
+        highs, lows = values, values
+        if valid is not None:
+            highs = np.where(valid, values, -np.inf)
+            lows = np.where(valid, values, np.inf)
+        self._max_levels = _build_levels(highs, np.max, -np.inf)
+        self._min_levels = _build_levels(lows, np.min, np.inf)
+
+    def first_at_or_above(self, start: int, value: float, stop: int = None) -> int:
+        """First position in [start, stop) with a price >= value, stop if none"""
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return stop
+        return min(_first_hit(self._max_levels, start, lambda values: values >= value), stop)
+
+    def first_at_or_below(self, start: int, value: float, stop: int = None) -> int:
+        """First position in [start, stop) with a price <= value, stop if none"""
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return stop
+        return min(_first_hit(self._min_levels, start, lambda values: values <= value), stop)
+
+    def last_at_or_above(self, start: int, stop: int, value: float) -> int:
+        """Last position in [start, stop) with a price >= value, -1 if none"""
+        position = _last_hit(self._max_levels, min(stop, self.size), lambda values: values >= value)
+        return position if position >= start else -1
+
+    def last_at_or_below(self, start: int, stop: int, value: float) -> int:
+        """Last position in [start, stop) with a price <= value, -1 if none"""
+        position = _last_hit(self._min_levels, min(stop, self.size), lambda values: values <= value)
+        return position if position >= start else -1
+
+    def first_above(self, start: int, value: float, stop: int = None) -> int:
+        return self.first_at_or_above(start, np.nextafter(value, np.inf), stop)
+
+    def first_below(self, start: int, value: float, stop: int = None) -> int:
+        return self.first_at_or_below(start, np.nextafter(value, -np.inf), stop)
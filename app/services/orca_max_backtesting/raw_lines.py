@@ -0,0 +1,136 @@
+import mmap
+from collections.abc import Sequence
+
+import numpy as np
+
+NEW_LINE = ord("\n")
+# bytes.strip() whitespace
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[list(b" \t\n\r\x0b\x0c")] = True
+
+# the new lines are searched in blocks to bound the temporary masks
+SCAN_BLOCK_SIZE = 1 << 26
+# consecutive lines are compared on this many leading bytes at once, the
+# longer ones that are equal there are compared one by one
+PREFIX_SIZE = 32
+# lines compared at once, the (lines, PREFIX_SIZE) index arrays stay at 16 MB each
+DISTINCT_BLOCK_SIZE = 1 << 16
+# lines are decoded from offsets converted in blocks of this size
+ITER_BLOCK_SIZE = 1 << 16
+
+
+def _line_bounds(buffer: np.ndarray, rows=-1) -> tuple:
+    """(starts, ends) of the stripped lines, like iterating the file in text mode"""
+    size = len(buffer)
+    if not size:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    new_lines = [
+        np.flatnonzero(buffer[start:start + SCAN_BLOCK_SIZE] == NEW_LINE) + start
+        for start in range(0, size, SCAN_BLOCK_SIZE)
+    ]
+    new_lines = np.concatenate(new_lines)
+    starts = np.concatenate(([0], new_lines + 1)).astype(np.int64)
+    ends = np.concatenate((new_lines, [size])).astype(np.int64)
+    if starts[-1] == size:
+        # nothing after the last new line
+        starts, ends = starts[:-1], ends[:-1]
+    if rows != -1:
+        # the text readers stop after line number `rows`
+        starts, ends = starts[:rows + 1], ends[:rows + 1]
+
+    while True:
+        strip = (ends > starts) & WHITESPACE[buffer[ends - 1]]
+        if not strip.any():
+            break
+        ends[strip] -= 1
+    while True:
+        strip = (ends > starts) & WHITESPACE[buffer[np.minimum(starts, size - 1)]]
+        if not strip.any():
+            break
+        starts[strip] += 1
+    return starts, ends
+
+
+def _distinct(buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Mask of the lines that differ from the line before them"""
+    lengths = ends - starts
+    same = np.zeros(len(starts), dtype=bool)
+    same[1:] = lengths[1:] == lengths[:-1]
+
+    candidates = np.flatnonzero(same)
+    offsets = np.arange(PREFIX_SIZE)
+    for block in range(0, len(candidates), DISTINCT_BLOCK_SIZE):
+        positions = candidates[block:block + DISTINCT_BLOCK_SIZE]
+        length = lengths[positions][:, None]
+        current = np.minimum(starts[positions][:, None] + offsets, len(buffer) - 1)
+        previous = np.minimum(starts[positions - 1][:, None] + offsets, len(buffer) - 1)
+        equal = ((buffer[current] == buffer[previous]) | (offsets >= length)).all(axis=1)
+        same[positions[~equal]] = False
+
+    for position in np.flatnonzero(same & (lengths > PREFIX_SIZE)).tolist():
+        current = buffer[starts[position]:ends[position]]
+        previous = buffer[starts[position - 1]:ends[position - 1]]
+        same[position] = bool((current == previous).all())
+    return ~same
+
+
+class RawLines(Sequence):
+    """
+    The distinct raw lines of a tick file (the `data_all_list` of the readers)
+    without building the list.
+
+    Only an index of line offsets into the memory-mapped file (or the uploaded
+    bytes) is kept, and it is built on the first access; a line becomes a string
+    when it is read. Pickling a file backed instance stores the path, not the lines.
+    """
+
+    def __init__(self, buffer, file_path: str = None, rows=-1) -> None:
+        self._buffer = buffer
+        self._file_path = file_path
+        self._rows = rows
+        self._starts = None
+        self._ends = None
+
+    @classmethod
+    def from_file(cls, file_path: str, rows=-1) -> "RawLines":
+        with open(file_path, "rb") as file:
+            try:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # an empty file can't be mapped
+                buffer = b""
+        return cls(buffer, file_path, rows)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, rows=-1) -> "RawLines":
+        return cls(data, rows=rows)
+
+    def _index(self) -> tuple:
+        if self._starts is None:
+            buffer = np.frombuffer(self._buffer, dtype=np.uint8)
+            starts, ends = _line_bounds(buffer, self._rows)
+            distinct = _distinct(buffer, starts, ends)
+            self._starts, self._ends = starts[distinct], ends[distinct]
+        return self._starts, self._ends
+
+    def __len__(self) -> int:
+        return len(self._index()[0])
+
+    def _line(self, start: int, end: int) -> str:
+        return self._buffer[start:end].decode("utf-8")
+
+    def __getitem__(self, key):
+        starts, ends = self._index()
+        if isinstance(key, slice):
+            return [self._line(start, end) for start, end in zip(starts[key].tolist(), ends[key].tolist())]
+        return self._line(int(starts[key]), int(ends[key]))
+
+    def __iter__(self):
+        starts, ends = self._index()
+        for block in range(0, len(starts), ITER_BLOCK_SIZE):
+            yield from self[block:block + ITER_BLOCK_SIZE]
+
+    def __reduce__(self):
+        if self._file_path is not None:
+            return RawLines.from_file, (self._file_path, self._rows)
+        return RawLines.from_bytes, (bytes(self._buffer), self._rows)
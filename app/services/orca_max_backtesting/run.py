@@ -1,17 +1,22 @@
+import os
 from typing import Tuple
 
 import pandas as pd
 from app.services.orca_max_backtesting.abc_tester import ABCStrategyTester
-from app.services.orca_max_backtesting.config import PointsDistance
 from app.services.orca_max_backtesting.helper import get_exit_strategies, create_abc_config, get_abc_points, read_file_cleaned, \
     OUTPUT_DIR, export_dict_to_csv, create_exit_strategy
 from app.services.orca_max_backtesting.orca_enums import TeamWay, Contract
+from app.services.orca_max_backtesting.sweep_planner import SweepPlan
+from app.services.orca_max_backtesting.tick_archive import TickArchive, file_contract
+from app.services.orca_max_backtesting.tick_series import as_tick_series
 # from app.services.orca_max_backtesting.plot.periods_data_processor import PeriodsDataProcessor  # Commented out - missing module
 from app.utils.decorators.parallel import Parallel
 from app.utils.decorators.timing.time import time_it
 
 from app.utils.logging_setup import logger
 
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files")
+
 
 def run(
     symbol: str,
@@ -21,46 +26,21 @@ def run(
     all_combinations=False,
     points_key="15_7_5",
 ) -> None:
+    """
+    Validates the ABC points of one config (or of a list of configs) with all the
+    exit strategies, see SweepPlan
+    """
     logger.info("Running ABC finder and validator")
 
     strategies = get_exit_strategies(all_combinations)
+    points_keys = [points_key] if isinstance(points_key, str) else list(points_key)
 
-    conf = create_abc_config[points_key]
-    points_distance = PointsDistance(
-        conf["ab"],
-        conf["bc"],
-        conf["order_point"],
-        1,
-        20,
-        min_distance_short_long=5,
-    )
-
-    @Parallel.processes(
-        iterable=strategies.keys(),
-        processes=8,
-    )
-    def run_bc_distance(exit_strategy_key: str):
-        abc_points, output_folder_path = get_abc_points(
-            points_distance, symbol, data_name, exit_strategy_key, points_key, data, way
-        )
-
-        abc_strategy = ABCStrategyTester(
-            symbol,
-            data,
-            strategies[exit_strategy_key],
-            exit_strategy_key,
-            way,
-            abc_points=abc_points,
-            output_folder_path=output_folder_path,
-            config=conf,
-        )
-
-        return abc_strategy.analyse()
-
-    data = run_bc_distance()
-    data_result_keys = []
-    for _data, order_points_completed_dict in data:
-        data_result_keys.append(_data)
+    results = SweepPlan(points_keys, strategies).run(symbol, data, data_name, way)
+    data_result_keys = [
+        {exit_strategy_key: result}
+        for config_results, _ in results.values()
+        for exit_strategy_key, result in config_results.items()
+    ]
 
     path = f"{OUTPUT_DIR}/{symbol}/{way.value}/ALL_{data_name}__result.csv"
     export_dict_to_csv(data_result_keys, path)
@@ -79,15 +59,9 @@ def run_single(
 )-> Tuple[dict, dict]:
     logger.info("Running ABC finder and validator")
 
-    conf = create_abc_config(points_key)
-    points_distance = PointsDistance(
-        conf["ab"],
-        conf["bc"],
-        conf["order_point"],
-        1,
-        20,
-        min_distance_short_long=5,
-    )
+    points_distance = create_abc_config(points_key)
+    conf = points_distance._asdict()
+    data = as_tick_series(data)
 
     # check if ABC points have been genersted before for  points_distance and file name
     # if so, load the points and skip the ABCFinder
@@ -310,13 +284,20 @@ def run_multiple_files_sequential():
         "18-NQ 12-24.Last",
     ]
 
+    # only the files that are new since the last run get parsed
+    archive = TickArchive()
     for file_name in file_names:
         if symbol not in file_name:
             raise ValueError("Make sure you change the symbol")
 
-        data, all_data = read_file_cleaned(file_name + ".txt", rows=-1)
+        file_path = f"{FILES_DIR}/{file_name}.txt"
+        # by contract month, the 09-24 and 12-24 files cover the same days during the roll
+        contract = file_contract(file_path, symbol)
+        archive.ingest(file_path, contract)
+        data = archive.load_source(file_path, contract)
 
         if EXPORT_TICK_DATA:
+            _, all_data = read_file_cleaned(file_name + ".txt", rows=-1)
             export_tick_by_tick(all_data, file_name, symbol)
 
         run_single(
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import numpy as np
+
+from app.services.orca_max_backtesting.config import (
+    DEFAULT_RESTRICTED_TRADING_HOURS,
+    RESTRICTED_TRADING_HOURS,
+)
+
+
+def _minute_of_day(hours_minutes: str) -> int:
+    hour, minute = map(int, hours_minutes.split(":"))
+    return hour * 60 + minute
+
+
+class SessionCalendar:
+    """
+    The restricted trading windows of an instrument, resolved for a whole
+    TickSeries at once instead of formatting and parsing the time of every tick.
+
+    A tick is restricted when its "HH:MM" falls in a window, both ends included,
+    which is what in_restricted_trading_hours checks tick by tick.
+    """
+
+    def __init__(self, windows=DEFAULT_RESTRICTED_TRADING_HOURS) -> None:
+        self.windows = list(windows)
+        self._minute_windows = [(_minute_of_day(start), _minute_of_day(end)) for start, end in self.windows]
+
+    @classmethod
+    def for_instrument(cls, symbol: str) -> "SessionCalendar":
+        return cls(RESTRICTED_TRADING_HOURS.get(symbol, DEFAULT_RESTRICTED_TRADING_HOURS))
+
+    def is_restricted(self, time: datetime) -> bool:
+        minute = time.hour * 60 + time.minute
+        return any(start <= minute <= end for start, end in self._minute_windows)
+
+    def restricted_mask(self, series) -> np.ndarray:
+        minute_of_day = series.minute_of_day()
+        restricted = np.zeros(len(series), dtype=bool)
+        for start, end in self._minute_windows:
+            restricted |= (minute_of_day >= start) & (minute_of_day <= end)
+        return restricted
+
+    def tradable_mask(self, series) -> np.ndarray:
+        return ~self.restricted_mask(series)
+
+    def tradable_ranges(self, series) -> np.ndarray:
+        """(start, stop) positions of the runs of tradable ticks, as a (n, 2) array"""
+        tradable = np.concatenate(([False], self.tradable_mask(series), [False]))
+        edges = np.flatnonzero(tradable[1:] != tradable[:-1])
+        return edges.reshape(-1, 2)
+
+
+def iter_ranges_from(tradable_ranges: np.ndarray, position: int):
+    """The (start, stop) tradable ranges from a position on, the first one clipped to it"""
+    first = int(np.searchsorted(tradable_ranges[:, 1], position, side="right"))
+    for start, stop in tradable_ranges[first:]:
+        yield max(int(start), position), int(stop)
+
+
+def ranges_mask(tradable_ranges: np.ndarray, size: int) -> np.ndarray:
+    """The tradable mask of `size` ticks back from their (start, stop) ranges"""
+    tradable_ranges = np.asarray(tradable_ranges, dtype=np.int64).reshape(-1, 2)
+    edges = np.zeros(size + 1, dtype=np.int64)
+    np.add.at(edges, tradable_ranges[:, 0], 1)
+    np.add.at(edges, tradable_ranges[:, 1], -1)
+    return np.cumsum(edges[:size]) > 0
@@ -0,0 +1,103 @@
+"""
+A sweep over ABC configs and exit strategies as a graph of stages, where
+every node is computed once and shared by the nodes depending on it:
+
+- detection: the ABC patterns of every distinct (ab, bc), they don't depend on
+  the order point nor on the exit strategy
+- projection: the order points of the patterns, for every distinct
+  (ab, bc, order_point)
+- validation: the outcome of every distinct exit strategy, validated on one
+  ExitGrid per projection and side
+
+The detection and the projection of the configs not in the artifact cache are
+made together by get_abc_points_sweep, the validation by analyse_grid.
+"""
+import copy
+import os
+
+from app.services.orca_max_backtesting.abc_tester import ABCStrategyTester
+from app.services.orca_max_backtesting.helper import create_abc_config, create_folder, get_abc_points_sweep
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_series import as_tick_series
+from app.utils.logging_setup import logger
+
+
+def exit_strategy_values(exit_strategy: dict) -> tuple:
+    return (
+        exit_strategy["Long"]["TP"],
+        exit_strategy["Long"]["SL"],
+        exit_strategy["Short"]["TP"],
+        exit_strategy["Short"]["SL"],
+        exit_strategy["max_lost_consecutive_count"],
+    )
+
+
+def unique_exit_strategies(exit_strategies: dict) -> dict:
+    """The exit strategies without the repeated ones, the first key of a strategy is kept"""
+    unique = {}
+    for key, exit_strategy in exit_strategies.items():
+        unique.setdefault(exit_strategy_values(exit_strategy), (key, exit_strategy))
+    return dict(unique.values())
+
+
+class SweepPlan:
+    def __init__(self, points_keys: list, exit_strategies: dict) -> None:
+        # projection (ab, bc, order_point) -> (points key, PointsDistance), the first key of a config is kept
+        self.projections = {}
+        for points_key in points_keys:
+            points_distance = create_abc_config(points_key)
+            self.projections.setdefault(
+                (points_distance.ab, points_distance.bc, points_distance.order_point),
+                (points_key, points_distance),
+            )
+        self.detections = list(dict.fromkeys((ab, bc) for ab, bc, _ in self.projections))
+        self.exit_strategies = unique_exit_strategies(exit_strategies)
+
+        logger.info(
+            f"Sweep of {len(points_keys)} configs x {len(exit_strategies)} exit strategies: "
+            f"{len(self.detections)} detections, {len(self.projections)} projections, "
+            f"{len(self.projections) * len(self.exit_strategies)} validations"
+        )
+
+    def run(self, symbol: str, data, data_name: str, way) -> dict:
+        """
+        Runs the sweep into one output folder, with a sub folder per config.
+
+        :return: {points key: (results, order points completed)} of analyse_grid
+        """
+        data = as_tick_series(data)
+        output_folder_path = create_folder(symbol, data_name, team_way=way)
+
+        # the points are labelled with an exit strategy, analyse_grid relabels them
+        exit_strategy_key = next(iter(self.exit_strategies))
+        projections = list(self.projections.values())
+        abc_points = get_abc_points_sweep(
+            [points_distance for _, points_distance in projections], symbol, exit_strategy_key, data, way
+        )
+
+        # the validation of all the configs runs on the same ticks
+        calendar = SessionCalendar.for_instrument(symbol)
+        tradable_ranges = calendar.tradable_ranges(data)
+        extrema = RangeExtrema(data.price, calendar.tradable_mask(data))
+
+        results = {}
+        for (points_key, points_distance), points in zip(projections, abc_points):
+            config_folder_path = os.path.join(output_folder_path, points_key)
+            os.makedirs(os.path.join(config_folder_path, "trades"), exist_ok=True)
+            # the validators fill the result dicts of the exit strategies, every config gets its own
+            exit_strategies = copy.deepcopy(self.exit_strategies)
+            abc_strategy = ABCStrategyTester(
+                symbol,
+                data,
+                exit_strategies[exit_strategy_key],
+                exit_strategy_key,
+                way,
+                abc_points=points,
+                output_folder_path=config_folder_path,
+                config=points_distance._asdict(),
+                tradable_ranges=tradable_ranges,
+                extrema=extrema,
+            )
+            results[points_key] = abc_strategy.analyse_grid(exit_strategies)
+        return results
@@ -0,0 +1,106 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.services.orca_max_backtesting import abc_kernel, helper
+from app.services.orca_max_backtesting.abc import ABCDetectorBank, ABCFinder
+from app.services.orca_max_backtesting.abc_jump import find_abc_points_jump
+from app.services.orca_max_backtesting.abc_kernel import find_abc_points
+from app.services.orca_max_backtesting.artifact_cache import ArtifactCache
+from app.services.orca_max_backtesting.helper import create_abc_config, get_abc_points_sweep
+from app.services.orca_max_backtesting.orca_enums import TeamWay
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from test_tick_series import find_with_hours_check, random_ticks
+
+
+class TestABCKernel(unittest.TestCase):
+    def setUp(self):
+        self.data = random_ticks(rows=30000, seed=11)
+        self.series = TickSeries.from_list(self.data)
+
+    def assert_same_points(self, got, expected):
+        self.assertEqual(got, expected)
+        for got_points, expected_points in zip(got, expected):
+            for got_point, expected_point in zip(got_points, expected_points):
+                self.assertEqual(list(got_point), list(expected_point))
+                self.assertEqual([type(value) for value in got_point.values()],
+                                 [type(value) for value in expected_point.values()])
+
+    def test_matches_forward_abc(self):
+        for points_key in ("2_1_1_1", "6_3_1_2", "15_7_5_2"):
+            points_distance = create_abc_config(points_key)
+            expected = find_with_hours_check(ABCFinder(points_distance, "4_4", TeamWay.BreakThrough), self.data)
+            got = find_abc_points(self.series, points_distance, "4_4", SessionCalendar())
+            self.assertTrue(expected[0] and expected[1])
+            self.assert_same_points(got, expected)
+
+    def test_state_carries_over_the_chunks(self):
+        points_distance = create_abc_config("6_3_1_2")
+        expected = find_abc_points(self.series, points_distance, "4_4")
+        with mock.patch.object(abc_kernel, "SCAN_CHUNK_SIZE", 7):
+            self.assert_same_points(find_abc_points(self.series, points_distance, "4_4"), expected)
+
+    def test_empty_series(self):
+        self.assertEqual(find_abc_points(self.series[:0], create_abc_config("6_3_1_2"), "4_4"), ([], []))
+
+    def test_bank_matches_one_finder_per_config(self):
+        points_keys = ["2_1_1_1", "6_3_1_2", "6_3_4_2", "15_7_5_2", "10_5_2_2"]
+        points_distances = [create_abc_config(points_key) for points_key in points_keys]
+        expected = [
+            tuple(ABCFinder(points_distance, "4_4", TeamWay.BreakThrough).find(self.series))
+            for points_distance in points_distances
+        ]
+        bank = ABCDetectorBank(points_distances, "4_4", TeamWay.BreakThrough)
+        results = bank.find(self.series)
+        self.assertEqual(len(results), len(points_keys))
+        for got, expected_points in zip(results, expected):
+            self.assert_same_points(got, expected_points)
+
+        with mock.patch.object(abc_kernel, "SCAN_CHUNK_SIZE", 10):
+            for got, expected_points in zip(bank.find(self.series), expected):
+                self.assert_same_points(got, expected_points)
+
+    def test_sweep_only_finds_the_configs_not_cached(self):
+        points_distances = [create_abc_config(points_key) for points_key in ("6_3_1_2", "15_7_5_2")]
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.object(helper, "ArtifactCache", lambda: ArtifactCache(cache_dir)):
+            first = get_abc_points_sweep(points_distances[:1], "NQ", "4_4", self.series, TeamWay.BreakThrough)
+            with mock.patch.object(abc_kernel, "scan_abc_bank", wraps=abc_kernel.scan_abc_bank) as scan, \
+                    mock.patch.object(helper, "dataset_fingerprint", wraps=helper.dataset_fingerprint) as fingerprint:
+                sweep = get_abc_points_sweep(points_distances, "NQ", "4_4", self.series, TeamWay.BreakThrough)
+            self.assertEqual(scan.call_args.args[2:], ([15], [7]))
+            fingerprint.assert_called_once()
+
+        self.assertEqual(sweep[0], first[0])
+        expected = find_abc_points(self.series, points_distances[1], "4_4")
+        self.assertEqual(sweep[1], {"down_order_points_list": expected[0], "up_order_points_list": expected[1]})
+
+
+    def test_jump_engine_is_tick_exact(self):
+        rnd = np.random.default_rng(8)
+        size = len(self.series)
+        # mostly flat with ties at the extremes, and a few big moves
+        quiet_price = 20000 + np.round(rnd.integers(-2, 3, size=size) * 0.25, 2)
+        quiet_price[::5000] += 30
+        quiet = TickSeries(quiet_price, self.series.ts[:size].copy(), np.arange(size))
+
+        for series in (self.series, quiet):
+            for points_key in ("2_1_1_1", "6_3_1_2", "15_7_5_2"):
+                points_distance = create_abc_config(points_key)
+                for calendar in (SessionCalendar(), SessionCalendar([])):
+                    self.assert_same_points(
+                        find_abc_points_jump(series, points_distance, "4_4", calendar),
+                        find_abc_points(series, points_distance, "4_4", calendar),
+                    )
+
+        finder = ABCFinder(create_abc_config("6_3_1_2"), "4_4", TeamWay.BreakThrough, engine="jump")
+        self.assertEqual(finder.find(self.series), find_abc_points(self.series, create_abc_config("6_3_1_2"), "4_4"))
+        with self.assertRaises(ValueError):
+            ABCFinder(create_abc_config("6_3_1_2"), "4_4", TeamWay.BreakThrough, engine="fast")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.services.orca_max_backtesting import abc_tester
+from app.services.orca_max_backtesting.abc_kernel import find_abc_points
+from app.services.orca_max_backtesting.abc_validator import ABCValidator
+from app.services.orca_max_backtesting.exit_grid import FILLED, LOST, NOT_CLOSED, ExitGrid
+from app.services.orca_max_backtesting.helper import create_abc_config, create_exit_strategy
+from app.services.orca_max_backtesting.orca_enums import OrderStatus, TeamWay, TradingPosition
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar, ranges_mask
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from test_tick_series import random_ticks
+
+
+def first_passage(price, tradable, start, condition):
+    for position in range(start, len(price)):
+        if tradable[position] and condition(price[position]):
+            return position
+    return None
+
+
+class TestABCValidator(unittest.TestCase):
+    def setUp(self):
+        self.series = TickSeries.from_list(random_ticks(rows=8000, seed=5))
+        self.tradable = SessionCalendar.for_instrument("NQ").tradable_mask(self.series)
+        self.config = {"ab": 2, "bc": 1, "order_point": 1}
+
+    def test_ranges_mask(self):
+        calendar = SessionCalendar.for_instrument("NQ")
+        np.testing.assert_array_equal(
+            ranges_mask(calendar.tradable_ranges(self.series), len(self.series)), self.tradable
+        )
+        self.assertEqual(ranges_mask(np.zeros((0, 2), dtype=np.int64), 3).tolist(), [False] * 3)
+
+    def test_first_passage_matches_the_tick_scan(self):
+        price = self.series.price.tolist()
+        down, up = find_abc_points(self.series, create_abc_config("2_1_1_1"), "4_4")
+        for team_way in TeamWay:
+            for order_points, points_type in ((up, TradingPosition.Long), (down, TradingPosition.Short)):
+                exit_strategy = create_exit_strategy("10_3")
+                rows = [dict(row) for row in order_points]
+                validator = ABCValidator(
+                    rows, self.series, points_type, exit_strategy, team_way, "NQ", "/tmp", self.config
+                )
+                validator.validate()
+                tp, sl = validator.TP, validator.SL
+                above = (points_type == TradingPosition.Long) == (team_way == TeamWay.BreakThrough)
+
+                for row in rows:
+                    order_point = row["Order_point"]
+                    triggered = first_passage(
+                        price, self.tradable, row["C_index"],
+                        (lambda p: p >= order_point) if above else (lambda p: p <= order_point),
+                    )
+                    if points_type == TradingPosition.Long:
+                        win, lose = (lambda p: p >= order_point + tp), (lambda p: p <= order_point - sl)
+                    else:
+                        win, lose = (lambda p: p <= order_point - tp), (lambda p: p >= order_point + sl)
+                    closed = None if triggered is None else first_passage(
+                        price, self.tradable, triggered + 1, lambda p: win(p) or lose(p)
+                    )
+
+                    if closed is None:
+                        self.assertEqual(row["Result"], OrderStatus.NotTriggered.value)
+                        self.assertEqual(row.get("Triggered_index"), triggered)
+                        continue
+                    self.assertEqual((row["Triggered_index"], row["Closed_index"]), (triggered, closed))
+                    self.assertEqual(row["ClosedPrice"], price[closed])
+                    expected = OrderStatus.Filled if win(price[closed]) else OrderStatus.Lost
+                    self.assertEqual(row["Result"], expected.value)
+
+    def test_order_on_empty_data_is_not_triggered(self):
+        validator = ABCValidator(
+            [], TickSeries.from_list([]), TradingPosition.Long, create_exit_strategy("10_3"), TeamWay.Reverse,
+            "NQ", "/tmp", self.config,
+        )
+        row = {"C_index": 0, "Order_point": 20000.0}
+        validator._validate_order(row)
+        self.assertEqual(row["Result"], OrderStatus.NotTriggered.value)
+        self.assertIsNone(row["Triggered"])
+
+    def test_exit_grid_matches_one_validation_per_pair(self):
+        down, up = find_abc_points(self.series, create_abc_config("2_1_1_1"), "4_4")
+        extrema = RangeExtrema(self.series.price, self.tradable)
+        pairs = [(2, 2), (2, 7), (5, 3), (10, 10), (3, 5)]
+        statuses = {NOT_CLOSED: OrderStatus.NotTriggered.value, FILLED: OrderStatus.Filled.value, LOST: OrderStatus.Lost.value}
+
+        for team_way in TeamWay:
+            for order_points, points_type in ((up, TradingPosition.Long), (down, TradingPosition.Short)):
+                exits = [create_exit_strategy(f"{tp}_{sl}")[points_type.value] for tp, sl in pairs]
+                grid = ExitGrid(
+                    extrema, order_points, points_type, team_way,
+                    [exit_["TP"] for exit_ in exits], [exit_["SL"] for exit_ in exits],
+                )
+                self.assertEqual(grid.outcome.shape, (len(order_points), len(grid.tp_values), len(grid.sl_values)))
+
+                for tp, sl in pairs:
+                    validated = []
+                    for passages in (None, "grid"):
+                        exit_strategy = create_exit_strategy(f"{tp}_{sl}")
+                        exit_ = exit_strategy[points_type.value]
+                        rows = [dict(row) for row in order_points]
+                        validator = ABCValidator(
+                            rows, self.series, points_type, exit_strategy, team_way, "NQ", "/tmp",
+                            self.config, extrema=extrema,
+                        )
+                        if passages:
+                            passages = grid.passages(exit_["TP"], exit_["SL"])
+                        validated.append(validator.validate(passages))
+                    self.assertEqual(validated[0], validated[1])
+
+                    outcome = grid.outcome[:, grid.tp_values.index(exit_["TP"]), grid.sl_values.index(exit_["SL"])]
+                    self.assertEqual([statuses[value] for value in outcome.tolist()], [row["Result"] for row in validated[0][1]])
+
+    def test_analyse_sides_in_processes(self):
+        down, up = find_abc_points(self.series, create_abc_config("2_1_1_1"), "4_4")
+        analysed = []
+        for cpu_count in (1, abc_tester.WORKERS):
+            with tempfile.TemporaryDirectory() as output_folder_path, \
+                    mock.patch.object(abc_tester.os, "cpu_count", return_value=cpu_count):
+                tester = abc_tester.ABCStrategyTester(
+                    "NQ", self.series, create_exit_strategy("10_3"), "10_3", TeamWay.BreakThrough,
+                    {"down_order_points_list": [dict(row) for row in down], "up_order_points_list": [dict(row) for row in up]},
+                    output_folder_path, self.config,
+                )
+                analysed.append(tester.analyse())
+        self.assertEqual(analysed[0], analysed[1])
+        self.assertEqual(set(analysed[0][1]), {TradingPosition.Long.value, TradingPosition.Short.value})
+
+    def test_analyse_keeps_a_failed_side_as_none(self):
+        down, up = find_abc_points(self.series, create_abc_config("2_1_1_1"), "4_4")
+        validate = abc_tester.ABCStrategyTester.validate
+
+        def fail_short(tester, order_points, points_type, *args, **kwargs):
+            if points_type == TradingPosition.Short:
+                raise ValueError("broken side")
+            return validate(tester, order_points, points_type, *args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as output_folder_path, \
+                mock.patch.object(abc_tester.os, "cpu_count", return_value=1), \
+                mock.patch.object(abc_tester.ABCStrategyTester, "validate", fail_short):
+            tester = abc_tester.ABCStrategyTester(
+                "NQ", self.series, create_exit_strategy("10_3"), "10_3", TeamWay.BreakThrough,
+                {"down_order_points_list": down, "up_order_points_list": up}, output_folder_path, self.config,
+            )
+            results, order_points_completed = tester.analyse()
+        self.assertIsNone(results["10_3"][TradingPosition.Short.value])
+        self.assertIsNotNone(results["10_3"][TradingPosition.Long.value])
+        self.assertEqual(set(order_points_completed), {TradingPosition.Long.value})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.services.orca_max_backtesting import artifact_cache, helper
+from app.services.orca_max_backtesting.abc import ABCFinder
+from app.services.orca_max_backtesting.artifact_cache import ArtifactCache, abc_points_key, dataset_fingerprint
+from app.services.orca_max_backtesting.helper import create_abc_config, get_abc_points
+from app.services.orca_max_backtesting.orca_enums import TeamWay
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from test_tick_series import random_ticks
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ArtifactCache(self.tmp_dir.name)
+        self.series = TickSeries.from_list(random_ticks(rows=5000))
+        self.points_distance = create_abc_config("6_3_1_2")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_abc_points_round_trip(self):
+        points = ABCFinder(self.points_distance, "4_4", TeamWay.BreakThrough).find(self.series)
+        self.assertTrue(points[0] and points[1])
+
+        self.assertTrue(self.cache.put_records("points", {"down": points[0], "up": points[1], "none": []}))
+        self.assertEqual(self.cache.get_records("points", ["down", "up", "none"]), [points[0], points[1], []])
+        self.assertIsNone(self.cache.get_records("missing", ["down"]))
+
+    def test_records_that_are_not_plain_values_are_not_cached(self):
+        self.assertFalse(self.cache.put_records("mixed", {"points": [{"A": 1}, {"A": 1.5}]}))
+        self.assertFalse(self.cache.put_records("objects", {"points": [{"A": object()}]}))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_key_follows_everything_the_points_depend_on(self):
+        calendar = SessionCalendar()
+        dataset = dataset_fingerprint(self.series)
+        key = abc_points_key(dataset, self.points_distance, "4_4", calendar)
+        same_ticks = dataset_fingerprint(TickSeries.from_list(random_ticks(rows=5000)))
+        self.assertEqual(key, abc_points_key(same_ticks, self.points_distance, "4_4", calendar))
+
+        other_keys = [
+            abc_points_key(dataset_fingerprint(self.series[:-1]), self.points_distance, "4_4", calendar),
+            abc_points_key(dataset, create_abc_config("6_3_2_2"), "4_4", calendar),
+            abc_points_key(dataset, self.points_distance, "4_5", calendar),
+            abc_points_key(dataset, self.points_distance, "4_4", SessionCalendar([("13:00", "13:09")])),
+        ]
+        with mock.patch.object(artifact_cache, "ENGINE_VERSION", -1):
+            other_keys.append(abc_points_key(dataset, self.points_distance, "4_4", calendar))
+        self.assertNotIn(key, other_keys)
+        self.assertEqual(len(set(other_keys)), len(other_keys))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        records = {"points": [{"A": float(i)} for i in range(1000)]}
+        self.cache.put_records("first", records)
+        size = os.path.getsize(os.path.join(self.tmp_dir.name, "first.npz"))
+        self.cache.max_bytes = size * 2
+
+        self.cache.put_records("second", records)
+        os.utime(os.path.join(self.tmp_dir.name, "second.npz"), (time.time() - 10, time.time() - 10))
+        self.assertIsNotNone(self.cache.get_records("first", ["points"]))
+        self.cache.put_records("third", records)
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["first.npz", "third.npz"])
+
+    def test_json_entries_expire_after_the_ttl(self):
+        cache = ArtifactCache(self.tmp_dir.name, ttl=60)
+        value = {"result": {"Long": {"TP": 4, "1": {"NetProfit": "$1,200"}}}, "trades": {"Long": [{"A": 1.5}]}}
+        cache.put_json("backtest", value)
+        self.assertEqual(cache.get_json("backtest"), value)
+
+        with mock.patch.object(artifact_cache.time, "time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get_json("backtest"))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_entry_evicted_by_another_process_is_a_miss(self):
+        cache = ArtifactCache(self.tmp_dir.name, ttl=60)
+        cache.put_json("backtest", {"result": 1})
+        # removed between the read and the access time update
+        with mock.patch.object(artifact_cache.os, "utime", side_effect=FileNotFoundError):
+            self.assertIsNone(cache.get_json("backtest"))
+        # expired and removed by another process first
+        with mock.patch.object(artifact_cache.time, "time", return_value=time.time() + 61), \
+                mock.patch.object(artifact_cache.os, "remove", side_effect=FileNotFoundError):
+            self.assertIsNone(cache.get_json("backtest"))
+            cache.max_bytes = 0
+            cache.evict()
+
+    def test_get_abc_points_hits_the_cache(self):
+        with mock.patch.object(helper, "create_folder", return_value=self.tmp_dir.name), \
+                mock.patch.object(helper, "ArtifactCache", lambda: self.cache):
+            arguments = (self.points_distance, "NQ", "NQ test", "4_4", "6_3_1_2", self.series, TeamWay.BreakThrough)
+            computed, _ = get_abc_points(*arguments)
+            with mock.patch.object(ABCFinder, "find") as find:
+                cached, _ = get_abc_points(*arguments)
+            find.assert_not_called()
+        self.assertEqual(cached, computed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException, UploadFile
+
+from app.api.v1.endpoints.max_backtest import run_max_backtest_logic
+from app.api.v1.endpoints import max_backtest
+from app.services.orca_max_backtesting import helper
+from app.services.orca_max_backtesting.artifact_cache import ArtifactCache
+from app.services.orca_max_backtesting.backtest_jobs import BacktestJobs, JobCancelled
+from app.services.orca_max_backtesting.orca_enums import JobStatus, TeamWay
+from app.services.orca_max_backtesting.progress import report_progress
+from app.services.orca_max_backtesting.run import run_single
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import parse_tick_file, spool_upload
+from test_tick_store import write_tick_file
+
+
+def count_ticks(ticks, stages=("detection",)):
+    for stage in stages:
+        for tick in range(0, ticks + 1, ticks // 4):
+            report_progress(stage, tick, ticks)
+    return {"ticks": ticks}
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestBacktestJobs(unittest.TestCase):
+    def setUp(self):
+        self.jobs = BacktestJobs(max_running=1)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+
+    def wait(self, job_id):
+        return asyncio.run(asyncio.wait_for(self.jobs.wait(job_id), timeout=30))
+
+    def test_done(self):
+        job_id = self.jobs.submit(count_ticks, ticks=1000)
+        status = self.wait(job_id)
+        self.assertEqual(status["status"], JobStatus.Done.value)
+        self.assertEqual(status["name"], "count_ticks")
+        self.assertEqual((status["stage"], status["ticks_total"]), ("detection", 1000))
+        self.assertEqual(self.jobs.result(job_id), {"ticks": 1000})
+        self.assertIsNone(status["eta_seconds"])
+
+    def test_failed_job_raises_its_error(self):
+        job_id = self.jobs.submit(fail, message="no data")
+        status = self.wait(job_id)
+        self.assertEqual(status["status"], JobStatus.Failed.value)
+        self.assertEqual(status["error"], "no data")
+        with self.assertRaisesRegex(ValueError, "no data"):
+            self.jobs.result(job_id)
+
+    def test_progress_and_eta(self):
+        job = self.jobs._jobs[self.jobs.submit(sleep, seconds=0)]
+        job.status = JobStatus.Running
+        job.progress("validation Long", 100, 1000)
+        job.stage_started_at -= 2
+        job.progress("validation Long", 300, 1000)
+        self.assertEqual(job.eta(), 7.0)
+        job.progress("validation Short", 0, 1000)
+        self.assertIsNone(job.eta())
+        self.wait(job.id)
+
+    def test_cancel_queued_and_running(self):
+        running = self.jobs.submit(sleep, seconds=60)
+        queued = self.jobs.submit(sleep, seconds=60)
+        self.assertEqual(self.jobs.status(running)["status"], JobStatus.Running.value)
+        self.assertEqual(self.jobs.status(queued)["status"], JobStatus.Queued.value)
+
+        process = self.jobs._jobs[running].process
+        self.assertTrue(self.jobs.cancel(queued))
+        self.assertTrue(self.jobs.cancel(running))
+        self.assertEqual(self.wait(running)["status"], JobStatus.Cancelled.value)
+        self.assertEqual(self.jobs.status(queued)["status"], JobStatus.Cancelled.value)
+        self.assertFalse(self.jobs.cancel(running))
+        process.join(10)
+        self.assertFalse(process.is_alive())
+        with self.assertRaises(JobCancelled):
+            self.jobs.result(running)
+
+        # the next job runs once the cancelled one is gone
+        self.assertEqual(self.wait(self.jobs.submit(sleep, seconds=0))["status"], JobStatus.Done.value)
+
+    def test_cleanup_runs_at_the_end_of_any_job(self):
+        cleaned = []
+        done = self.jobs.submit(sleep, cleanup=lambda: cleaned.append("done"), seconds=0)
+        queued = self.jobs.submit(sleep, cleanup=lambda: cleaned.append("queued"), seconds=0)
+        self.jobs.cancel(queued)
+        self.wait(done)
+        self.assertEqual(sorted(cleaned), ["done", "queued"])
+
+    def test_finished_results_are_bounded_by_size(self):
+        jobs = BacktestJobs(max_finished=10, max_finished_bytes=250)
+        job_ids = [jobs.submit_result({"job": number}, result_size=100) for number in range(4)]
+        self.assertEqual([job_id in jobs._jobs for job_id in job_ids], [False, False, True, True])
+        # the last finished job is kept whatever its size
+        big = jobs.submit_result({"job": "big"}, result_size=1000)
+        self.assertEqual(list(jobs._jobs), [big])
+
+    def test_wait_result_of_a_dropped_job(self):
+        jobs = BacktestJobs(max_finished=1)
+        self.addCleanup(jobs.shutdown)
+        job_id = jobs.submit(count_ticks, ticks=1000)
+        job = jobs._jobs[job_id]
+
+        async def drop_while_waiting():
+            waiting = asyncio.ensure_future(jobs.wait_result(job_id))
+            await asyncio.to_thread(job.finished.wait, 30)
+            # a newer finished job drops it
+            jobs.submit_result({"job": "newer"})
+            self.assertNotIn(job_id, jobs._jobs)
+            return await asyncio.wait_for(waiting, timeout=30)
+
+        self.assertEqual(asyncio.run(drop_while_waiting()), {"ticks": 1000})
+
+    def test_unknown_job(self):
+        with self.assertRaises(KeyError):
+            self.jobs.status("unknown")
+
+
+class TestMaxBacktestJob(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        output_dir = self.tmp_dir.name
+        self.cache = ArtifactCache(os.path.join(output_dir, "backtests"), ttl=60)
+        # forked jobs, they see the patched output and cache directories
+        self.jobs = BacktestJobs(start_method="fork")
+        for patch in (
+            mock.patch.object(max_backtest, "backtest_jobs", self.jobs),
+            mock.patch.object(helper, "OUTPUT_DIR", output_dir),
+            mock.patch.object(helper, "ArtifactCache", lambda: ArtifactCache(os.path.join(output_dir, "cache"))),
+            mock.patch.object(max_backtest, "backtest_cache", lambda: self.cache),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.file_path = os.path.join(output_dir, "NQ 09-24.Last.txt")
+        write_tick_file(self.file_path, rows=5000)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+        self.tmp_dir.cleanup()
+
+    def run_backtest(self, notes=None):
+        with open(self.file_path, "rb") as f:
+            upload = UploadFile(io.BytesIO(f.read()), filename="NQ 09-24.Last.txt")
+        return asyncio.run(
+            run_max_backtest_logic(
+                account_name="APEX", mode="backtesting", contract="NQ", max_mode_value="Reverse",
+                point_key="2_1_1_1", exit_strategy_key="4_4", notes=notes, file=upload,
+            )
+        )
+
+    def test_max_backtest_runs_as_a_job(self):
+        spooled = []
+
+        def spool(file):
+            spooled.append(spool_upload(file))
+            return spooled[-1]
+
+        with mock.patch.object(max_backtest, "spool_upload", spool):
+            payload = self.run_backtest()
+        # the job parsed the copy of the upload, which is gone with the job
+        (upload_path, _), = spooled
+        self.assertFalse(os.path.exists(upload_path))
+        result, trades = run_single(
+            "NQ", TickSeries.from_columns(parse_tick_file(self.file_path)), "NQ 09-24.Last.txt-v2",
+            TeamWay.Reverse, "4_4", "2_1_1_1",
+        )
+        self.assertEqual(payload["result"], result)
+        self.assertEqual(payload["trades"], trades)
+        self.assertEqual(payload["meta"]["source"], "file")
+
+    def test_cancelled_backtest_is_a_conflict(self):
+        job_id = self.jobs.submit(sleep, seconds=60)
+        self.jobs.cancel(job_id)
+        with mock.patch.object(max_backtest, "submit_max_backtest", mock.AsyncMock(return_value=job_id)), \
+                self.assertRaises(HTTPException) as raised:
+            asyncio.run(run_max_backtest_logic())
+        self.assertEqual(raised.exception.status_code, 409)
+
+    def test_repeated_backtest_comes_from_the_cache(self):
+        payload = self.run_backtest()
+        with mock.patch.object(self.jobs, "submit") as submit:
+            cached = self.run_backtest(notes="again")
+        submit.assert_not_called()
+        self.assertEqual(cached["meta"]["notes"], "again")
+        del payload["meta"], cached["meta"]
+        # the payload is answered as JSON either way
+        self.assertEqual(cached, json.loads(json.dumps(payload)))
+
+    def run_range_backtest(self, fingerprint):
+        data = TickSeries.from_columns(parse_tick_file(self.file_path))
+        with mock.patch.object(max_backtest, "range_fingerprint", side_effect=[fingerprint]), \
+                mock.patch.object(max_backtest, "fetch_data_between_dates", return_value=data), \
+                mock.patch.object(self.jobs, "submit", wraps=self.jobs.submit) as submit:
+            payload = asyncio.run(
+                run_max_backtest_logic(
+                    account_name="APEX", mode="backtesting", contract="NQ", max_mode_value="Reverse",
+                    point_key="2_1_1_1", exit_strategy_key="4_4", date_from="2024-07-07", date_to="2024-07-07",
+                )
+            )
+        self.assertEqual(payload["meta"]["source"], "date_range")
+        return submit.called
+
+    def test_range_is_cached_with_its_rows(self):
+        self.assertTrue(self.run_range_backtest({"rows": 5000, "max_id": 5000}))
+        self.assertFalse(self.run_range_backtest({"rows": 5000, "max_id": 5000}))
+        # rows were uploaded into the range since
+        self.assertTrue(self.run_range_backtest({"rows": 5001, "max_id": 5001}))
+        # not cached when they can't be counted
+        self.assertTrue(self.run_range_backtest(ConnectionError("unreachable")))
+        self.assertTrue(self.run_range_backtest(ConnectionError("unreachable")))
+
+
+if __name__ == "__main__":
+    unittest.main()
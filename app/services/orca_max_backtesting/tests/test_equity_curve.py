@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from app.services.orca_max_backtesting.equity_curve import TRADING_DAYS_PER_YEAR, EquityCurveAccumulator
+from app.services.orca_max_backtesting.tick_codec import datetime_to_seconds
+
+
+def seconds(*args):
+    return datetime_to_seconds(datetime(*args))
+
+
+class TestEquityCurveAccumulator(unittest.TestCase):
+    def test_metrics_of_a_curve(self):
+        curve = EquityCurveAccumulator(dtype=np.int64)
+        for pnl, closed in [
+            (80, seconds(2024, 9, 2, 10)),
+            (-40, seconds(2024, 9, 2, 11)),
+            (-40, seconds(2024, 9, 2, 12)),
+            (80, seconds(2024, 9, 3, 9)),
+            (-40, seconds(2024, 9, 3, 10)),
+        ]:
+            curve.add(pnl, closed)
+
+        metrics = curve.metrics()
+        self.assertEqual(
+            {key: metrics[key] for key in ("Trades", "NetPnL", "MaxEquityDrawDown", "MaxConsecutiveLoss")},
+            {"Trades": 5, "NetPnL": 40, "MaxEquityDrawDown": 80, "MaxConsecutiveLoss": 80},
+        )
+        self.assertIsInstance(metrics["NetPnL"], int)
+        self.assertEqual(metrics["MaxTimeUnderWater"], 7200)
+        self.assertEqual((metrics["TradingDays"], metrics["BestDay"], metrics["WorstDay"]), (2, 40.0, 0.0))
+        self.assertEqual(metrics["MeanDailyPnL"], 20.0)
+        self.assertAlmostEqual(metrics["Sharpe"], 20 / np.std([0, 40], ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+        # metrics() doesn't close the current day of the accumulator
+        curve.add(-40, seconds(2024, 9, 3, 11))
+        self.assertEqual(curve.metrics()["TradingDays"], 2)
+
+    def test_empty_curve(self):
+        metrics = EquityCurveAccumulator().metrics()
+        self.assertEqual((metrics["Trades"], metrics["TradingDays"], metrics["Sharpe"]), (0, 0, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
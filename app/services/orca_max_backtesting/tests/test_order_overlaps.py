@@ -0,0 +1,49 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.orca_max_backtesting.helper import get_overlapping_orders
+from app.services.orca_max_backtesting.order_overlaps import OrderOverlapIndex
+
+
+def random_orders(size, seed):
+    rnd = np.random.default_rng(seed)
+    start = datetime(2024, 9, 2, 9, 30)
+    orders = []
+    for triggered, span in zip(rnd.integers(0, 20000, size).tolist(), rnd.integers(0, 900, size).tolist()):
+        orders.append(
+            {
+                "Triggered": (start + timedelta(seconds=triggered)).strftime("%Y-%m-%d %H:%M:%S"),
+                "Closed": (start + timedelta(seconds=triggered + span)).strftime("%Y-%m-%d %H:%M:%S"),
+                "Result": "Filled" if rnd.random() < 0.5 else "Lost",
+            }
+        )
+    return sorted(orders, key=lambda order: order["Closed"])
+
+
+class TestOrderOverlapIndex(unittest.TestCase):
+    def test_overlaps_match_the_pairwise_comparison(self):
+        for size in (0, 1, 70, 600):
+            orders = random_orders(size, seed=size)
+            overlap_index = OrderOverlapIndex(orders)
+            for i, order in enumerate(orders):
+                expected = [j for j in range(i + 1, size) if orders[j]["Triggered"] <= order["Closed"]]
+                self.assertEqual(overlap_index.overlaps(i), expected)
+
+    def test_get_overlapping_orders(self):
+        orders = random_orders(300, seed=2)
+        overlapping = get_overlapping_orders(orders)
+        lost = [i for i, order in enumerate(orders) if order["Result"] != "Filled"]
+        self.assertEqual([item["order"][0] for item in overlapping],
+                         [i for i in lost if OrderOverlapIndex(orders).overlaps(i)])
+        for item in overlapping:
+            i, order = item["order"]
+            self.assertIs(order, orders[i])
+            for j, overlapped in item["overlaps"]:
+                self.assertIs(overlapped, orders[j])
+                self.assertTrue(j > i and overlapped["Triggered"] <= order["Closed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
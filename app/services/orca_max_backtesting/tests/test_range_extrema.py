@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from app.services.orca_max_backtesting import range_extrema
+from app.services.orca_max_backtesting.range_extrema import RangeExtrema
+
+
+def first(positions, default):
+    return positions[0] if positions else default
+
+
+class TestRangeExtrema(unittest.TestCase):
+    def setUp(self):
+        rnd = np.random.default_rng(4)
+        self.sizes = (1, 63, 64, 65, 3000)
+        self.rnd = rnd
+
+    def check(self, values, valid, queries=400):
+        size = len(values)
+        extrema = RangeExtrema(values, valid)
+        usable = valid if valid is not None else np.ones(size, dtype=bool)
+        for _ in range(queries):
+            start, stop = sorted(self.rnd.integers(0, size + 3, size=2).tolist())
+            value = float(self.rnd.choice(values)) + float(self.rnd.choice([-0.25, 0, 0.25]))
+            span = [i for i in range(start, min(stop, size)) if usable[i]]
+            stop_at = min(stop, size)
+
+            self.assertEqual(extrema.first_at_or_above(start, value, stop), first([i for i in span if values[i] >= value], stop_at))
+            self.assertEqual(extrema.first_at_or_below(start, value, stop), first([i for i in span if values[i] <= value], stop_at))
+            self.assertEqual(extrema.first_above(start, value, stop), first([i for i in span if values[i] > value], stop_at))
+            self.assertEqual(extrema.first_below(start, value, stop), first([i for i in span if values[i] < value], stop_at))
+            self.assertEqual(extrema.last_at_or_above(start, stop, value), max([i for i in span if values[i] >= value], default=-1))
+            self.assertEqual(extrema.last_at_or_below(start, stop, value), max([i for i in span if values[i] <= value], default=-1))
+
+    def test_queries_match_a_scan(self):
+        for size in self.sizes:
+            values = 20000 + np.round(self.rnd.integers(-40, 41, size=size) * 0.25, 2)
+            self.check(values, None)
+
+    def test_invalid_positions_are_skipped(self):
+        for size in self.sizes:
+            values = 20000 + np.round(self.rnd.integers(-40, 41, size=size) * 0.25, 2)
+            self.check(values, self.rnd.random(size) > 0.3)
+
+    def test_several_levels(self):
+        values = 20000 + np.cumsum(self.rnd.choice([-0.25, 0.25], size=5000))
+        original = range_extrema.BLOCK_SIZE
+        range_extrema.BLOCK_SIZE = 4
+        try:
+            self.check(values, None, queries=200)
+        finally:
+            range_extrema.BLOCK_SIZE = original
+
+
+if __name__ == "__main__":
+    unittest.main()
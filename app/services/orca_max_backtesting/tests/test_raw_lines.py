@@ -0,0 +1,58 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from app.services.orca_max_backtesting import raw_lines
+from app.services.orca_max_backtesting.helper import read_distinct_lines
+from app.services.orca_max_backtesting.raw_lines import RawLines
+from app.services.orca_max_backtesting.tick_codec import parse_tick_lines
+from app.services.orca_max_backtesting.tick_store import TickAccumulator
+from test_tick_store import write_tick_file
+
+
+class TestRawLines(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "NQ 09-24.Last.txt")
+        write_tick_file(self.file_path, rows=3000)
+        with open(self.file_path, "rb") as file:
+            lines = file.read().split(b"\n")
+
+        # repeated lines, windows new lines, blank and padded lines
+        lines[10:10] = [lines[9], lines[9], b"", b"", lines[9]]
+        lines[100] = lines[100] + b"\r"
+        lines[101] = b"  " + lines[100]
+        lines[200:200] = [b"x" * 80, b"x" * 80, b"x" * 79 + b"y"]
+        self.data = b"\n".join(lines)
+        with open(self.file_path, "wb") as file:
+            file.write(self.data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_file_lines_match_the_text_reader(self):
+        for rows in (-1, 0, 11, 150, 2500):
+            self.assertEqual(list(RawLines.from_file(self.file_path, rows)), read_distinct_lines(self.file_path, rows))
+        # the repeated lines are compared a few at a time
+        with mock.patch.object(raw_lines, "DISTINCT_BLOCK_SIZE", 3):
+            self.assertEqual(list(RawLines.from_file(self.file_path)), read_distinct_lines(self.file_path, -1))
+
+    def test_bytes_lines_match_the_accumulator(self):
+        accumulator = TickAccumulator(strict=False, keep_lines=True)
+        accumulator.add(parse_tick_lines(self.data.strip()))
+        raw_lines = RawLines.from_bytes(self.data.strip())
+        self.assertEqual(list(raw_lines), accumulator.distinct_lines)
+        self.assertEqual(raw_lines[-1], accumulator.distinct_lines[-1])
+        self.assertEqual(raw_lines[5:20], accumulator.distinct_lines[5:20])
+
+    def test_pickled_as_the_path(self):
+        raw_lines = RawLines.from_file(self.file_path)
+        dumped = pickle.dumps(raw_lines)
+        self.assertLess(len(dumped), 1000)
+        self.assertEqual(list(pickle.loads(dumped)), list(raw_lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import copy
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.services.orca_max_backtesting import abc_kernel, helper
+from app.services.orca_max_backtesting.abc_kernel import find_abc_points
+from app.services.orca_max_backtesting.abc_tester import ABCStrategyTester
+from app.services.orca_max_backtesting.artifact_cache import ArtifactCache
+from app.services.orca_max_backtesting.helper import create_abc_config, create_exit_strategy
+from app.services.orca_max_backtesting.orca_enums import TeamWay
+from app.services.orca_max_backtesting.sweep_planner import SweepPlan, unique_exit_strategies
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from test_tick_series import random_ticks
+
+
+class TestSweepPlan(unittest.TestCase):
+    def setUp(self):
+        self.series = TickSeries.from_list(random_ticks(rows=8000, seed=5))
+        self.exit_strategies = {
+            "4_4": create_exit_strategy("4_4"),
+            "10_3": create_exit_strategy("10_3"),
+            "4_4_again": create_exit_strategy("4_4"),
+            "2_7": create_exit_strategy("2_7"),
+        }
+
+    def test_unique_exit_strategies(self):
+        self.assertEqual(list(unique_exit_strategies(self.exit_strategies)), ["4_4", "10_3", "2_7"])
+
+    def test_every_node_once(self):
+        plan = SweepPlan(["6_3_1_2", "6_3_1_9", "6_3_2_2", "2_1_1_1"], self.exit_strategies)
+        self.assertEqual(plan.detections, [(6, 3), (2, 1)])
+        self.assertEqual([points_key for points_key, _ in plan.projections.values()], ["6_3_1_2", "6_3_2_2", "2_1_1_1"])
+        self.assertEqual(list(plan.exit_strategies), ["4_4", "10_3", "2_7"])
+
+    def test_run_matches_one_tester_per_config(self):
+        points_keys = ["6_3_1_2", "6_3_2_2", "2_1_1_1"]
+        plan = SweepPlan(points_keys, self.exit_strategies)
+        with tempfile.TemporaryDirectory() as output_dir, \
+                mock.patch.object(helper, "OUTPUT_DIR", output_dir), \
+                mock.patch.object(helper, "ArtifactCache", lambda: ArtifactCache(os.path.join(output_dir, "cache"))):
+            with mock.patch.object(abc_kernel, "scan_abc_bank", wraps=abc_kernel.scan_abc_bank) as scan:
+                results = plan.run("NQ", self.series, "sweep", TeamWay.BreakThrough)
+            # the two (6, 3) configs share a machine
+            scan.assert_called_once()
+            self.assertEqual(scan.call_args.args[2:], ([6, 2], [3, 1]))
+            self.assertEqual(len(os.listdir(os.path.join(output_dir, "NQ", TeamWay.BreakThrough.value, "Normal"))), 1)
+
+            for points_key in points_keys:
+                points_distance = create_abc_config(points_key)
+                down, up = find_abc_points(self.series, points_distance, "4_4")
+                tester = ABCStrategyTester(
+                    "NQ", self.series, None, "4_4", TeamWay.BreakThrough,
+                    {"down_order_points_list": down, "up_order_points_list": up},
+                    output_dir, points_distance._asdict(),
+                )
+                expected = tester.analyse_grid(copy.deepcopy(plan.exit_strategies))
+                self.assertEqual(results[points_key], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
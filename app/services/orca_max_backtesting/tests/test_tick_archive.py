@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from unittest import mock
+
+from app.services.orca_max_backtesting import tick_archive
+from app.services.orca_max_backtesting.tick_archive import TickArchive
+from test_tick_store import read_text_ticks
+
+
+def write_days(file_path, days, ticks_per_hour=4):
+    """Ticks every 15 minutes over whole days, prices never repeat"""
+    with open(file_path, "w") as file:
+        price = 20000.0
+        for day in days:
+            for hour in range(24):
+                for quarter in range(ticks_per_hour):
+                    price += 0.25
+                    file.write(f"{day:%Y%m%d} {hour:02d}{quarter * 15:02d}00 0000001;{price + 1};{price};{price};1\n")
+
+
+class TestTickArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = TickArchive(os.path.join(self.tmp_dir.name, "archive"))
+        self.first_file = os.path.join(self.tmp_dir.name, "9-NQ 09-24.Last.txt")
+        self.second_file = os.path.join(self.tmp_dir.name, "10-NQ 09-24.Last.txt")
+        write_days(self.first_file, [date(2024, 9, 9), date(2024, 9, 10)])
+        write_days(self.second_file, [date(2024, 9, 11)])
+
+        self.archive.ingest(self.first_file, "NQ")
+        self.archive.ingest(self.second_file, "NQ")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_daily_segments(self):
+        segments = self.archive.manifest("NQ")["segments"]
+        self.assertEqual([segment["day"] for segment in segments], ["2024-09-09", "2024-09-10", "2024-09-11"])
+        self.assertTrue(all(segment["rows"] == 96 for segment in segments))
+
+    def test_known_file_is_not_parsed_again(self):
+        with mock.patch.object(tick_archive, "read_tick_file_parallel") as read_tick_file_parallel:
+            self.assertFalse(self.archive.ingest(self.first_file, "NQ"))
+        read_tick_file_parallel.assert_not_called()
+
+    def test_overlapping_file_replaces_the_range(self):
+        overlapping_file = os.path.join(self.tmp_dir.name, "11-NQ 09-24.Last.txt")
+        write_days(overlapping_file, [date(2024, 9, 11)], ticks_per_hour=2)
+        self.assertTrue(self.archive.ingest(overlapping_file, "NQ"))
+
+        self.assertEqual(list(self.archive.load_source(self.second_file, "NQ")), read_text_ticks(self.second_file))
+        self.assertEqual(list(self.archive.load_source(overlapping_file, "NQ")), read_text_ticks(overlapping_file))
+        # a range takes the day of the file ingested last
+        series = self.archive.load("NQ", date(2024, 9, 10), date(2024, 9, 11))
+        self.assertEqual(len(series), 96 + 48)
+        self.assertEqual(series.price[-1], read_text_ticks(overlapping_file)[-1][0])
+
+    def test_contract_of_a_file(self):
+        self.assertEqual(tick_archive.file_contract(self.first_file, "NQ"), "NQ 09-24")
+        self.assertEqual(tick_archive.file_contract("/data/NQ.Last.txt", "NQ"), "NQ")
+
+    def test_concurrent_ingests_keep_both_sources(self):
+        files = []
+        for day in (12, 13, 14, 15):
+            files.append(os.path.join(self.tmp_dir.name, f"{day}-NQ 09-24.Last.txt"))
+            write_days(files[-1], [date(2024, 9, day)])
+        # an archive object per ingest, like separate processes
+        ingest = lambda file_path: TickArchive(self.archive.archive_dir).ingest(file_path, "NQ")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertTrue(all(executor.map(ingest, files)))
+        self.assertEqual(len(self.archive.manifest("NQ")["sources"]), 6)
+
+    def test_source_matches_the_text_reader(self):
+        series = self.archive.load_source(self.first_file, "NQ")
+        self.assertEqual(list(series), read_text_ticks(self.first_file))
+
+    def test_range_opens_the_covering_segments_only(self):
+        with mock.patch.object(TickArchive, "_open_segment", autospec=True, side_effect=TickArchive._open_segment) as opened:
+            series = self.archive.load("NQ", date(2024, 9, 10), date(2024, 9, 10))
+        self.assertEqual(opened.call_count, 1)
+
+        all_ticks = read_text_ticks(self.first_file) + read_text_ticks(self.second_file)
+        expected = [tick for tick in all_ticks if tick[1].date() == date(2024, 9, 10)]
+        self.assertEqual([tick[:2] for tick in series], [tick[:2] for tick in expected])
+
+        series = self.archive.load("NQ", datetime(2024, 9, 10, 23, 30), datetime(2024, 9, 11, 0, 30))
+        self.assertEqual(
+            [time for _, time, _ in series],
+            [datetime(2024, 9, 10, 23, minute) for minute in (30, 45)]
+            + [datetime(2024, 9, 11, 0, minute) for minute in (0, 15, 30)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import pytz
+
+from app.services.orca_max_backtesting.helper import read_bytes_cleaned
+from app.services.orca_max_backtesting.tick_codec import (
+    datetime_to_seconds,
+    format_iso_utc,
+    parse_iso_utc,
+    parse_tick_lines,
+    parse_tick_time,
+    parse_tick_times,
+)
+from app.services.orca_max_backtesting.tick_store import read_tick_file, tick_columns_to_list
+from test_tick_store import read_text_ticks, write_tick_file
+
+
+def strptime_tick_time(time_string):
+    """get_price_time as it was before the codec"""
+    time_string = " ".join(time_string.split(" ")[:-1])
+    datetime_obj = datetime.strptime(time_string, "%Y%m%d %H%M%S")
+    return pytz.timezone("Europe/London").localize(datetime_obj).replace(tzinfo=None)
+
+
+class TestTickCodec(unittest.TestCase):
+    def test_times_match_strptime(self):
+        values = [
+            "20240707 220254 1234567",
+            "20240229 000000 0000000",
+            "19991231 235959 9",
+            "20240331 013000 0000001",  # missing hour of the spring transition
+            "20241027 013000 0000001",  # repeated hour of the autumn transition
+            "2024707 220254 1234567",  # odd widths go through strptime
+        ]
+        seconds, valid = parse_tick_times(values)
+
+        self.assertTrue(valid.all())
+        for value, second in zip(values, seconds.tolist()):
+            self.assertEqual(second, datetime_to_seconds(strptime_tick_time(value)))
+            self.assertEqual(parse_tick_time(value), strptime_tick_time(value))
+
+    def test_invalid_times_are_flagged(self):
+        values = ["20240230 220254 1", "20240707 250254 1", "20240707 220254", "garbage"]
+        _, valid = parse_tick_times(values)
+        self.assertFalse(valid.any())
+
+        for value in values:
+            with self.assertRaises(ValueError):
+                strptime_tick_time(value)
+
+    def test_lenient_times_for_the_uploader(self):
+        seconds, valid = parse_tick_times(["20240707 220254", "20240707 220254 7"], strict=False)
+        self.assertTrue(valid.all())
+        self.assertEqual(format_iso_utc(seconds).tolist(), ["2024-07-07T22:02:54+00:00"] * 2)
+        # and back, as the loader reads the tables
+        self.assertEqual(parse_iso_utc(format_iso_utc(seconds)).tolist(), seconds.tolist())
+        self.assertEqual(parse_iso_utc(["2024-07-07T22:02:54.25+00:00"]).tolist(), seconds[:1].tolist())
+
+    def test_prices_match_float(self):
+        prices = ["20594.25", "-0.5", "+3", "1e3", " 7.125", "0.1", "123456789.123456789"]
+        buffer = "".join(f"20240707 220254 1;x;{price};0;1\n" for price in prices).encode()
+        parsed = parse_tick_lines(buffer)
+
+        self.assertTrue(parsed.valid.all())
+        self.assertEqual(parsed.price.tolist(), [float(price) for price in prices])
+
+    def test_long_lines_use_the_scalar_parsing(self):
+        long_line = b"20240707 220254 1;x;20594.25;0;" + b"1" * 100
+        parsed = parse_tick_lines(b"20240707 220254 1;x;1.25;0;1\n" * 10 + long_line + b"\n" + b"x" * 200_000)
+        self.assertEqual(parsed.valid.tolist(), [True] * 11 + [False])
+        self.assertEqual(parsed.price[10], 20594.25)
+
+
+class TestBulkReaders(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "NQ 09-24.Last.txt")
+        write_tick_file(self.file_path, rows=5000)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_blocks_give_the_same_ticks(self):
+        with open(self.file_path, "rb") as file:
+            lines = [line.strip().decode() for line in file]
+        columns, distinct_lines = read_tick_file(self.file_path, keep_lines=True, block_size=1000)
+
+        self.assertEqual(tick_columns_to_list(columns), read_text_ticks(self.file_path))
+        self.assertEqual(distinct_lines, [line for i, line in enumerate(lines) if i == 0 or line != lines[i - 1]])
+
+    def test_read_bytes_skips_invalid_lines(self):
+        with open(self.file_path, "rb") as file:
+            data = file.read()
+        lines = data.split(b"\n")
+        lines.insert(10, b"broken;line")
+        data_list, data_all_list = read_bytes_cleaned(b"\n".join(lines), rows=-1)
+
+        self.assertEqual(data_list, read_text_ticks(self.file_path))
+        self.assertIn("broken;line", data_all_list)
+
+    def test_read_file_rows_limit(self):
+        columns, _ = read_tick_file(self.file_path, rows=100)
+        data_list = tick_columns_to_list(columns)
+
+        expected, previous_row = [], None
+        for line in open(self.file_path).readlines()[:101]:
+            parts = line.strip().split(";")
+            row = (float(parts[2]), strptime_tick_time(parts[0]))
+            if row != previous_row:
+                expected.append((*row, len(expected)))
+                previous_row = row
+        self.assertEqual(data_list, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from app.services.orca_max_backtesting.tick_index import build_time_index, cut_time_window, load_time_index
+from app.services.orca_max_backtesting.utilities import clean_data, split_data
+from test_tick_store import write_tick_file
+
+
+class TestTickIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "NQ 09-24.Last.txt")
+        write_tick_file(self.file_path, rows=3000)
+        with open(self.file_path, "r") as file:
+            self.data = file.read()
+        self.target = os.path.join(self.tmp_dir.name, "target.txt")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_target(self):
+        with open(self.target, "r") as file:
+            return file.read()
+
+    def test_index_is_cached(self):
+        time_index = load_time_index(self.file_path, self.tmp_dir.name)
+        self.assertEqual(time_index.size, os.path.getsize(self.file_path))
+        self.assertTrue((time_index.seconds[1:] >= time_index.seconds[:-1]).all())
+        cached = load_time_index(self.file_path, self.tmp_dir.name)
+        self.assertEqual(cached.offsets.tolist(), time_index.offsets.tolist())
+
+    def test_cut_matches_the_text_filter(self):
+        time_index = build_time_index(self.file_path, stride=64)
+        windows = [
+            (datetime(2024, 7, 7, 22, 20, 0), None),
+            (datetime(2024, 7, 7, 22, 20, 0), datetime(2024, 7, 7, 22, 40, 0)),
+            (datetime(2024, 7, 7, 22, 20, 0, 500), datetime(2024, 7, 7, 22, 40, 0, 500)),
+            (datetime(2024, 7, 7, 0, 0, 0), datetime(2024, 7, 7, 22, 2, 54)),
+            (datetime(2024, 7, 9, 0, 0, 0), None),
+        ]
+        for time_from, time_to in windows:
+            cut_time_window(self.file_path, self.target, time_from, time_to, time_index)
+            expected = split_data.DataCleaner(self.data, "", time_from, time_to).filtered_data
+            self.assertEqual(self.read_target(), expected)
+
+    def test_level_extraction_streams_like_the_cleaner(self):
+        for price_level in clean_data.PriceLevel:
+            clean_data.extract_price_level(self.file_path, self.target, price_level)
+            expected = clean_data.DataCleaner(self.data, "", price_level).filtered_data
+            self.assertEqual(self.read_target(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import re
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.orca_max_backtesting.tick_codec import format_iso_utc, parse_tick_lines
+from app.services.orca_max_backtesting.tick_loader import (
+    TICK_TABLE_COLUMNS,
+    fetch_data_between_dates,
+    range_fingerprint,
+    range_bounds,
+    time_slices,
+)
+from app.services.orca_max_backtesting.tick_store import parse_tick_file
+from test_tick_store import write_tick_file
+
+_CURSOR = re.compile(r"ts\.gt\.(.+),and\(ts\.eq\.(.+),id\.gt\.(\d+)\)")
+
+
+class FakeQuery:
+    """The query builder calls of the loader, over rows in memory"""
+
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.filters = []
+        self.orders = []
+        self.page_size = None
+        self.count = None
+
+    def select(self, columns, count=None):
+        self.client.selects.add(columns)
+        self.columns, self.count = columns.split(","), count
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def or_(self, cursor):
+        last_ts, _, last_id = _CURSOR.fullmatch(cursor).groups()
+        self.filters.append(lambda row: (row["ts"], row["id"]) > (last_ts, int(last_id)))
+        return self
+
+    def limit(self, page_size):
+        self.page_size = page_size
+        return self
+
+    def execute(self):
+        self.client.threads.add(threading.current_thread().name)
+        rows = [row for row in self.rows if all(f(row) for f in self.filters)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        return SimpleNamespace(
+            data=[{column: row[column] for column in self.columns} for row in rows[: self.page_size]],
+            count=len(rows) if self.count == "exact" else None,
+        )
+
+
+class FakeClient:
+    def __init__(self, tables):
+        self.tables = tables
+        self.selects = set()
+        self.threads = set()
+
+    def table(self, name):
+        return FakeQuery(self, self.tables[name])
+
+
+class TestTickLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "NQ 09-24.Last.txt")
+            write_tick_file(file_path, rows=3000)
+            cls.expected = parse_tick_file(file_path)
+            with open(file_path, "rb") as f:
+                parsed = parse_tick_lines(f.read())
+
+        # the rows of the uploader, repeated ticks included, not stored in time order
+        ts = format_iso_utc(parsed.seconds).tolist()
+        cls.rows = [
+            {"id": i + 1, "ts": ts[i], "last": float(parsed.price[i]), "bid": 0.0, "ask": 0.0, "vol": 1}
+            for i in range(len(ts))
+        ]
+        cls.rows.reverse()
+
+    def setUp(self):
+        self.client = FakeClient({"ticks_nq": self.rows})
+
+    def load(self, start, end, **kwargs):
+        return fetch_data_between_dates("NQ", start, end, client=self.client, **kwargs)
+
+    def test_range_matches_the_file(self):
+        series = self.load("2024-07-07", "2024-07-08", slice_hours=1, threads=4, page_size=50)
+        np.testing.assert_array_equal(series.ts, self.expected.ts)
+        np.testing.assert_array_equal(series.price, self.expected.price)
+        self.assertEqual(self.client.selects, {TICK_TABLE_COLUMNS})
+        self.assertGreater(len(self.client.threads), 1)
+
+    def test_datetimes_are_included(self):
+        series = self.load("2024-07-07T22:10:00", "2024-07-07T22:20:00", page_size=64)
+        start, end = (
+            np.datetime64(value, "ns").astype(np.int64) for value in ("2024-07-07T22:10:00", "2024-07-07T22:20:01")
+        )
+        inside = (self.expected.ts >= start) & (self.expected.ts < end)
+        self.assertTrue(0 < inside.sum() < len(inside))
+        np.testing.assert_array_equal(series.ts, self.expected.ts[inside])
+        np.testing.assert_array_equal(series.price, self.expected.price[inside])
+
+    def test_empty_and_invalid_ranges(self):
+        self.assertIsNone(self.load("2024-08-01", "2024-08-02"))
+        for start, end in (("2024-07-08", "2024-07-07"), ("07/07/2024", "2024-07-08")):
+            with self.assertRaises(ValueError):
+                self.load(start, end)
+
+    def test_fingerprint_follows_the_rows_of_the_range(self):
+        fingerprint = range_fingerprint("NQ", "2024-07-07", "2024-07-07", client=self.client)
+        self.assertEqual(fingerprint, {"rows": len(self.rows), "max_id": len(self.rows)})
+
+        uploaded = {**self.rows[0], "id": len(self.rows) + 1}
+        client = FakeClient({"ticks_nq": self.rows + [uploaded]})
+        self.assertNotEqual(range_fingerprint("NQ", "2024-07-07", "2024-07-07", client=client), fingerprint)
+        self.assertEqual(range_fingerprint("NQ", "2024-07-08", "2024-07-08", client=client), {"rows": 0, "max_id": None})
+
+    def test_slices_cover_the_range(self):
+        start, end = range_bounds("2024-07-07", "2024-07-07T10:30:00")
+        slices = time_slices(start, end, hours=4)
+        self.assertEqual(len(slices), 3)
+        self.assertEqual((slices[0][0], slices[-1][1]), (start, end))
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(slices, slices[1:])))
+
+
+if __name__ == "__main__":
+    unittest.main()
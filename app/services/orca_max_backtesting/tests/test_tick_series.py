@@ -0,0 +1,112 @@
+import copy
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.orca_max_backtesting.abc import ABCFinder
+from app.services.orca_max_backtesting.abc_validator import ABCValidator
+from app.services.orca_max_backtesting.helper import (
+    create_abc_config,
+    create_exit_strategy,
+    in_restricted_trading_hours,
+)
+from app.services.orca_max_backtesting.orca_enums import TeamWay, TradingPosition
+from app.services.orca_max_backtesting.session_calendar import SessionCalendar, iter_ranges_from
+from app.services.orca_max_backtesting.tick_series import TickSeries
+
+
+def random_ticks(rows=20000, seed=3, start=datetime(2024, 9, 10, 12, 50)):
+    """A random walk in quarter points, crossing the restricted trading hours"""
+    rnd = random.Random(seed)
+    time_, price = start, 20000.0
+    data = []
+    for i in range(rows):
+        time_ += timedelta(seconds=rnd.choice([0, 1, 1, 2, 3]))
+        price += rnd.choice([-0.75, -0.5, -0.25, 0.25, 0.5, 0.75])
+        data.append((price, time_, i))
+    return data
+
+
+def find_with_hours_check(finder, data):
+    """ABCFinder.find as it was on the list, checking the hours tick by tick"""
+    down_order_points_list, up_order_points_list = [], []
+    for index, (price, time, _) in enumerate(data):
+        if in_restricted_trading_hours(time):
+            continue
+        down_result, down_abc_points = finder._process(finder.abc_down, price, time, index)
+        up_result, up_abc_points = finder._process(finder.abc_up, price, time, index)
+        if down_result:
+            down_order_points_list.append(down_abc_points)
+        if up_result:
+            up_order_points_list.append(up_abc_points)
+    return down_order_points_list, up_order_points_list
+
+
+class TestTickSeries(unittest.TestCase):
+    def setUp(self):
+        self.data = random_ticks()
+        self.series = TickSeries.from_list(self.data)
+
+    def test_iterates_like_the_list(self):
+        self.assertEqual(list(self.series), self.data)
+        self.assertEqual(list(self.series.iter_from(12345)), self.data[12345:])
+        self.assertEqual(list(self.series.iter_prices()), [price for price, _, _ in self.data])
+        self.assertEqual(self.series[-1], self.data[-1])
+
+    def test_slices_are_views(self):
+        part = self.series[100:200]
+        self.assertTrue(np.shares_memory(part.price, self.series.price))
+        self.assertEqual(list(part), self.data[100:200])
+
+    def test_restricted_mask_matches_the_hours_check(self):
+        calendar = SessionCalendar()
+        expected = [in_restricted_trading_hours(time) for _, time, _ in self.data]
+        self.assertEqual(calendar.restricted_mask(self.series).tolist(), expected)
+        self.assertEqual([calendar.is_restricted(time) for _, time, _ in self.data], expected)
+        self.assertTrue(any(expected))
+
+    def test_tradable_ranges(self):
+        calendar = SessionCalendar([("13:00", "13:09")])
+        tradable = [not calendar.is_restricted(time) for _, time, _ in self.data]
+        ranges = calendar.tradable_ranges(self.series)
+
+        covered = [False] * len(self.data)
+        for start, stop in ranges.tolist():
+            covered[start:stop] = [True] * (stop - start)
+        self.assertEqual(covered, tradable)
+
+        first_restricted = tradable.index(False)
+        clipped = list(iter_ranges_from(ranges, first_restricted - 5))
+        self.assertEqual(clipped[0], (first_restricted - 5, first_restricted))
+        self.assertEqual(list(iter_ranges_from(ranges, first_restricted))[0][0], ranges[1][0])
+
+    def test_finder_and_validator_match_the_list(self):
+        points_distance = create_abc_config("6_3_1_2")
+        exit_strategy = create_exit_strategy("4_4")
+
+        list_points = find_with_hours_check(ABCFinder(points_distance, "4_4", TeamWay.BreakThrough), self.data)
+        series_points = ABCFinder(points_distance, "4_4", TeamWay.BreakThrough).find(self.series)
+        self.assertEqual(series_points, list_points)
+        self.assertTrue(list_points[0])
+
+        for data in (self.data, self.series):
+            validator = ABCValidator(
+                copy.deepcopy(list_points[0]),
+                data,
+                points_type=TradingPosition.Long,
+                exit_strategy=copy.deepcopy(exit_strategy),
+                team_way=TeamWay.BreakThrough,
+                symbol="NQ",
+                output_folder_path=None,
+                config=points_distance._asdict(),
+            )
+            if data is self.data:
+                expected = validator.validate()
+            else:
+                self.assertEqual(validator.validate(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+from starlette.datastructures import UploadFile
+
+from app.services.orca_max_backtesting import tick_store
+from app.services.orca_max_backtesting.helper import get_price_time, read_bytes_cleaned
+from app.services.orca_max_backtesting.tick_store import (
+    file_fingerprint,
+    load_tick_store,
+    merge_tick_shards,
+    read_tick_file,
+    read_tick_file_parallel,
+    read_tick_shard,
+    shard_ranges,
+    spool_upload,
+    tick_columns_to_list,
+)
+
+
+def write_tick_file(file_path, rows=2000, seed=7):
+    """Writes a NinjaTrader like export with repeated ticks on purpose"""
+    rnd = random.Random(seed)
+    time_ = datetime(2024, 7, 7, 22, 2, 54)
+    price = 20594.5
+    with open(file_path, "w") as file:
+        for _ in range(rows):
+            if rnd.random() < 0.6:
+                time_ += timedelta(seconds=rnd.choice([0, 1, 2]))
+                price += rnd.choice([-0.5, -0.25, 0, 0.25, 0.5])
+            fraction = rnd.randint(0, 9999999)
+            file.write(
+                f"{time_:%Y%m%d %H%M%S} {fraction:07d};{price + 1};{price};{price - 0.25};1\n"
+            )
+
+
+def read_text_ticks(file_path):
+    """The line by line parsing of read_file_cleaned"""
+    data, previous_row = [], None
+    with open(file_path, "r") as file:
+        for line in file:
+            parts = line.strip().split(";")
+            row = (float(parts[2]), get_price_time(parts[0]))
+            if previous_row != row:
+                data.append((*row, len(data)))
+                previous_row = row
+    return data
+
+
+class TestTickStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmp_dir.name, "store")
+        self.file_path = os.path.join(self.tmp_dir.name, "NQ 09-24.Last.txt")
+        write_tick_file(self.file_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_store_matches_text_parsing(self):
+        columns = load_tick_store(self.file_path, self.store_dir)
+        self.assertEqual(tick_columns_to_list(columns), read_text_ticks(self.file_path))
+
+    def test_store_is_memory_mapped_on_reload(self):
+        load_tick_store(self.file_path, self.store_dir)
+        columns = load_tick_store(self.file_path, self.store_dir)
+        self.assertIsNotNone(columns.price.filename)
+
+    def test_rows_limit(self):
+        columns = load_tick_store(self.file_path, self.store_dir)
+        ticks = tick_columns_to_list(columns, rows=100)
+        self.assertTrue(all(columns.line[i] <= 100 for i in range(len(ticks))))
+        self.assertEqual(ticks, read_text_ticks(self.file_path)[: len(ticks)])
+
+    def test_changed_file_is_never_stale(self):
+        digest = file_fingerprint(self.file_path, self.store_dir)
+        write_tick_file(self.file_path, rows=500, seed=11)
+        # make sure the mtime moves even on coarse file systems
+        os.utime(self.file_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+        self.assertNotEqual(file_fingerprint(self.file_path, self.store_dir), digest)
+        columns = load_tick_store(self.file_path, self.store_dir)
+        self.assertEqual(tick_columns_to_list(columns), read_text_ticks(self.file_path))
+
+    def test_concurrent_fingerprints_are_all_kept(self):
+        file_paths = []
+        for seed in range(8):
+            file_paths.append(os.path.join(self.tmp_dir.name, f"{seed}-NQ 09-24.Last.txt"))
+            write_tick_file(file_paths[-1], rows=200, seed=seed)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            digests = list(executor.map(lambda file_path: file_fingerprint(file_path, self.store_dir), file_paths))
+
+        with open(os.path.join(self.store_dir, tick_store.FINGERPRINTS_FILE)) as file:
+            fingerprints = json.load(file)
+        self.assertEqual([fingerprints[file_path]["digest"] for file_path in file_paths], digests)
+
+    def test_upload_is_parsed_in_chunks(self):
+        with open(self.file_path, "rb") as file:
+            data = file.read()
+        # an odd chunk size splits lines across the chunks
+        upload = UploadFile(io.BytesIO(data), filename="NQ 09-24.Last.txt")
+        upload_path, _ = spool_upload(upload.file, block_size=997)
+        try:
+            columns, _ = read_tick_file(upload_path, strict=False, block_size=997)
+        finally:
+            os.remove(upload_path)
+
+        self.assertEqual(tick_columns_to_list(columns), read_bytes_cleaned(data, rows=-1)[0])
+
+    def test_shards_merge_like_the_serial_read(self):
+        # many shards over few lines, so shard edges land on repeated ticks
+        byte_ranges = shard_ranges(self.file_path, 97)
+        self.assertEqual(byte_ranges[0][0], 0)
+        self.assertEqual(byte_ranges[-1][1], os.path.getsize(self.file_path))
+
+        shards = [read_tick_shard(self.file_path, byte_range, keep_lines=True) for byte_range in byte_ranges]
+        columns, distinct_lines = merge_tick_shards(shards)
+        expected_columns, expected_lines = read_tick_file(self.file_path, keep_lines=True)
+
+        for name in ("ts", "price", "line"):
+            self.assertEqual(getattr(columns, name).tolist(), getattr(expected_columns, name).tolist())
+        self.assertEqual(distinct_lines, expected_lines)
+
+    def test_parallel_read(self):
+        columns, _ = read_tick_file_parallel(self.file_path, processes=1)
+        self.assertEqual(tick_columns_to_list(columns), read_text_ticks(self.file_path))
+
+    def test_parallel_read_in_the_process_pool(self):
+        with mock.patch.object(tick_store, "PARALLEL_MIN_SIZE", 0):
+            for _ in range(2):  # the second read reuses the pool
+                columns, lines = read_tick_file_parallel(self.file_path, keep_lines=True, processes=2)
+                expected_columns, expected_lines = read_tick_file(self.file_path, keep_lines=True)
+                self.assertEqual(tick_columns_to_list(columns), tick_columns_to_list(expected_columns))
+                self.assertEqual(list(lines), list(expected_lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,9 @@
 import csv
 import os
+import random
 import unittest
 
-from app.services.orca_max_backtesting.trade_analyzer import TradeAnalyzer
+from app.services.orca_max_backtesting.trade_analyzer import LossRuns, TradeAnalyzer
 from app.utils.decorators.timing.time import time_it
 
 FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
@@ -63,5 +64,46 @@ class TestTradeAnalyzer(unittest.TestCase):
         self.assertEqual(results, expected_results)
 
 
+def replay_counters(results, consecutive_reach):
+    """The per trade counters of the hibernation mode, for one level"""
+    win = lost = count = 0
+    reached, positions = False, []
+    for position, result in enumerate(results):
+        if result == "Filled":
+            if not reached:
+                win += 1
+            reached, count = False, 0
+        elif result == "Lost":
+            count += 1
+            if count < consecutive_reach:
+                lost += 1
+            elif not reached:
+                reached = True
+                lost += 1
+                positions.append(position)
+    return win, lost, positions
+
+
+class TestLossRuns(unittest.TestCase):
+    def test_counts_match_the_per_trade_counters(self):
+        rnd = random.Random(3)
+        for size in (0, 1, 5, 300):
+            results = [rnd.choice(["Filled", "Lost", "Lost", "Lost", "NotTriggered"]) for _ in range(size)]
+            loss_runs = LossRuns([{"Result": result} for result in results])
+            for consecutive_reach in range(1, 8):
+                win, lost, reached = loss_runs.counts(consecutive_reach)
+                self.assertEqual((win, lost, reached.tolist()), replay_counters(results, consecutive_reach))
+
+    def test_sorts_on_the_closed_time(self):
+        data = [
+            {"Closed": "2024-09-02 10:00:01", "Result": "Lost", "Order_point": 1},
+            {"Closed": "", "Result": "NotTriggered"},
+            {"Closed": "2024-09-02 09:59:59", "Result": "Filled", "Order_point": 2},
+            {"Closed": "2024-09-02 10:00:01", "Result": "Filled", "Order_point": 3},
+        ]
+        analyzer = TradeAnalyzer(data, 3, 10, 4, 20)
+        self.assertEqual([row["Order_point"] for row in analyzer.sorted_data], [2, 1, 3])
+
+
 if __name__ == "__main__":
     unittest.main()
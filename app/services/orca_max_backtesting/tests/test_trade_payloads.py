@@ -0,0 +1,88 @@
+import json
+import tempfile
+import unittest
+
+from app.services.orca_max_backtesting.abc_kernel import find_abc_points
+from app.services.orca_max_backtesting.abc_tester import ABCStrategyTester
+from app.services.orca_max_backtesting.helper import create_abc_config, create_exit_strategy
+from app.services.orca_max_backtesting.orca_enums import TeamWay
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.trade_payloads import (
+    TRADES_COLUMNS,
+    TRADES_NONE,
+    TRADES_ROWS,
+    encode_payload,
+    payload_ndjson,
+    render_json,
+    trades_page,
+    trades_to_columns,
+)
+from test_tick_series import random_ticks
+
+
+class TestTradePayloads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        series = TickSeries.from_list(random_ticks(rows=20000, seed=3))
+        points_distance = create_abc_config("2_1_1_1")
+        down, up = find_abc_points(series, points_distance, "4_4")
+        with tempfile.TemporaryDirectory() as output_folder_path:
+            result, trades = ABCStrategyTester(
+                "NQ", series, create_exit_strategy("4_4"), "4_4", TeamWay.Reverse,
+                {"down_order_points_list": down, "up_order_points_list": up},
+                output_folder_path, points_distance._asdict(),
+            ).analyse()
+        cls.payload = {"result": result, "trades": trades, "meta": {"source": "file"}}
+
+    def test_columns_hold_every_trade(self):
+        trades = self.payload["trades"]["Long"]
+        self.assertTrue(any("Closed" in trade for trade in trades) and any("Closed" not in trade for trade in trades))
+
+        columns = trades_to_columns(trades)
+        self.assertEqual(columns["count"], len(trades))
+        for key, values in columns["columns"].items():
+            self.assertEqual(values, [trade.get(key) for trade in trades])
+        self.assertLess(len(json.dumps(columns)), len(json.dumps(trades)))
+
+    def test_summary_has_the_counts(self):
+        summary = encode_payload(self.payload, TRADES_NONE)
+        self.assertEqual(summary["trades"], {side: len(trades) for side, trades in self.payload["trades"].items()})
+        self.assertEqual(summary["meta"], self.payload["meta"])
+        with self.assertRaises(ValueError):
+            encode_payload(self.payload, "csv")
+
+    def test_pages_cover_the_trades(self):
+        trades = self.payload["trades"]["Long"]
+        pages, offset = [], 0
+        while offset is not None:
+            page = trades_page(self.payload["trades"], "Long", offset, 7)
+            self.assertEqual(page["total"], len(trades))
+            pages.extend(page["trades"])
+            offset = page["next_offset"]
+        self.assertEqual(pages, trades)
+
+        page = trades_page(self.payload["trades"], "Long", 3, 5, TRADES_COLUMNS)
+        self.assertEqual(page["trades"], trades_to_columns(trades[3:8]))
+        with self.assertRaises(KeyError):
+            trades_page(self.payload["trades"], "Both", 0, 5)
+
+    def test_ndjson(self):
+        lines = b"".join(payload_ndjson(self.payload)).decode().splitlines()
+        # the reach levels of the result are int keys, JSON has them as strings
+        self.assertEqual(json.loads(lines[0]), json.loads(json.dumps(encode_payload(self.payload, TRADES_NONE))))
+        self.assertEqual(
+            [json.loads(line) for line in lines[1:]],
+            [{"side": side, **trade} for side, trades in self.payload["trades"].items() for trade in trades],
+        )
+
+    def test_ndjson_rejects_nan_like_json(self):
+        side, trades = next(iter(self.payload["trades"].items()))
+        payload = {**self.payload, "trades": {side: [{**trades[0], "profit": float("nan")}]}}
+        with self.assertRaises(ValueError):
+            render_json(encode_payload(payload, TRADES_ROWS))
+        with self.assertRaises(ValueError):
+            b"".join(payload_ndjson(payload))
+
+
+if __name__ == "__main__":
+    unittest.main()
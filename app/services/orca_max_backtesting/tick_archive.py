@@ -0,0 +1,261 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+from app.services.orca_max_backtesting.tick_codec import NS_PER_SECOND, SECONDS_PER_DAY
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import (
+    file_fingerprint,
+    read_tick_file_parallel,
+)
+from app.utils.decorators.timing.time import time_it
+from app.utils.logging_setup import logger
+
+# bump it when the segment layout changes, the archive is then rebuilt
+ARCHIVE_VERSION = 1
+
+TICK_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tick_archive")
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+SEGMENT_COLUMNS = {"ts": np.int64, "price": np.float64}
+
+NS_PER_DAY = SECONDS_PER_DAY * NS_PER_SECOND
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_ns(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _day_of(ts: int) -> str:
+    return (_EPOCH + timedelta(days=ts // NS_PER_DAY)).strftime("%Y-%m-%d")
+
+
+def file_contract(file_path: str, symbol: str) -> str:
+    """
+    The contract of a NinjaTrader export, e.g. "NQ 09-24" for "9-NQ 09-24.Last.txt",
+    the symbol itself when the name has no contract month
+    """
+    match = re.search(rf"{re.escape(symbol)} \d{{2}}-\d{{2}}", os.path.basename(file_path))
+    return match.group(0) if match else symbol
+
+
+def _overlaps(segment: dict, other: dict) -> bool:
+    return segment["first_ts"] <= other["last_ts"] and other["first_ts"] <= segment["last_ts"]
+
+
+def _range_bounds(date_from, date_to) -> tuple:
+    """epoch-ns bounds, both included; a date covers the whole day"""
+    if not isinstance(date_from, datetime):
+        date_from = datetime.combine(date_from, time.min)
+    if isinstance(date_to, datetime):
+        end = _to_ns(date_to)
+    else:
+        end = _to_ns(datetime.combine(date_to + timedelta(days=1), time.min)) - 1
+    return _to_ns(date_from), end
+
+
+class TickArchive:
+    """
+    Ticks per instrument in immutable daily segments.
+
+    Every ingested file is split by (wall clock) day into segments holding the
+    ts/price columns, which are never rewritten. A small manifest per instrument
+    lists the segments with their time bounds and the content hash of the
+    source files, so a file that was already ingested is never parsed again and
+    a date range only opens the segments it covers (memory-mapped).
+
+    The instrument is best a contract ("NQ 09-24", see file_contract): files of
+    two contract months cover the same days during a roll. Files may overlap, a
+    file is always loaded whole by load_source; a date range takes the segments
+    of the file ingested last where they overlap, e.g. a re-exported day.
+
+        <archive>/<instrument>/manifest.json
+        <archive>/<instrument>/<YYYY-MM-DD>_<source>_<n>/{ts,price}.npy
+    """
+
+    def __init__(self, archive_dir: str = TICK_ARCHIVE_DIR) -> None:
+        self.archive_dir = archive_dir
+
+    def _instrument_dir(self, instrument: str) -> str:
+        return os.path.join(self.archive_dir, instrument)
+
+    def manifest(self, instrument: str) -> dict:
+        try:
+            with open(os.path.join(self._instrument_dir(instrument), MANIFEST_FILE), "r") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = None
+
+        if not manifest or manifest.get("version") != ARCHIVE_VERSION:
+            return {"version": ARCHIVE_VERSION, "sources": {}, "segments": []}
+        return manifest
+
+    @contextmanager
+    def _manifest_lock(self, instrument: str):
+        """Serializes the manifest updates of an instrument, across processes"""
+        os.makedirs(self._instrument_dir(instrument), exist_ok=True)
+        with open(os.path.join(self._instrument_dir(instrument), LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_manifest(self, instrument: str, manifest: dict):
+        manifest_path = os.path.join(self._instrument_dir(instrument), MANIFEST_FILE)
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def _write_segment(self, instrument: str, name: str, ts: np.ndarray, price: np.ndarray):
+        segment_path = os.path.join(self._instrument_dir(instrument), name)
+        tmp_path = f"{segment_path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "ts.npy"), np.asarray(ts, dtype=np.int64))
+        np.save(os.path.join(tmp_path, "price.npy"), np.asarray(price, dtype=np.float64))
+        if os.path.exists(segment_path):
+            # left over by an ingest that died before its manifest was saved
+            shutil.rmtree(segment_path)
+        os.rename(tmp_path, segment_path)
+
+    @time_it
+    def ingest(self, file_path: str, instrument: str) -> bool:
+        """
+        Adds the ticks of a file to the archive.
+
+        :return: False when the same content has been ingested before
+        """
+        with self._manifest_lock(instrument):
+            return self._ingest(file_path, instrument)
+
+    def _ingest(self, file_path: str, instrument: str) -> bool:
+        digest = file_fingerprint(file_path, self.archive_dir)
+        manifest = self.manifest(instrument)
+        if digest in manifest["sources"]:
+            logger.info(f"{file_path} is already in the {instrument} archive")
+            return False
+
+        columns, _ = read_tick_file_parallel(file_path)
+        ts, price = np.asarray(columns.ts), np.asarray(columns.price)
+
+        # one segment per run of ticks of the same day
+        days = ts // NS_PER_DAY
+        cuts = np.flatnonzero(np.diff(days)) + 1
+        bounds = list(zip(np.concatenate(([0], cuts)).tolist(), np.concatenate((cuts, [len(ts)])).tolist()))
+        if not len(ts):
+            bounds = []
+
+        segments = []
+        for number, (start, stop) in enumerate(bounds):
+            segments.append(
+                {
+                    "name": f"{_day_of(int(ts[start]))}_{digest[:16]}_{number}",
+                    "day": _day_of(int(ts[start])),
+                    "first_ts": int(ts[start:stop].min()),
+                    "last_ts": int(ts[start:stop].max()),
+                    "rows": stop - start,
+                    "source": digest,
+                }
+            )
+
+        overlapped = {
+            manifest["sources"][existing["source"]]["file"]
+            for segment in segments
+            for existing in manifest["segments"]
+            if _overlaps(segment, existing)
+        }
+        if overlapped:
+            logger.warning(f"{file_path} overlaps {sorted(overlapped)}, its segments replace theirs in date ranges")
+
+        for segment, (start, stop) in zip(segments, bounds):
+            self._write_segment(instrument, segment["name"], ts[start:stop], price[start:stop])
+
+        manifest["sources"][digest] = {
+            "file": os.path.basename(file_path),
+            "ingested": datetime.now().isoformat(),
+            "segments": [segment["name"] for segment in segments],
+        }
+        manifest["segments"] = sorted(manifest["segments"] + segments, key=lambda segment: segment["first_ts"])
+        self._save_manifest(instrument, manifest)
+
+        logger.info(f"Ingested {file_path} into {len(segments)} {instrument} segments")
+        return True
+
+    def segments_for(self, instrument: str, date_from, date_to) -> list:
+        """
+        The manifest entries of the segments covering a date range, in time order.
+        Of overlapping segments, the one of the file ingested last is taken.
+        """
+        start, end = _range_bounds(date_from, date_to)
+        manifest = self.manifest(instrument)
+        # the sources are kept in their ingestion order
+        ingestion_order = {digest: number for number, digest in enumerate(manifest["sources"])}
+        covering = [
+            segment
+            for segment in manifest["segments"]
+            if segment["last_ts"] >= start and segment["first_ts"] <= end
+        ]
+        taken = []
+        for segment in sorted(covering, key=lambda segment: ingestion_order[segment["source"]], reverse=True):
+            if not any(_overlaps(segment, other) for other in taken):
+                taken.append(segment)
+        return sorted(taken, key=lambda segment: segment["first_ts"])
+
+    def _open_segment(self, instrument: str, segment: dict) -> tuple:
+        segment_path = os.path.join(self._instrument_dir(instrument), segment["name"])
+        return tuple(np.load(os.path.join(segment_path, f"{name}.npy"), mmap_mode="r") for name in SEGMENT_COLUMNS)
+
+    def _series(self, instrument: str, segments: list, start=None, end=None) -> TickSeries:
+        parts = []
+        previous_row = None
+        for segment in segments:
+            ts, price = self._open_segment(instrument, segment)
+            if start is not None:
+                first = np.searchsorted(ts, start, side="left")
+                last = np.searchsorted(ts, end, side="right")
+                ts, price = ts[first:last], price[first:last]
+            if not len(ts):
+                continue
+            # the same duplicate suppression as inside a file, at the segment edges
+            if previous_row is not None and (ts[0], price[0]) == previous_row:
+                ts, price = ts[1:], price[1:]
+            if len(ts):
+                parts.append((ts, price))
+                previous_row = (ts[-1], price[-1])
+
+        if len(parts) == 1:
+            ts, price = parts[0]
+        elif parts:
+            ts, price = (np.concatenate(column) for column in zip(*parts))
+        else:
+            ts, price = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        return TickSeries(price, ts, np.arange(len(ts), dtype=np.int64))
+
+    @time_it
+    def load(self, instrument: str, date_from, date_to) -> TickSeries:
+        """
+        The ticks of an instrument between two dates (or datetimes), both included.
+        Only the covering segments are opened; a single segment is not copied.
+        """
+        segments = self.segments_for(instrument, date_from, date_to)
+        logger.info(f"Loading {len(segments)} {instrument} segments from {date_from} to {date_to}")
+        start, end = _range_bounds(date_from, date_to)
+        return self._series(instrument, segments, start, end)
+
+    def load_source(self, file_path: str, instrument: str) -> TickSeries:
+        """The ticks of one ingested file, as read_tick_series returns them"""
+        digest = file_fingerprint(file_path, self.archive_dir)
+        manifest = self.manifest(instrument)
+        if digest not in manifest["sources"]:
+            raise KeyError(f"{file_path} has not been ingested into the {instrument} archive")
+        names = set(manifest["sources"][digest]["segments"])
+        segments = [segment for segment in manifest["segments"] if segment["name"] in names]
+        return self._series(instrument, segments)
@@ -0,0 +1,274 @@
+"""
+Bulk codec for the NinjaTrader tick timestamp ``YYYYMMDD HHMMSS fffffff``.
+
+The fields have a fixed width, so a whole column is decoded with a handful of
+numpy operations on its bytes instead of a split/strptime/localize per row.
+Rows that don't match the fixed layout go through the scalar parser, which keeps
+the results identical to ``get_price_time``.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+TICK_TIME_FORMAT = "%Y%m%d %H%M%S"
+TICK_TIME_WIDTH = 15  # "YYYYMMDD HHMMSS"
+LOCAL_TIMEZONE = "Europe/London"
+
+NS_PER_SECOND = 1_000_000_000
+SECONDS_PER_DAY = 86_400
+
+# lines of a buffer are decoded in blocks to bound the temporary byte matrices
+LINES_BLOCK_SIZE = 1 << 16
+# and a matrix is as wide as its longest line: longer lines (a tick line is ~50
+# bytes) are left to the scalar parsing
+MAX_LINE_WIDTH = 64
+# up to 15 significant digits the integer and the power of ten are exact doubles,
+# so their quotient is the correctly rounded value float() returns
+MAX_PRICE_DIGITS = 15
+POWERS_OF_TEN = np.array([float(10**i) for i in range(MAX_PRICE_DIGITS + 1)])
+
+_DIGIT_COLUMNS = [0, 1, 2, 3, 4, 5, 6, 7, 9, 10, 11, 12, 13, 14]
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+_EPOCH = datetime(1970, 1, 1)
+_ONE_SECOND = timedelta(seconds=1)
+
+SPACE, DOT, SEMICOLON, PLUS, MINUS, ZERO = (ord(c) for c in " .;+-0")
+
+ParsedLines = namedtuple("ParsedLines", ["seconds", "price", "valid", "lines"])
+
+
+def parse_tick_time(time_string: str) -> datetime:
+    """Scalar version, the fallback of the bulk parser (raises like strptime)"""
+    if (
+        len(time_string) > TICK_TIME_WIDTH
+        and time_string[8] == " "
+        and time_string[TICK_TIME_WIDTH] == " "
+        and " " not in time_string[TICK_TIME_WIDTH + 1:]
+        and time_string.isascii()
+        and time_string[:8].isdigit()
+        and time_string[9:TICK_TIME_WIDTH].isdigit()
+    ):
+        return datetime(
+            int(time_string[0:4]),
+            int(time_string[4:6]),
+            int(time_string[6:8]),
+            int(time_string[9:11]),
+            int(time_string[11:13]),
+            int(time_string[13:15]),
+        )
+
+    time_string = " ".join(time_string.split(" ")[:-1])
+    return datetime.strptime(time_string, TICK_TIME_FORMAT)
+
+
+def datetime_to_seconds(value: datetime) -> int:
+    return (value - _EPOCH) // _ONE_SECOND
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 of proleptic gregorian dates (vectorized)"""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _char_matrix(values: np.ndarray) -> np.ndarray:
+    """(rows, width) matrix of the character codes of a bytes/str array"""
+    char_dtype = np.uint8 if values.dtype.kind == "S" else np.uint32
+    width = values.dtype.itemsize // np.dtype(char_dtype).itemsize
+    if width < TICK_TIME_WIDTH + 1:
+        values = values.astype(f"{values.dtype.kind}{TICK_TIME_WIDTH + 1}")
+        width = TICK_TIME_WIDTH + 1
+    return np.ascontiguousarray(values).view(char_dtype).reshape(len(values), width)
+
+
+def _decode_time_columns(chars: np.ndarray, valid: np.ndarray) -> tuple:
+    """Epoch seconds of the first 15 characters, rows with a bad date are invalidated"""
+    digits = chars[:, :TICK_TIME_WIDTH].astype(np.int64) - ZERO
+    valid &= ((digits[:, _DIGIT_COLUMNS] >= 0) & (digits[:, _DIGIT_COLUMNS] <= 9)).all(axis=1)
+    valid &= chars[:, 8] == SPACE
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 9] * 10 + digits[:, 10]
+    minute = digits[:, 11] * 10 + digits[:, 12]
+    second = digits[:, 13] * 10 + digits[:, 14]
+
+    month_ok = (month >= 1) & (month <= 12)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = _DAYS_IN_MONTH[np.where(month_ok, month, 0)] + (leap & (month == 2))
+    valid &= (
+        (year >= 1)
+        & month_ok
+        & (day >= 1)
+        & (day <= days_in_month)
+        & (hour <= 23)
+        & (minute <= 59)
+        & (second <= 59)
+    )
+
+    seconds = _days_from_civil(year, month, day) * SECONDS_PER_DAY + hour * 3600 + minute * 60 + second
+    return np.where(valid, seconds, 0), valid
+
+
+def parse_tick_times(values, strict: bool = True) -> tuple:
+    """
+    Decodes a column of tick timestamps into epoch seconds of the wall clock.
+
+    :param values: sequence or array (str or bytes) of ``YYYYMMDD HHMMSS fffffff``
+    :param strict: mirror get_price_time (a trailing token is required), the
+        uploader only needs the date and the time
+    :return: (int64 seconds, bool valid) arrays, invalid rows hold 0
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in "SU":
+        values = values.astype("U")
+    if not len(values):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+    # the long values are invalid here, strict sends them to the scalar parsing
+    original = values
+    too_long = np.char.str_len(values) > MAX_LINE_WIDTH
+    if too_long.any():
+        values = np.where(too_long, values.dtype.type(), values)
+        values = values.astype(f"{values.dtype.kind}{MAX_LINE_WIDTH}")
+
+    chars = _char_matrix(values)
+    valid = ~too_long
+    if strict:
+        # " ".join(parts[:-1]) must leave exactly the date and the time
+        valid &= chars[:, TICK_TIME_WIDTH] == SPACE
+        valid &= ~(chars[:, TICK_TIME_WIDTH + 1:] == SPACE).any(axis=1)
+    else:
+        valid &= (chars[:, TICK_TIME_WIDTH] == SPACE) | (chars[:, TICK_TIME_WIDTH] == 0)
+    seconds, valid = _decode_time_columns(chars, valid)
+
+    if strict:
+        for i in np.flatnonzero(~valid):
+            value = original[i]
+            try:
+                value = value.decode("utf-8") if isinstance(value, bytes) else str(value)
+                seconds[i] = datetime_to_seconds(parse_tick_time(value))
+                valid[i] = True
+            except (ValueError, UnicodeDecodeError):
+                continue
+
+    return seconds, valid
+
+
+def seconds_to_datetime64(seconds: np.ndarray) -> np.ndarray:
+    return np.asarray(seconds, dtype=np.int64).astype("datetime64[s]")
+
+
+def seconds_to_ns(seconds: np.ndarray) -> np.ndarray:
+    return np.asarray(seconds, dtype=np.int64) * NS_PER_SECOND
+
+
+def format_iso_utc(seconds: np.ndarray) -> np.ndarray:
+    """'%Y-%m-%dT%H:%M:%S+00:00' strings, the format the tick tables store"""
+    return np.char.add(np.datetime_as_string(seconds_to_datetime64(seconds), unit="s"), "+00:00")
+
+
+def parse_iso_utc(values) -> np.ndarray:
+    """
+    Epoch seconds of the timestamps of the tick tables, the inverse of format_iso_utc.
+    Only '%Y-%m-%dT%H:%M:%S' is read, a fraction and the offset are dropped: the
+    tables hold the wall clock times of the files labelled +00:00.
+    """
+    return np.array(values, dtype="U19").astype("datetime64[s]").astype(np.int64)
+
+
+def _split_lines(buffer: bytes) -> list:
+    lines = buffer.split(b"\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    return [line.strip() for line in lines]
+
+
+def _decode_price_field(chars: np.ndarray, field: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Decimal numbers made of [+-]digits[.digits], anything else is left to float()"""
+    is_digit = field & (chars >= ZERO) & (chars <= ZERO + 9)
+    is_dot = field & (chars == DOT)
+    is_sign = field & ((chars == MINUS) | (chars == PLUS))
+    field_start = field & ~np.concatenate([np.zeros((len(chars), 1), dtype=bool), field[:, :-1]], axis=1)
+
+    digits_count = is_digit.sum(axis=1)
+    valid &= ~(field & ~(is_digit | is_dot | is_sign)).any(axis=1)
+    valid &= ~(is_sign & ~field_start).any(axis=1)
+    valid &= is_dot.sum(axis=1) <= 1
+    valid &= (digits_count >= 1) & (digits_count <= MAX_PRICE_DIGITS)
+
+    mantissa = np.zeros(len(chars), dtype=np.int64)
+    for column in np.flatnonzero(is_digit.any(axis=0)):
+        digit = is_digit[:, column]
+        mantissa = np.where(digit, mantissa * 10 + (chars[:, column].astype(np.int64) - ZERO), mantissa)
+
+    decimals = (is_digit & np.logical_or.accumulate(is_dot, axis=1)).sum(axis=1)
+    price = mantissa / POWERS_OF_TEN[np.minimum(decimals, MAX_PRICE_DIGITS)]
+    return np.where((is_sign & (chars == MINUS)).any(axis=1), -price, price)
+
+
+def _parse_lines_block(lines: list, price_field: int) -> tuple:
+    # an empty line is invalid here, the scalar parsing gets the long ones
+    values = np.array([line if len(line) <= MAX_LINE_WIDTH else b"" for line in lines], dtype=bytes)
+    if values.dtype.itemsize == 0:
+        values = values.astype("S1")
+    chars = _char_matrix(values)
+    width = chars.shape[1]
+    columns = np.arange(width)
+
+    separators = chars == SEMICOLON
+    field_number = np.cumsum(separators, axis=1, dtype=np.int8)
+    valid = field_number[:, -1] >= price_field
+
+    # the time field must end at the first separator, its last token is dropped
+    first_separator = np.where(separators.any(axis=1), separators.argmax(axis=1), width)
+    valid &= first_separator > TICK_TIME_WIDTH
+    valid &= chars[:, TICK_TIME_WIDTH] == SPACE
+    valid &= ~(
+        (chars == SPACE) & (columns > TICK_TIME_WIDTH) & (columns < first_separator[:, None])
+    ).any(axis=1)
+    seconds, valid = _decode_time_columns(chars, valid)
+
+    price_field_chars = (field_number == price_field) & ~separators
+    price = _decode_price_field(chars, price_field_chars, valid)
+    return seconds, price, valid
+
+
+def _parse_line_fallback(line: bytes, price_field: int):
+    parts = line.decode("utf-8").split(";")
+    return datetime_to_seconds(parse_tick_time(parts[0])), float(parts[price_field])
+
+
+def parse_tick_lines(buffer: bytes, price_field: int = 2) -> ParsedLines:
+    """
+    Decodes every line of a buffer of NinjaTrader ticks ``time;last;bid;ask;volume``.
+
+    Lines are stripped like the text readers do, so the result lines up with
+    ``buffer.split(b"\\n")``. Rows that fail both the vectorized and the scalar
+    parsing are flagged in ``valid``.
+    """
+    lines = _split_lines(buffer)
+    seconds = np.zeros(len(lines), dtype=np.int64)
+    price = np.zeros(len(lines), dtype=np.float64)
+    valid = np.zeros(len(lines), dtype=bool)
+
+    for start in range(0, len(lines), LINES_BLOCK_SIZE):
+        end = start + LINES_BLOCK_SIZE
+        seconds[start:end], price[start:end], valid[start:end] = _parse_lines_block(
+            lines[start:end], price_field
+        )
+
+    for i in np.flatnonzero(~valid):
+        try:
+            seconds[i], price[i] = _parse_line_fallback(lines[i], price_field)
+            valid[i] = True
+        except (IndexError, ValueError, UnicodeDecodeError):
+            continue
+
+    return ParsedLines(seconds=seconds, price=price, valid=valid, lines=lines)
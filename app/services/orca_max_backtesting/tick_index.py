@@ -0,0 +1,156 @@
+"""
+Sparse time -> byte offset index over a tick file.
+
+Every INDEX_STRIDE-th line start is sampled with its time, so a time window of
+a (chronological) tick file is found with a binary search plus a scan of at
+most INDEX_STRIDE lines, and cut out with a byte range copy.
+"""
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from app.services.orca_max_backtesting.tick_codec import datetime_to_seconds, parse_tick_time
+from app.services.orca_max_backtesting.tick_store import (
+    READ_BLOCK_SIZE,
+    TICK_STORE_DIR,
+    file_fingerprint,
+)
+from app.utils.decorators.timing.time import time_it
+from app.utils.logging_setup import logger
+
+# bump it when the index layout changes, old indexes are then rebuilt
+INDEX_VERSION = 1
+INDEX_STRIDE = 1 << 12
+NEW_LINE = ord("\n")
+
+# seconds: wall clock epoch seconds of the sampled lines
+# offsets: byte offset of the sampled lines
+# size: size of the indexed file
+TimeIndex = namedtuple("TimeIndex", ["seconds", "offsets", "size"])
+
+
+def line_time(line: bytes):
+    """Epoch seconds of a tick line, None if it has no valid time"""
+    try:
+        return datetime_to_seconds(parse_tick_time(line.split(b";", 1)[0].strip().decode("utf-8")))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@time_it
+def build_time_index(file_path: str, stride: int = INDEX_STRIDE) -> TimeIndex:
+    seconds, offsets = [], []
+    line_number, block_offset = 0, 0
+    with open(file_path, "rb") as file:
+        carry = b""
+        while True:
+            block = file.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            block = carry + block
+            # every line start of the block, lines are only sampled once complete
+            starts = np.concatenate(([0], np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == NEW_LINE) + 1))
+            complete = starts[:-1]
+            first = (-line_number) % stride
+            for start in complete[first::stride].tolist():
+                time_ = line_time(block[start:block.index(b"\n", start)])
+                if time_ is not None:
+                    seconds.append(time_)
+                    offsets.append(block_offset + start)
+
+            line_number += len(complete)
+            carry = block[starts[-1]:]
+            block_offset += starts[-1]
+
+    return TimeIndex(
+        seconds=np.array(seconds, dtype=np.int64),
+        offsets=np.array(offsets, dtype=np.int64),
+        size=os.path.getsize(file_path),
+    )
+
+
+def load_time_index(file_path: str, store_dir: str = TICK_STORE_DIR) -> TimeIndex:
+    """The index of a file, built once and kept next to the tick stores by content hash"""
+    digest = file_fingerprint(file_path, store_dir)
+    index_path = os.path.join(store_dir, f"{digest}_time_index_v{INDEX_VERSION}.npz")
+    if os.path.exists(index_path):
+        with np.load(index_path, allow_pickle=False) as saved:
+            return TimeIndex(seconds=saved["seconds"], offsets=saved["offsets"], size=int(saved["size"]))
+
+    logger.info(f"Time index not found for {file_path}, building it")
+    time_index = build_time_index(file_path)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, seconds=time_index.seconds, offsets=time_index.offsets, size=time_index.size)
+    os.replace(tmp_path, index_path)
+    return time_index
+
+
+def offset_of(file_path: str, time_index: TimeIndex, seconds: int) -> int:
+    """Byte offset of the first line at or after a time (the file size if there is none)"""
+    sample = int(np.searchsorted(time_index.seconds, seconds, side="left")) - 1
+    offset = int(time_index.offsets[sample]) if sample >= 0 else 0
+
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            time_ = line_time(line)
+            if time_ is not None and time_ >= seconds:
+                return offset
+            offset += len(line)
+    return offset
+
+
+def _ceil_seconds(value: datetime) -> int:
+    return datetime_to_seconds(value) + (value.microsecond > 0)
+
+
+def time_window_range(file_path: str, time_from: datetime, time_to: datetime = None, time_index=None) -> tuple:
+    """
+    (start, end) byte range of the lines with time_from <= time <= time_to, the
+    tick times being whole seconds of the wall clock like get_price_time returns.
+    """
+    time_index = time_index or load_time_index(file_path)
+    start = offset_of(file_path, time_index, _ceil_seconds(time_from))
+    if time_to is None:
+        return start, time_index.size
+    end = offset_of(file_path, time_index, datetime_to_seconds(time_to) + 1)
+    return start, max(start, end)
+
+
+def copy_lines(source_path: str, target_path: str, start: int, end: int, min_fields: int = 4):
+    """
+    Copies the lines of a byte range, block by block, joined with "\\n" and
+    without a trailing new line. Lines with fewer than `min_fields` fields are
+    left out like the text filters did.
+    """
+    separators = min_fields - 1
+    written = False
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        source.seek(start)
+        remaining = end - start
+        carry = b""
+        while remaining > 0 or carry:
+            block = source.read(min(READ_BLOCK_SIZE, remaining)) if remaining > 0 else b""
+            remaining -= len(block)
+            block = carry + block
+            if remaining > 0:
+                cut = block.rfind(b"\n") + 1
+                block, carry = block[:cut], block[cut:]
+            else:
+                carry = b""
+
+            lines = [line.rstrip(b"\r") for line in block.split(b"\n") if line.count(b";") >= separators]
+            if lines:
+                if written:
+                    target.write(b"\n")
+                target.write(b"\n".join(lines))
+                written = True
+
+
+@time_it
+def cut_time_window(source_path: str, target_path: str, time_from: datetime, time_to: datetime = None, time_index=None):
+    start, end = time_window_range(source_path, time_from, time_to, time_index)
+    logger.info(f"Copying bytes {start}-{end} of {source_path} into {target_path}")
+    copy_lines(source_path, target_path, start, end)
@@ -0,0 +1,184 @@
+"""
+Ticks of a date range from the ticks_{instrument} tables of Supabase.
+
+The range is split into time slices fetched at once on a thread pool, every
+slice with keyset pagination over (ts, id) and only the columns the engine
+needs. A page is turned into ts/price arrays as it arrives, the slices are
+stitched in time order into the tick store columns with the duplicate
+suppression of the file readers, so a range gives the series of the same
+ticks uploaded from a file.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.services.orca_max_backtesting.config import (
+    TICK_LOADER_PAGE_SIZE,
+    TICK_LOADER_SLICE_HOURS,
+    TICK_LOADER_THREADS,
+)
+from app.services.orca_max_backtesting.progress import report_progress
+from app.services.orca_max_backtesting.tick_codec import LOCAL_TIMEZONE, parse_iso_utc, seconds_to_ns
+from app.services.orca_max_backtesting.tick_series import TickSeries
+from app.services.orca_max_backtesting.tick_store import TickColumns, dedup_mask
+from app.utils.decorators.timing.time import time_it
+from app.utils.logging_setup import logger
+
+# id only for the keyset cursor, ts and last make the ticks
+TICK_TABLE_COLUMNS = "id,ts,last"
+_TABLE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S+00:00"
+
+
+def tick_table(instrument: str) -> str:
+    return f"ticks_{instrument.lower()}"
+
+
+def _parse_bound(value):
+    """A datetime of the wall clock, and whether the value was a whole day"""
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD or an ISO datetime")
+    if not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time()), True
+    if value.tzinfo is not None:
+        value = value.astimezone(ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None)
+    return value, False
+
+
+def range_bounds(date_from, date_to) -> tuple:
+    """
+    [start, end) of a range with both ends included: a date covers the whole day,
+    a datetime its second (the precision of the tables).
+    """
+    start, _ = _parse_bound(date_from)
+    end, whole_day = _parse_bound(date_to)
+    end += timedelta(days=1) if whole_day else timedelta(seconds=1)
+    if end <= start:
+        raise ValueError(f"The date range {date_from} to {date_to} is empty")
+    return start.replace(microsecond=0), end.replace(microsecond=0)
+
+
+def time_slices(start: datetime, end: datetime, hours: int = TICK_LOADER_SLICE_HOURS) -> list:
+    """[start, end) in consecutive slices of that many hours, the last one shorter"""
+    step = timedelta(hours=hours)
+    slices = []
+    while start < end:
+        slices.append((start, min(start + step, end)))
+        start += step
+    return slices
+
+
+def _client(client):
+    if client is None:
+        # the client connects on import, only the date range backtests need it
+        from app.services.orca_supabase.orca_supabase import SUPABASE as client
+    return client
+
+
+def range_fingerprint(contract: str, start, end, client=None) -> dict:
+    """
+    The number of rows and the highest id of a range of the tick table, they
+    change when the uploader adds rows to it (a key part of a cached backtest).
+    """
+    start, end = range_bounds(start, end)
+    response = (
+        _client(client).table(tick_table(contract))
+        .select("id", count="exact")
+        .gte("ts", start.strftime(_TABLE_TIME_FORMAT))
+        .lt("ts", end.strftime(_TABLE_TIME_FORMAT))
+        .order("id", desc=True)
+        .limit(1)
+        .execute()
+    )
+    rows = response.data or []
+    return {"rows": response.count or 0, "max_id": rows[0]["id"] if rows else None}
+
+
+def fetch_slice(client, table: str, start: datetime, end: datetime, page_size: int = TICK_LOADER_PAGE_SIZE) -> tuple:
+    """The (seconds, price) of the rows of a table with start <= ts < end, in (ts, id) order"""
+    from_iso, to_iso = start.strftime(_TABLE_TIME_FORMAT), end.strftime(_TABLE_TIME_FORMAT)
+    parts = []
+    last_ts = last_id = None
+    while True:
+        q = (
+            client.table(table)
+            .select(TICK_TABLE_COLUMNS)
+            .order("ts", desc=False)
+            .order("id", desc=False)
+            .gte("ts", from_iso)
+            .lt("ts", to_iso)
+            .limit(page_size)
+        )
+        if last_ts is not None:
+            # (ts, id) > (last_ts, last_id)
+            q = q.or_(f"ts.gt.{last_ts},and(ts.eq.{last_ts},id.gt.{last_id})")
+
+        batch = q.execute().data or []
+        if not batch:
+            break
+        parts.append((
+            parse_iso_utc([row["ts"] for row in batch]),
+            np.array([row["last"] for row in batch], dtype=np.float64),
+        ))
+        if len(batch) < page_size:
+            break
+        last_ts, last_id = batch[-1]["ts"], batch[-1]["id"]
+
+    if not parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+@time_it
+def fetch_data_between_dates(
+    contract: str,
+    start,
+    end,
+    client=None,
+    slice_hours: int = TICK_LOADER_SLICE_HOURS,
+    threads: int = TICK_LOADER_THREADS,
+    page_size: int = TICK_LOADER_PAGE_SIZE,
+) -> Optional[TickSeries]:
+    """
+    The ticks of a contract between two dates (or ISO datetimes), both included,
+    None when the range has none. The progress is reported in slices ("loading").
+
+    :raise ValueError: for an invalid or empty range
+    """
+    start, end = range_bounds(start, end)
+    client = _client(client)
+    table = tick_table(contract)
+    slices = time_slices(start, end, slice_hours)
+    logger.info(f"Loading {table} from {start} to {end} in {len(slices)} slices")
+
+    parts = [None] * len(slices)
+    with ThreadPoolExecutor(max_workers=min(threads, len(slices)), thread_name_prefix="tick-loader") as executor:
+        futures = {
+            executor.submit(fetch_slice, client, table, slice_start, slice_end, page_size): i
+            for i, (slice_start, slice_end) in enumerate(slices)
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                parts[futures[future]] = future.result()
+                report_progress("loading", done, len(slices))
+        except BaseException:
+            # the slices not started yet are dropped, the running ones finish
+            for future in futures:
+                future.cancel()
+            raise
+
+    seconds, price = (np.concatenate(column) for column in zip(*parts))
+    if not len(seconds):
+        return None
+    keep = dedup_mask(seconds, price)
+    seconds, price = seconds[keep], price[keep]
+    logger.info(f"Loaded {len(seconds)} ticks from {table}")
+    return TickSeries.from_columns(
+        TickColumns(ts=seconds_to_ns(seconds), price=price, line=np.arange(len(seconds), dtype=np.int64))
+    )
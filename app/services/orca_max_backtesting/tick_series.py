@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import numpy as np
+
+from app.services.orca_max_backtesting.tick_codec import NS_PER_SECOND
+from app.services.orca_max_backtesting.tick_store import TickColumns
+
+MINUTES_PER_DAY = 1440
+NS_PER_MINUTE = 60 * NS_PER_SECOND
+
+# iteration converts the arrays to python objects in chunks growing up to this
+# size, so a scan that stops after a few ticks doesn't convert a whole chunk
+FIRST_CHUNK_SIZE = 256
+MAX_CHUNK_SIZE = 1 << 16
+
+
+def ns_to_datetimes(ts: np.ndarray) -> list:
+    """Naive datetimes of epoch-ns values (microsecond precision, like datetime)"""
+    return np.asarray(ts).astype("datetime64[ns]").astype("datetime64[us]").tolist()
+
+
+class TickSeries:
+    """
+    The sanitized ticks as three contiguous arrays instead of a list of
+    (price, datetime, index) tuples:
+
+    - price: float64 last price
+    - ts: int64 epoch-ns of the (naive) tick time
+    - index: int64 index of the tick, the third element of the tuples
+
+    Slicing returns views, so a series over a memory-mapped tick store is never
+    copied. Iterating still yields the (price, datetime, index) tuples, so code
+    written for the lists keeps working.
+    """
+
+    __slots__ = ("price", "ts", "index")
+
+    def __init__(self, price: np.ndarray, ts: np.ndarray, index: np.ndarray) -> None:
+        if not len(price) == len(ts) == len(index):
+            raise ValueError("price, ts and index must have the same length")
+        self.price = price
+        self.ts = ts
+        self.index = index
+
+    @classmethod
+    def from_columns(cls, columns: TickColumns, rows=-1, line_index=False) -> "TickSeries":
+        """
+        View over tick store columns, see tick_columns_to_list for rows and line_index
+        """
+        size = len(columns.ts)
+        if rows != -1:
+            size = int(np.searchsorted(columns.line, rows, side="right"))
+        index = columns.line[:size] if line_index else np.arange(size, dtype=np.int64)
+        return cls(columns.price[:size], columns.ts[:size], index)
+
+    @classmethod
+    def from_list(cls, data: list) -> "TickSeries":
+        """From the (price, datetime, index) tuples of the text readers"""
+        if not data:
+            return cls(np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        price, times, index = zip(*data)
+        return cls(
+            np.array(price, dtype=np.float64),
+            np.array(times, dtype="datetime64[ns]").astype(np.int64),
+            np.array(index, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return TickSeries(self.price[key], self.ts[key], self.index[key])
+        return float(self.price[key]), self.time_at(key), int(self.index[key])
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, start: int = 0, stop: int = None):
+        """(price, datetime, index) tuples from a position on, without slicing"""
+        size = len(self) if stop is None else min(stop, len(self))
+        chunk_size = FIRST_CHUNK_SIZE
+        while start < size:
+            end = min(start + chunk_size, size)
+            yield from zip(
+                self.price[start:end].tolist(),
+                ns_to_datetimes(self.ts[start:end]),
+                self.index[start:end].tolist(),
+            )
+            start = end
+            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+
+    def iter_prices(self):
+        for start in range(0, len(self), MAX_CHUNK_SIZE):
+            yield from self.price[start:start + MAX_CHUNK_SIZE].tolist()
+
+    def time_at(self, position: int) -> datetime:
+        if position < 0:
+            position += len(self)
+        return ns_to_datetimes(self.ts[position:position + 1])[0]
+
+    def minute_of_day(self) -> np.ndarray:
+        return (self.ts // NS_PER_MINUTE) % MINUTES_PER_DAY
+
+    def to_list(self) -> list:
+        return list(self)
+
+
+def as_tick_series(data) -> TickSeries:
+    """Accepts either a TickSeries or the list of tuples of the text readers"""
+    if isinstance(data, TickSeries):
+        return data
+    return TickSeries.from_list(data)
@@ -0,0 +1,446 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+from multiprocess import current_process
+
+from app.services.orca_max_backtesting.tick_codec import NS_PER_SECOND, ParsedLines, parse_tick_lines, seconds_to_ns
+from app.utils.decorators.parallel import Parallel
+from app.utils.decorators.timing.time import time_it
+from app.utils.logging_setup import logger
+
+# bump it when the on-disk layout changes, old stores are then rebuilt
+STORE_VERSION = 1
+
+TICK_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tick_store")
+FINGERPRINTS_FILE = "fingerprints.json"
+FINGERPRINTS_LOCK_FILE = "fingerprints.lock"
+HASH_BLOCK_SIZE = 1 << 20
+READ_BLOCK_SIZE = 1 << 24
+UPLOAD_BLOCK_SIZE = 1 << 22
+# below this size a process pool costs more than it saves
+PARALLEL_MIN_SIZE = 1 << 26
+
+# ts: int64 epoch-ns (naive London wall clock, as get_price_time returns it)
+# price: float64 last price
+# line: int64 source line of every de-duplicated tick
+TickColumns = namedtuple("TickColumns", ["ts", "price", "line"])
+
+COLUMN_DTYPES = {"ts": np.int64, "price": np.float64, "line": np.int64}
+
+
+def _fingerprints_path(store_dir):
+    return os.path.join(store_dir, FINGERPRINTS_FILE)
+
+
+def _load_fingerprints(store_dir) -> dict:
+    try:
+        with open(_fingerprints_path(store_dir), "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextmanager
+def _fingerprints_lock(store_dir):
+    """Serializes the updates of the fingerprints of a directory, across processes"""
+    with open(os.path.join(store_dir, FINGERPRINTS_LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_fingerprints(store_dir, fingerprints: dict):
+    tmp_path = f"{_fingerprints_path(store_dir)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(fingerprints, file, indent=2)
+    os.replace(tmp_path, _fingerprints_path(store_dir))
+
+
+def content_digest(file_path: str) -> str:
+    """blake2b of the file content, read in blocks so huge files are fine"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path: str, store_dir: str = TICK_STORE_DIR) -> str:
+    """
+    Content hash of a tick file.
+
+    The hash is remembered against (size, mtime) so an untouched file is not
+    re-hashed, a touched file is re-hashed and only rebuilt if its content changed.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+
+    fingerprints = _load_fingerprints(store_dir)
+    known = fingerprints.get(file_path)
+    if (
+        known
+        and known["size"] == stat.st_size
+        and known["mtime_ns"] == stat.st_mtime_ns
+    ):
+        return known["digest"]
+
+    digest = content_digest(file_path)
+    # hashed out of the lock, the entries of the other processes are read again under it
+    with _fingerprints_lock(store_dir):
+        fingerprints = _load_fingerprints(store_dir)
+        fingerprints[file_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "digest": digest,
+        }
+        _save_fingerprints(store_dir, fingerprints)
+    return digest
+
+
+def dedup_mask(seconds: np.ndarray, price: np.ndarray, previous_row=None) -> np.ndarray:
+    """
+    The consecutive-duplicate suppression of the text readers: a tick is kept when
+    its (price, second) differs from the previous valid tick.
+    """
+    keep = np.ones(len(seconds), dtype=bool)
+    keep[1:] = (price[1:] != price[:-1]) | (seconds[1:] != seconds[:-1])
+    if previous_row is not None and len(keep):
+        previous_seconds, previous_price = previous_row
+        keep[0] = price[0] != previous_price or seconds[0] != previous_seconds
+    return keep
+
+
+class TickAccumulator:
+    """
+    Collects parsed blocks of lines into de-duplicated tick columns.
+
+    The duplicate suppression carries over from one block to the next, so feeding
+    a file block by block gives the same ticks as reading it in one go.
+    """
+
+    def __init__(self, rows=-1, strict=True, keep_lines=False):
+        self.rows = rows
+        self.strict = strict
+        self.keep_lines = keep_lines
+
+        self.lines_count = 0
+        self.previous_row = None
+        self.previous_line = None
+
+        self._blocks = []
+        self.distinct_lines = []
+
+    @property
+    def done(self) -> bool:
+        return self.rows != -1 and self.lines_count > self.rows
+
+    def add(self, parsed: ParsedLines):
+        if self.done:
+            return
+
+        lines_count = len(parsed.lines)
+        if self.rows != -1:
+            # the text readers stop after line number `rows`
+            lines_count = min(lines_count, self.rows + 1 - self.lines_count)
+        valid = parsed.valid[:lines_count]
+
+        for i in np.flatnonzero(~valid):
+            line = parsed.lines[i].decode("utf-8", errors="replace")
+            if self.strict:
+                raise ValueError(f"Invalid tick line [{self.lines_count + i}]: {line}")
+            logger.warning(f"Skipping invalid line [{self.lines_count + i}]: {line}")
+
+        if self.keep_lines:
+            self._add_distinct_lines(parsed.lines[:lines_count])
+
+        seconds = parsed.seconds[:lines_count][valid]
+        price = parsed.price[:lines_count][valid]
+        line = np.flatnonzero(valid) + self.lines_count
+
+        keep = dedup_mask(seconds, price, self.previous_row)
+        if len(seconds):
+            self.previous_row = (seconds[-1], price[-1])
+            self._blocks.append((seconds[keep], price[keep], line[keep]))
+
+        self.lines_count += lines_count
+
+    def _add_distinct_lines(self, lines: list):
+        for line in lines:
+            if line != self.previous_line:
+                self.distinct_lines.append(line.decode("utf-8"))
+                self.previous_line = line
+
+    def columns(self) -> TickColumns:
+        if not self._blocks:
+            return TickColumns(
+                ts=np.zeros(0, dtype=np.int64),
+                price=np.zeros(0, dtype=np.float64),
+                line=np.zeros(0, dtype=np.int64),
+            )
+        seconds, price, line = (np.concatenate(parts) for parts in zip(*self._blocks))
+        return TickColumns(ts=seconds_to_ns(seconds), price=price, line=line)
+
+
+def split_line_block(block: bytes) -> tuple:
+    """(whole lines, the split line at the end to carry over to the next block)"""
+    cut = block.rfind(b"\n") + 1
+    return block[:cut], block[cut:]
+
+
+def iter_line_blocks(file, block_size=READ_BLOCK_SIZE):
+    """Blocks of whole lines of a binary file object, a split line is carried over"""
+    carry = b""
+    while True:
+        block = file.read(block_size)
+        if not block:
+            break
+        lines, carry = split_line_block(carry + block)
+        if lines:
+            yield lines
+    if carry:
+        yield carry
+
+
+def read_tick_file(file_path: str, rows=-1, strict=True, keep_lines=False, block_size=READ_BLOCK_SIZE):
+    """
+    Parses a NinjaTrader export block by block with the vectorized codec.
+
+    :return: (TickColumns, distinct raw lines when keep_lines is set)
+    """
+    accumulator = TickAccumulator(rows=rows, strict=strict, keep_lines=keep_lines)
+    with open(file_path, "rb") as file:
+        for block in iter_line_blocks(file, block_size):
+            accumulator.add(parse_tick_lines(block))
+            if accumulator.done:
+                break
+    return accumulator.columns(), accumulator.distinct_lines
+
+
+def shard_ranges(file_path: str, shards: int) -> list:
+    """Splits a file into `shards` byte ranges (start, end) that begin on a new line"""
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, "rb") as file:
+        for shard in range(1, shards):
+            file.seek(max(size * shard // shards - 1, boundaries[-1]))
+            file.readline()
+            if file.tell() >= size:
+                break
+            if file.tell() > boundaries[-1]:
+                boundaries.append(file.tell())
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_tick_shard(file_path: str, byte_range: tuple, keep_lines=False, block_size=READ_BLOCK_SIZE) -> dict:
+    """
+    Parses one byte range of a file like read_tick_file, line numbers are local to
+    the range. The last valid tick and raw line are returned for the merge.
+    """
+    start, end = byte_range
+    accumulator = TickAccumulator(keep_lines=keep_lines)
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        remaining = end - start
+        carry = b""
+        while remaining > 0:
+            block = file.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            lines, carry = split_line_block(carry + block)
+            if lines:
+                accumulator.add(parse_tick_lines(lines))
+        if carry:
+            accumulator.add(parse_tick_lines(carry))
+
+    return {
+        "columns": accumulator.columns(),
+        "distinct_lines": accumulator.distinct_lines,
+        "lines_count": accumulator.lines_count,
+        "last_row": accumulator.previous_row,
+        "last_line": accumulator.previous_line,
+    }
+
+
+def merge_tick_shards(shards: list) -> tuple:
+    """
+    Concatenates the shards in file order. The duplicate suppression restarts in
+    every shard, so the first tick (and raw line) of a shard is dropped when it
+    repeats the last one of the shards before it, as the serial reader would.
+    """
+    blocks, distinct_lines = [], []
+    lines_offset = 0
+    last_row, last_line = None, None
+    for shard in shards:
+        columns = shard["columns"]
+        skip = 0
+        if last_row is not None and len(columns.ts):
+            last_seconds, last_price = last_row
+            skip = int(columns.ts[0] == last_seconds * NS_PER_SECOND and columns.price[0] == last_price)
+        blocks.append(
+            TickColumns(ts=columns.ts[skip:], price=columns.price[skip:], line=columns.line[skip:] + lines_offset)
+        )
+
+        lines = shard["distinct_lines"]
+        if lines and last_line is not None and lines[0] == last_line.decode("utf-8"):
+            lines = lines[1:]
+        distinct_lines.extend(lines)
+
+        lines_offset += shard["lines_count"]
+        last_row = shard["last_row"] if shard["last_row"] is not None else last_row
+        last_line = shard["last_line"] if shard["last_line"] is not None else last_line
+
+    columns = TickColumns(*(np.concatenate(parts) for parts in zip(*blocks)))
+    return columns, distinct_lines
+
+
+@time_it
+def read_tick_file_parallel(file_path: str, rows=-1, keep_lines=False, processes=None):
+    """
+    read_tick_file on newline aligned shards of the file parsed in a process pool,
+    the result is identical to the serial read.
+
+    Small files, row limited reads and calls made from a pool worker (which can't
+    start a pool of its own) are read serially.
+    """
+    processes = processes or os.cpu_count() or 1
+    if (
+        rows != -1
+        or processes == 1
+        or current_process().daemon
+        or os.path.getsize(file_path) < PARALLEL_MIN_SIZE
+    ):
+        return read_tick_file(file_path, rows, keep_lines=keep_lines)
+
+    byte_ranges = shard_ranges(file_path, processes)
+    logger.info(f"Reading {file_path} in {len(byte_ranges)} shards")
+
+    @Parallel.processes(
+        iterable=byte_ranges,
+        processes=processes,
+    )
+    def read_shard(byte_range):
+        return read_tick_shard(file_path, byte_range, keep_lines=keep_lines)
+
+    return merge_tick_shards(read_shard())
+
+
+def spool_upload(file, block_size=UPLOAD_BLOCK_SIZE) -> tuple:
+    """
+    Copies an uploaded file object (e.g. UploadFile.file) into a temporary file,
+    hashing its bytes on the way. Blocking, the API runs it in a thread.
+
+    :return: (path of the copy, blake2b of the bytes); the caller removes the copy
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    file.seek(0)
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=".txt")
+    try:
+        with os.fdopen(fd, "wb") as copy:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+                copy.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+
+@time_it
+def parse_tick_file(file_path: str) -> TickColumns:
+    """Parses a NinjaTrader export into de-duplicated tick columns"""
+    logger.info(f"Converting {file_path} into columns")
+    columns, _ = read_tick_file_parallel(file_path)
+    return columns
+
+
+def _store_path(digest, store_dir):
+    return os.path.join(store_dir, f"{digest}_v{STORE_VERSION}")
+
+
+def write_tick_store(columns: TickColumns, digest: str, source: str, store_dir: str = TICK_STORE_DIR) -> str:
+    final_path = _store_path(digest, store_dir)
+    tmp_path = f"{final_path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+
+    for name, dtype in COLUMN_DTYPES.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(getattr(columns, name), dtype=dtype))
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as file:
+        json.dump(
+            {
+                "version": STORE_VERSION,
+                "source": source,
+                "digest": digest,
+                "rows": int(len(columns.ts)),
+                "created": datetime.now().isoformat(),
+            },
+            file,
+            indent=2,
+        )
+
+    try:
+        os.rename(tmp_path, final_path)
+    except OSError:
+        # another process has built the same store in the meantime
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return final_path
+
+
+def read_tick_store(store_path: str) -> TickColumns:
+    """Memory-maps the columns of a store, nothing is read until it is touched"""
+    return TickColumns(
+        **{
+            name: np.load(os.path.join(store_path, f"{name}.npy"), mmap_mode="r")
+            for name in COLUMN_DTYPES
+        }
+    )
+
+
+@time_it
+def load_tick_store(file_path: str, store_dir: str = TICK_STORE_DIR) -> TickColumns:
+    """
+    Returns the tick columns of a file, converting it on the first call only.
+
+    The store is keyed by the content hash of the file, so a replaced file
+    gets its own store and can never return stale ticks.
+    """
+    digest = file_fingerprint(file_path, store_dir)
+    store_path = _store_path(digest, store_dir)
+
+    if not os.path.exists(os.path.join(store_path, "meta.json")):
+        logger.info(f"Tick store not found for {file_path}, building it")
+        columns = parse_tick_file(file_path)
+        store_path = write_tick_store(columns, digest, os.path.basename(file_path), store_dir)
+
+    logger.info(f"Tick store loaded from {store_path}")
+    return read_tick_store(store_path)
+
+
+def tick_columns_to_list(columns: TickColumns, rows=-1, line_index=False) -> list:
+    """
+    The (price, datetime, index) tuples the backtester consumes.
+
+    :param line_index: use the source line as index instead of the tick position
+    """
+    size = len(columns.ts)
+    if rows != -1:
+        # the text readers stop after line number `rows`
+        size = int(np.searchsorted(columns.line, rows, side="right"))
+
+    times = columns.ts[:size].astype("datetime64[ns]").astype("datetime64[us]").tolist()
+    index = columns.line[:size].tolist() if line_index else range(size)
+    return list(zip(columns.price[:size].tolist(), times, index))
@@ -1,8 +1,10 @@
 import csv
 from datetime import datetime
 
+import numpy as np
+
 from app.services.orca_max_backtesting.config import HIBERNATION_MODE
-from app.services.orca_max_backtesting.helper import get_overlapping_orders
+from app.services.orca_max_backtesting.order_overlaps import OrderOverlapIndex, times_to_seconds
 from app.utils.decorators.timing.time import time_it
 
 # from orcaven.algorithm.abc_validator.config import HIBERNATION_MODE
@@ -13,6 +15,40 @@ from app.utils.decorators.timing.time import time_it
 from app.utils.logging_setup import logger
 
 
+class LossRuns:
+    """
+    The runs of consecutive Lost trades of the sorted trades, from which the
+    hibernation counters of every consecutive reach level follow without
+    replaying the trades level by level. The trades that are neither Filled
+    nor Lost are skipped.
+    """
+
+    def __init__(self, sorted_data: list) -> None:
+        results = [row["Result"] for row in sorted_data]
+        filled = np.array([result == "Filled" for result in results], dtype=bool)
+        lost = np.array([result == "Lost" for result in results], dtype=bool)
+        # positions of the Filled / Lost trades, the runs are counted among them
+        self.positions = np.flatnonzero(filled | lost)
+        self.filled_count = int(filled.sum())
+
+        edges = np.diff(np.concatenate(([False], lost[self.positions], [False])).astype(np.int8))
+        self.starts = np.flatnonzero(edges == 1)
+        self.lengths = np.flatnonzero(edges == -1) - self.starts
+        # a run is ended by a Filled trade unless it is the last one
+        self.ended_by_filled = self.starts + self.lengths < len(self.positions)
+
+    def counts(self, consecutive_reach: int) -> tuple:
+        """
+        (win, lost, reached) of a level: from the `consecutive_reach`-th loss of a
+        run on the losses aren't counted, nor the Filled trade ending the run.
+        reached holds the positions of the losses reaching the level.
+        """
+        reached = self.lengths >= consecutive_reach
+        win = self.filled_count - int((reached & self.ended_by_filled).sum())
+        lost = int(np.minimum(self.lengths, consecutive_reach - 1).sum() + reached.sum())
+        return win, lost, self.positions[self.starts[reached] + consecutive_reach - 1]
+
+
 class TradeAnalyzer:
     def __init__(self, data, max_consecutive_reach, tp, sl, tick_price):
         self.max_consecutive_reach = max_consecutive_reach
@@ -29,14 +65,10 @@ class TradeAnalyzer:
     def _clean_and_sort_data(self, data, date_from_file=False):
         """Cleans and sorts data by the 'Closed' column."""
         data_cleaned = [x for x in data if x.get("Closed") and x.get("Closed") != ""]
-        # for reading from file
-        if date_from_file:
-            sorted_data = sorted(
-                data_cleaned, key=lambda x: self.convert_to_datetime(x["Closed"])
-            )
-        else:
-            sorted_data = sorted(data_cleaned, key=lambda x: x["Closed"])
-        return sorted_data
+        # sorted on the parsed times, the strings read from a file included, a
+        # stable sort keeps the orders closed in the same second in their order
+        closed = times_to_seconds([x["Closed"] for x in data_cleaned]).reshape(-1)
+        return [data_cleaned[i] for i in np.argsort(closed, kind="stable").tolist()]
 
     @staticmethod
     def convert_to_datetime(_date_string):
@@ -46,41 +78,11 @@ class TradeAnalyzer:
     @time_it
     def _calculate_profit_hibernation(self):
         """Calculates profit based on the sorted data and returns as a dictionary."""
-        results_dict = {
-            consecutive_reach: {
-                "win": 0,
-                "lost": 0,
-                "lost_trade_consecutive_count": 0,
-                "max_consecutive_reached": False,
-            }
-            for consecutive_reach in range(2, self.max_consecutive_reach + 1)
-        }
-
-        try:
-            for i, order_row in enumerate(self.sorted_data):
-                for consecutive_reach in range(2, self.max_consecutive_reach + 1):
-                    result = results_dict[consecutive_reach]
-                    if order_row["Result"] == "Filled":
-                        if result["max_consecutive_reached"]:
-                            result["max_consecutive_reached"] = False
-                            result["lost_trade_consecutive_count"] = 0
-                            continue
-
-                        result["win"] += 1
-                        result["lost_trade_consecutive_count"] = 0
-                        result["max_consecutive_reached"] = False
-
-                    elif order_row["Result"] == "Lost":
-                        result["lost_trade_consecutive_count"] += 1
-                        if result["lost_trade_consecutive_count"] >= consecutive_reach:
-                            if not result["max_consecutive_reached"]:
-                                result["max_consecutive_reached"] = True
-                                result["lost"] += 1
-                        else:
-                            result["lost"] += 1
-        except Exception as e:
-            logger.error(f"Error in _calculate_profit_hibernation_time: {e}")
-            return {}
+        loss_runs = LossRuns(self.sorted_data)
+        results_dict = {}
+        for consecutive_reach in range(2, self.max_consecutive_reach + 1):
+            win, lost, _ = loss_runs.counts(consecutive_reach)
+            results_dict[consecutive_reach] = {"win": win, "lost": lost}
 
         # Calculate profits and sort by total
         sorted_profit_results = self.extract_result(results_dict)
@@ -89,99 +91,73 @@ class TradeAnalyzer:
 
     def _calculate_profit_hibernation_time(self):
         """Calculates profit based on the sorted data and returns as a dictionary."""
-        results_dict = {
-            consecutive_reach: {
-                "win": 0,
-                "lost": 0,
-                "lost_trade_consecutive_count": 0,
-                "max_consecutive_reached": False,
-                "win_overlapped_count": 0,
-                "lost_overlapped_count": 0,
-                "overlapped_orders_points": 0,
-            }
-            for consecutive_reach in range(2, self.max_consecutive_reach + 1)
-        }
+        loss_runs = LossRuns(self.sorted_data)
 
-        # we get the overlapping orders
-        # and all the order is linked to it
-        overlapping_orders_info = get_overlapping_orders(self.sorted_data)
+        # we get the overlapping orders of an order by its position
+        # in the sorted data, every order is looked up once for all the levels
+        overlap_index = OrderOverlapIndex(self.sorted_data)
+        overlaps_of = {}
 
-        def get_overlap_index(
-            current_order,
-        ):
-            overlapped_orders_indexes = {"won": [], "lost": []}
-            overlapped_orders_price = []
-            # get the overlapping orders
-            for item in overlapping_orders_info:
-                # get the order that is overlapping with the other orders
-                order = item["order"][1]
-                # check if this order is the same as the current order
-                if current_order == order:
-                    # mean the order is overlapping
-                    # if yes, then get overlapping orders with the current order
-                    overlapped_orders = item["overlaps"]
-                    for overlapped_order in overlapped_orders:
-                        if overlapped_order[1]["Result"] == "Filled":
-                            overlapped_orders_indexes["won"].append(overlapped_order[0])
-                        elif overlapped_order[1]["Result"] == "Lost":
-                            overlapped_orders_indexes["lost"].append(
-                                overlapped_order[0]
-                            )
-                        else:
-                            # not triggered yet
-                            continue
-
-                        # used to calculate the profit of lost depends on the price difference
-                        # if it is positive mean the trade close in profit if negative mean the trade close in loss
-                        closing_points = (
-                            current_order["ClosedPrice"]
-                            - overlapped_order[1]["Order_point"]
-                        )
-                        overlapped_orders_price.append(closing_points)
-                    return overlapped_orders_indexes, overlapped_orders_price
+        def get_overlap_index(position):
+            if position in overlaps_of:
+                return overlaps_of[position]
 
-            return [], []
+            overlapped_positions = overlap_index.overlaps(position)
+            if not overlapped_positions:
+                overlaps_of[position] = [], []
+                return overlaps_of[position]
 
+            current_order = self.sorted_data[position]
+            overlapped_orders_indexes = {"won": [], "lost": []}
+            overlapped_orders_price = []
+            for overlapped_position in overlapped_positions:
+                overlapped_order = self.sorted_data[overlapped_position]
+                if overlapped_order["Result"] == "Filled":
+                    overlapped_orders_indexes["won"].append(overlapped_position)
+                elif overlapped_order["Result"] == "Lost":
+                    overlapped_orders_indexes["lost"].append(overlapped_position)
+                else:
+                    # not triggered yet
+                    continue
+
+                # used to calculate the profit of lost depends on the price difference
+                # if it is positive mean the trade close in profit if negative mean the trade close in loss
+                closing_points = (
+                    current_order["ClosedPrice"] - overlapped_order["Order_point"]
+                )
+                overlapped_orders_price.append(closing_points)
+
+            overlaps_of[position] = overlapped_orders_indexes, overlapped_orders_price
+            return overlaps_of[position]
+
+        results_dict = {}
         try:
-            for i, order_row in enumerate(self.sorted_data):
-                for consecutive_reach in range(2, self.max_consecutive_reach + 1):
-                    result = results_dict[consecutive_reach]
-                    if order_row["Result"] == "Filled":
-                        if result["max_consecutive_reached"]:
-                            result["max_consecutive_reached"] = False
-                            result["lost_trade_consecutive_count"] = 0
-                            continue
-
-                        result["win"] += 1
-                        result["lost_trade_consecutive_count"] = 0
-                        result["max_consecutive_reached"] = False
-
-                    elif order_row["Result"] == "Lost":
-                        result["lost_trade_consecutive_count"] += 1
-                        if result["lost_trade_consecutive_count"] >= consecutive_reach:
-                            if not result["max_consecutive_reached"]:
-                                result["max_consecutive_reached"] = True
-                                result["lost"] += 1
-                                # This is to calculate the profit of the lost trade for overlapping orders
-                                overlapped_orders_indexes, overlapped_orders_price = (
-                                    get_overlap_index(order_row)
-                                )
-                                # for hiberantion mode, exact calculation of the profit/lost
-                                if (
-                                    overlapped_orders_indexes
-                                    and overlapped_orders_price
-                                ):
-                                    result["win_overlapped_count"] += len(
-                                        overlapped_orders_indexes["won"]
-                                    )
-                                    result["lost_overlapped_count"] += len(
-                                        overlapped_orders_indexes["lost"]
-                                    )
-                                    result["overlapped_orders_points"] += sum(
-                                        overlapped_orders_price
-                                    )
-                        else:
-                            result["lost"] += 1
+            for consecutive_reach in range(2, self.max_consecutive_reach + 1):
+                win, lost, reached = loss_runs.counts(consecutive_reach)
+                result = {
+                    "win": win,
+                    "lost": lost,
+                    "win_overlapped_count": 0,
+                    "lost_overlapped_count": 0,
+                    "overlapped_orders_points": 0,
+                }
+                # This is to calculate the profit of the lost trade for overlapping orders
+                for position in reached.tolist():
+                    overlapped_orders_indexes, overlapped_orders_price = (
+                        get_overlap_index(position)
+                    )
+                    # for hiberantion mode, exact calculation of the profit/lost
+                    if overlapped_orders_indexes and overlapped_orders_price:
+                        result["win_overlapped_count"] += len(
+                            overlapped_orders_indexes["won"]
+                        )
+                        result["lost_overlapped_count"] += len(
+                            overlapped_orders_indexes["lost"]
+                        )
+                        result["overlapped_orders_points"] += sum(
+                            overlapped_orders_price
+                        )
+                results_dict[consecutive_reach] = result
 
         except Exception as e:
             logger.error(f"Error in _calculate_profit_hibernation: {e}")
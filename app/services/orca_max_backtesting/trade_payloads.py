@@ -0,0 +1,90 @@
+"""
+The trades of a backtest payload ({"result", "trades", "meta"}, trades by side)
+in the encodings of the API:
+
+- rows: the order point dicts as they are
+- columns: one list per key, the ~25 keys are written once instead of once per trade
+- none: only the number of trades of every side, for a summary fetched at once
+
+and as NDJSON, a line per trade streamed after a summary line.
+"""
+import json
+
+TRADES_ROWS, TRADES_COLUMNS, TRADES_NONE = "rows", "columns", "none"
+TRADES_ENCODINGS = (TRADES_ROWS, TRADES_COLUMNS, TRADES_NONE)
+# the NDJSON lines sent at once
+NDJSON_BATCH_SIZE = 1000
+
+
+def render_json(content) -> bytes:
+    """
+    JSON as JSONResponse renders it, for the payloads and the NDJSON lines alike:
+    a NaN or an infinity raises instead of giving a token JSON doesn't have.
+    """
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def trades_to_columns(trades: list) -> dict:
+    """
+    {"count", "columns": {key: values}} of a list of trades. The keys come in the
+    order they are first met, a trade without a key has None for it (e.g. the
+    NotTriggered orders have no close).
+    """
+    keys = {}
+    for trade in trades:
+        keys.update(dict.fromkeys(trade))
+    return {
+        "count": len(trades),
+        "columns": {key: [trade.get(key) for trade in trades] for key in keys},
+    }
+
+
+def trades_counts(trades_by_side: dict) -> dict:
+    return {side: len(trades) for side, trades in trades_by_side.items()}
+
+
+def encode_payload(payload: dict, encoding: str = TRADES_ROWS) -> dict:
+    """The payload with its trades in one of TRADES_ENCODINGS"""
+    if encoding not in TRADES_ENCODINGS:
+        raise ValueError(f"Unknown trades encoding {encoding}, expected one of {list(TRADES_ENCODINGS)}")
+    trades_by_side = payload["trades"]
+    if encoding == TRADES_COLUMNS:
+        trades = {side: trades_to_columns(trades) for side, trades in trades_by_side.items()}
+    elif encoding == TRADES_NONE:
+        trades = trades_counts(trades_by_side)
+    else:
+        trades = trades_by_side
+    return {**payload, "trades": trades, "trades_encoding": encoding}
+
+
+def trades_page(trades_by_side: dict, side: str, offset: int, limit: int, encoding: str = TRADES_ROWS) -> dict:
+    """
+    The trades [offset, offset + limit) of a side, rows or columns.
+
+    :raise KeyError: for a side without trades
+    """
+    if encoding not in (TRADES_ROWS, TRADES_COLUMNS):
+        raise ValueError(f"Unknown trades encoding {encoding}, expected {TRADES_ROWS} or {TRADES_COLUMNS}")
+    trades = trades_by_side[side]
+    page = trades[offset:offset + limit]
+    return {
+        "side": side,
+        "offset": offset,
+        "limit": limit,
+        "total": len(trades),
+        "next_offset": offset + len(page) if offset + len(page) < len(trades) else None,
+        "trades": trades_to_columns(page) if encoding == TRADES_COLUMNS else page,
+        "trades_encoding": encoding,
+    }
+
+
+def payload_ndjson(payload: dict):
+    """
+    The payload as NDJSON bytes: a line of the payload without its trades (their
+    counts instead), then a line per trade with its "side".
+    """
+    yield render_json(encode_payload(payload, TRADES_NONE)) + b"\n"
+    for side, trades in payload["trades"].items():
+        for start in range(0, len(trades), NDJSON_BATCH_SIZE):
+            lines = [render_json({"side": side, **trade}) for trade in trades[start:start + NDJSON_BATCH_SIZE]]
+            yield b"\n".join(lines) + b"\n"
@@ -1,6 +1,6 @@
 from enum import Enum
 
-from app.services.orca_max_backtesting.helper import read_file_plain
+from app.services.orca_max_backtesting.helper import path
 from app.utils.decorators.timing.time import time_it
 
 
@@ -14,6 +14,32 @@ class PriceLevel(Enum):
     LAST = 3
 
 
+def filter_price_level(lines, level: int):
+    """`time;price` of the lines where the price of the level changes"""
+    previous_value = None
+    for line in lines:
+        parts = line.split(";")
+        if len(parts) >= 4:
+            if parts[level] != previous_value:
+                # Keep only the first and last part
+                yield f"{parts[0]};{parts[level]}"
+                previous_value = parts[level]
+
+
+def extract_price_level(source_path, target_path, price_level=PriceLevel.LAST):
+    """
+    DataCleaner as a streaming filter, the file is read line by line and never
+    held in memory as a whole
+    """
+    with open(source_path, "r") as source, open(target_path, "w") as target:
+        written = False
+        for line in filter_price_level((line.rstrip("\n") for line in source), price_level.value):
+            if written:
+                target.write("\n")
+            target.write(line)
+            written = True
+
+
 class DataCleaner:
     def __init__(self, data, file_name, price_level=PriceLevel.LAST):
         self.data = data
@@ -23,20 +49,7 @@ class DataCleaner:
         self.filtered_data = self._filter_data()
 
     def _filter_data(self):
-        lines = self.data.split("\n")
-        filtered_lines = []
-        previous_value = None
-
-        # Iterate over the lines
-        for i in range(len(lines)):
-            parts = lines[i].split(";")
-            if len(parts) >= 4:
-                if parts[self.level] != previous_value:
-                    # Keep only the first and last part
-                    filtered_lines.append(f"{parts[0]};{parts[self.level]}")
-                    previous_value = parts[self.level]
-
-        return "\n".join(filtered_lines)
+        return "\n".join(filter_price_level(self.data.split("\n"), self.level))
 
     def dump(self):
         """Dumpe the filtered data to a file"""
@@ -48,10 +61,8 @@ class DataCleaner:
 def clean_data():
     file_name = "NQ 6-8-09-24.Last.txt"
     file_name = "NQ 6-8-09-24.Last.txt"
-    data = read_file_plain(file_name)
-
-    data = DataCleaner(data, file_name)
-    data.dump()
+    price_level = PriceLevel.LAST
+    extract_price_level(f"{path}/files/{file_name}", f"{file_name}_{price_level.name}_data.txt", price_level)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 import datetime
 
-from app.services.orca_max_backtesting.helper import get_price_time, read_file_plain
+from app.services.orca_max_backtesting.helper import get_price_time, path
+from app.services.orca_max_backtesting.tick_index import cut_time_window
 from app.utils.decorators.timing.time import time_it
 
 
@@ -19,11 +20,7 @@ class DataCleaner:
         for i in range(len(lines)):
             parts = lines[i].split(";")
             if len(parts) >= 4:
-                if (
-                    get_price_time(parts[0]) >= self.time_from
-                    and get_price_time(parts[0]) <= self.time_to
-                ):
-                    # Keep only the first and last part
+                if self.time_from <= get_price_time(parts[0]) <= self.time_to:
                     filtered_lines.append(lines[i])
 
         return "\n".join(filtered_lines)
@@ -45,10 +42,11 @@ def clean_data(file_name, time_from: str, time_to: str = None):
     )
 
     # file_name = "NQ 6-8-09-24.Last.txt"
-    data = read_file_plain(file_name)
-
-    data = DataCleaner(data, file_name, _time_from, _time_to)
-    data.dump()
+    # binary search in the time index of the file and a copy of the byte
+    # range, instead of reading and parsing the whole file (same output as DataCleaner)
+    target = f"{file_name}_timed_data.txt"
+    cut_time_window(f"{path}/files/{file_name}", target, _time_from, _time_to)
+    print(target + " created")
 
 
 if __name__ == "__main__":
@@ -1,12 +1,61 @@
+import atexit
 import functools
+import os
+import pickle
 from concurrent.futures.thread import ThreadPoolExecutor
 from math import ceil
+from multiprocessing import resource_tracker
 from threading import Thread
 
-from pathos.multiprocessing import ProcessingPool
+import dill
+from multiprocess import Pool
 #
+from app.utils.decorators.shared_memory import SharedObjects, close_blocks, load_shared
 from app.utils.logging_setup import logger
 
+# the persistent process pools, by (pid of the process owning them, number of processes): a forked
+# process, e.g. a backtest job, neither uses nor finalizes the pools of its parent
+_POOLS = {}
+
+# in a worker, the function and arguments of the current call: [handles, (func, args, kwargs), blocks]
+_worker_call = [None, None, []]
+
+
+def _load_call(handles):
+    """The (func, args, kwargs) of a call in a worker, loaded from shared memory once per call"""
+    if _worker_call[0] != handles:
+        # the previous call's objects go before their blocks are closed
+        _worker_call[1] = None
+        close_blocks(_worker_call[2])
+        loaded, blocks = zip(*(load_shared(handle) for handle in handles))
+        _worker_call[:] = [handles, loaded, [block for part in blocks for block in part]]
+    return _worker_call[1]
+
+
+def _run_shared_task(handles, item):
+    func, args, kwargs = _load_call(handles)
+    result = func(*args, item, **kwargs)
+    # the pool would send it back with dill's pure python pickler, slow on e.g. lists of dicts
+    try:
+        return pickle.dumps(result, protocol=5), False
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return dill.dumps(result, protocol=5), True
+
+
+def _load_result(pickled):
+    data, with_dill = pickled
+    return dill.loads(data) if with_dill else pickle.loads(data)
+
+
+def _close_pools():
+    for (pid, processes), pool in list(_POOLS.items()):
+        if pid == os.getpid():
+            pool.terminate()
+            del _POOLS[pid, processes]
+
+
+atexit.register(_close_pools)
+
 
 class Parallel(object):
     def __init__(self, func):
@@ -37,7 +86,25 @@ class Parallel(object):
             return decorator_background(_func)
 
     @classmethod
-    def processes(cls, _func=None, iterable=None, processes=2):
+    def get_pool(cls, processes=2):
+        """The persistent pool of `processes` workers, started on the first use"""
+        key = (os.getpid(), processes)
+        if key not in _POOLS:
+            # the workers share the tracker of the shared memory blocks with this process
+            resource_tracker.ensure_running()
+            _POOLS[key] = Pool(processes)
+        return _POOLS[key]
+
+    @classmethod
+    def processes(
+        cls,
+        _func=None,
+        iterable=None,
+        processes=2,
+        chunksize=1,
+        ordered=True,
+        progress=False,
+    ):
         """
         Function to parallelize a certain function based on processes.
 
@@ -47,8 +114,14 @@ class Parallel(object):
 
         If you're wondering if you should use this function or cls.threads, you should probably use cls.threads.
 
+        The function and the arguments of a call are published to shared memory once (the numpy arrays in them,
+        e.g. of a TickSeries, without a copy) and every task only gets their handles and its item.
+
         :param iterable: iterable to parallelize on
         :param processes: Number of processes to spawn
+        :param chunksize: Number of items sent to a worker at once
+        :param ordered: False to get the results in the order they complete
+        :param progress: log the number of tasks done as they complete
         :param _func: function to be cached based on function call and params
         :return: list of tuples of result for each function call
         """
@@ -58,12 +131,22 @@ class Parallel(object):
         def decorator_parallel_processes(func):
             @functools.wraps(func)
             def wrapper_parallel(*args, **kwargs):
-                with ProcessingPool(nodes=processes) as pool:
-                    partial_func = functools.partial(func, *args, **kwargs)
-                    logger.info(
-                        f"Running function {partial_func.func.__name__} with {processes} processes"
-                    )
-                    return pool.map(partial_func, iterable)
+                items = list(iterable)
+                pool = cls.get_pool(processes)
+                logger.info(f"Running function {func.__name__} with {processes} processes")
+
+                with SharedObjects() as shared:
+                    handles = tuple(shared.publish(value) for value in (func, args, kwargs))
+                    task = functools.partial(_run_shared_task, handles)
+                    imap = pool.imap if ordered else pool.imap_unordered
+
+                    results = []
+                    step = max(len(items) // 10, 1)
+                    for result in imap(task, items, chunksize):
+                        results.append(_load_result(result))
+                        if progress and (len(results) % step == 0 or len(results) == len(items)):
+                            logger.info(f"{func.__name__}: {len(results)}/{len(items)} tasks done")
+                    return results
 
             return wrapper_parallel
 
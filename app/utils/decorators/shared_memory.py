@@ -0,0 +1,96 @@
+import pickle
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import dill
+
+
+class SharedHandle(NamedTuple):
+    """Where a published object is: the block of its pickle and the blocks of its buffers"""
+
+    name: str
+    size: int
+    buffers: tuple  # (name, size) of the out-of-band buffers, e.g. numpy arrays
+    with_dill: bool
+
+
+class SharedObjects:
+    """
+    Publishes objects to shared memory once, for other processes to load them
+    by handle instead of receiving a pickle of them with every task.
+
+    The objects are pickled with protocol 5: the numpy arrays go out of band to
+    blocks of their own, so the loaded arrays are read-only views on the shared
+    memory rather than copies. What pickle can't handle (e.g. local functions) is
+    pickled in band with dill. The blocks are freed on close.
+    """
+
+    def __init__(self) -> None:
+        self._blocks = []
+
+    def __enter__(self) -> "SharedObjects":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def publish(self, value) -> SharedHandle:
+        buffers = []
+        try:
+            data = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+            with_dill = False
+        except (pickle.PicklingError, AttributeError, TypeError):
+            buffers = []
+            data = dill.dumps(value, protocol=5)
+            with_dill = True
+
+        buffers = [buffer.raw() for buffer in buffers]
+        return SharedHandle(
+            self._block(data),
+            len(data),
+            tuple((self._block(buffer), buffer.nbytes) for buffer in buffers),
+            with_dill,
+        )
+
+    def _block(self, data) -> str:
+        size = memoryview(data).nbytes
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        block.buf[:size] = data
+        self._blocks.append(block)
+        return block.name
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def load_shared(handle: SharedHandle) -> tuple:
+    """
+    The object published under a handle, with the blocks it is loaded from: the
+    arrays in it are views on them, keep the blocks open as long as they are used.
+
+    :return: (object, blocks)
+    """
+    block = shared_memory.SharedMemory(name=handle.name)
+    blocks = [block]
+    data = bytes(block.buf[:handle.size])
+    if handle.with_dill:
+        return dill.loads(data), blocks
+
+    buffers = []
+    for name, size in handle.buffers:
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        buffers.append(block.buf[:size].toreadonly())
+    return pickle.loads(data, buffers=buffers), blocks
+
+
+def close_blocks(blocks: list) -> None:
+    """Closes blocks of load_shared, the ones still viewed by arrays are left to the gc"""
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass
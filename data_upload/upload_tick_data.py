@@ -22,6 +22,10 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 import hashlib
 
+# run as a script from data_upload/, the codec is in the app package of the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.orca_max_backtesting.tick_codec import format_iso_utc, parse_tick_time, parse_tick_times
+
 # Load environment variables
 load_dotenv()
 
@@ -169,24 +173,11 @@ class CSVAnalyzer:
             datetime object
         """
         # Try format: YYYYMMDD HHMMSS microseconds
-        if ' ' in str(timestamp_str):
-            parts = str(timestamp_str).split()
-            if len(parts) >= 2:
-                date_part = parts[0]  # YYYYMMDD
-                time_part = parts[1]  # HHMMSS
-                
-                # Parse date
-                year = int(date_part[0:4])
-                month = int(date_part[4:6])
-                day = int(date_part[6:8])
-                
-                # Parse time
-                hour = int(time_part[0:2])
-                minute = int(time_part[2:4])
-                second = int(time_part[4:6])
-                
-                return datetime(year, month, day, hour, minute, second)
-        
+        try:
+            return parse_tick_time(str(timestamp_str))
+        except ValueError:
+            pass
+
         # Fallback to pandas
         return pd.to_datetime(timestamp_str)
     
@@ -572,31 +563,16 @@ class TickDataUploader:
         
         # Convert timestamp to ISO format
         if not has_header:
-            # Parse custom timestamp format: YYYYMMDD HHMMSS microseconds
+            # the rows the codec can't decode, e.g. ISO times
             def parse_custom_timestamp(ts_str):
-                try:
-                    parts = str(ts_str).split()
-                    if len(parts) >= 2:
-                        date_part = parts[0]  # YYYYMMDD
-                        time_part = parts[1]  # HHMMSS
-                        
-                        # Parse date
-                        year = int(date_part[0:4])
-                        month = int(date_part[4:6])
-                        day = int(date_part[6:8])
-                        
-                        # Parse time
-                        hour = int(time_part[0:2])
-                        minute = int(time_part[2:4])
-                        second = int(time_part[4:6])
-                        
-                        dt = datetime(year, month, day, hour, minute, second)
-                        return dt.strftime('%Y-%m-%dT%H:%M:%S+00:00')
-                except:
-                    pass
                 return pd.to_datetime(ts_str).strftime('%Y-%m-%dT%H:%M:%S+00:00')
-            
-            df['ts'] = df['ts'].apply(parse_custom_timestamp)
+
+            # decode the whole column at once, odd rows keep the per row parsing
+            seconds, valid = parse_tick_times(df['ts'].astype(str).to_numpy(), strict=False)
+            ts = format_iso_utc(seconds).astype(object)
+            if not valid.all():
+                ts[~valid] = df['ts'][~valid].apply(parse_custom_timestamp).to_numpy()
+            df['ts'] = ts
         else:
             df['ts'] = pd.to_datetime(df['ts']).dt.strftime('%Y-%m-%dT%H:%M:%S+00:00')
         